@@ -51,7 +51,7 @@ def indy(registers, memory_controller):
 
     low_address += registers.y_index
     if low_address > 255:
-        AddressingModes.cycle_count += 1
+        registers.extra_cycles += 1
 
     return (high_address << 8) + low_address
 
@@ -97,7 +97,7 @@ def absx(registers, memory_controller):
     low_address += registers.x_index
 
     if low_address > 255:
-        AddressingModes.cycle_count += 1
+        registers.extra_cycles += 1
 
     return (high_address << 8) + low_address
 
@@ -108,7 +108,7 @@ def absy(registers, memory_controller):
     low_address += registers.y_index
 
     if low_address > 255:
-        AddressingModes.cycle_count += 1
+        registers.extra_cycles += 1
 
     return (high_address << 8) + low_address
 
@@ -127,34 +127,38 @@ class AddressingModes(object):
     ix_indirect = 11
     iy_indirect = 11'''
 
-    dispatch_table = [
+    dispatch_table = (
         #|  0  |  1  |  2  |  3  |  4  |  5  |  6  |  7  |  8  |  9  |  A  |  B  |  C  |  D  |  E  |  F  | 
-         [  imp, indx,  imp, indx,   zp,   zp,  zpW,   zp,  imp,  imm,  acc,  imm, abso,  abso, absoW, abso], # 0 
-         [  rel, indy,  imp, indy,  zpx,  zpx, zpxW,  zpx,  imp, absy,  imp, absy, absx,  absx, absx, absx], # 1 
-         [ abso, indx,  imp, indx,   zp,   zp,  zpW,   zp,  imp,  imm,  acc,  imm, abso,  abso, absoW, abso], # 2 
-         [  rel, indy,  imp, indy,  zpx,  zpx,  zpx,  zpx,  imp, absy,  imp, absy, absx,  absx, absx, absx], # 3 
-         [  imp, indx,  imp, indx,   zp,   zp,   zp,   zp,  imp,  imm,  acc,  imm, absoW,  abso, abso, abso], # 4 
-         [  rel, indy,  imp, indy,  zpx,  zpx,  zpx,  zpx,  imp, absy,  imp, absy, absx,  absx, absx, absx], # 5 
-         [  imp, indx,  imp, indx,   zp,   zp,   zp,   zp,  imp,  imm,  acc,  imm,  ind,  abso, abso, abso], # 6 
-         [  rel, indy,  imp, indy,  zpx,  zpx,  zpx,  zpx,  imp, absy,  imp, absy, absx,  absx, absx, absx], # 7 
-         [  imm, indx,  imm, indx,  zpW,  zpW,  zpW,   zp,  imp,  imm,  imp,  imm, absoW, absoW, absoW, abso], # 8 
-         [  rel, indy,  imp, indy, zpxW, zpxW, zpyW,  zpy,  imp, absy,  imp, absy, absx,  absx, absy, absy], # 9 
-         [  imm, indx,  imm, indx,   zp,   zp,   zp,   zp,  imp,  imm,  imp,  imm, abso,  abso, abso, abso], # A 
-         [  rel, indy,  imp, indy,  zpx,  zpx,  zpy,  zpy,  imp, absy,  imp, absy, absx,  absx, absy, absy], # B 
-         [  imm, indx,  imm, indx,   zp,   zp,  zpW,   zp,  imp,  imm,  imp,  imm, abso,  abso, absoW, abso], # C 
-         [  rel, indy,  imp, indy,  zpx,  zpx,  zpxW,  zpx,  imp, absy,  imp, absy, absx,  absx, absx, absx], # D 
-         [  imm, indx,  imm, indx,   zp,   zp,  zpW,   zp,  imp,  imm,  imp,  imm, abso,  abso, absoW, abso], # E 
-         [  rel, indy,  imp, indy,  zpx,  zpx,  zpxW,  zpx,  imp, absy,  imp, absy, absx, absx, absx, absx]  # F 
-        ]
-
-    # Used for marking extra cycles for crossing page boundary
-    cycle_count = 0
-
-    def __init__(self):
-        pass
+         (  imp, indx,  imp, indx,   zp,   zp,  zpW,   zp,  imp,  imm,  acc,  imm, abso,  abso, absoW, abso), # 0 
+         (  rel, indy,  imp, indy,  zpx,  zpx, zpxW,  zpx,  imp, absy,  imp, absy, absx,  absx, absx, absx), # 1 
+         (absoW, indx,  imp, indx,   zp,   zp,  zpW,   zp,  imp,  imm,  acc,  imm, abso,  abso, absoW, abso), # 2 
+         (  rel, indy,  imp, indy,  zpx,  zpx,  zpx,  zpx,  imp, absy,  imp, absy, absx,  absx, absx, absx), # 3 
+         (  imp, indx,  imp, indx,   zp,   zp,   zp,   zp,  imp,  imm,  acc,  imm, absoW,  abso, abso, abso), # 4 
+         (  rel, indy,  imp, indy,  zpx,  zpx,  zpx,  zpx,  imp, absy,  imp, absy, absx,  absx, absx, absx), # 5 
+         (  imp, indx,  imp, indx,   zp,   zp,   zp,   zp,  imp,  imm,  acc,  imm,  ind,  abso, abso, abso), # 6 
+         (  rel, indy,  imp, indy,  zpx,  zpx,  zpx,  zpx,  imp, absy,  imp, absy, absx,  absx, absx, absx), # 7 
+         (  imm, indx,  imm, indx,  zpW,  zpW,  zpW,   zp,  imp,  imm,  imp,  imm, absoW, absoW, absoW, abso), # 8 
+         (  rel, indy,  imp, indy, zpxW, zpxW, zpyW,  zpy,  imp, absy,  imp, absy, absx,  absx, absy, absy), # 9 
+         (  imm, indx,  imm, indx,   zp,   zp,   zp,   zp,  imp,  imm,  imp,  imm, abso,  abso, abso, abso), # A 
+         (  rel, indy,  imp, indy,  zpx,  zpx,  zpy,  zpy,  imp, absy,  imp, absy, absx,  absx, absy, absy), # B 
+         (  imm, indx,  imm, indx,   zp,   zp,  zpW,   zp,  imp,  imm,  imp,  imm, abso,  abso, absoW, abso), # C 
+         (  rel, indy,  imp, indy,  zpx,  zpx,  zpxW,  zpx,  imp, absy,  imp, absy, absx,  absx, absx, absx), # D 
+         (  imm, indx,  imm, indx,   zp,   zp,  zpW,   zp,  imp,  imm,  imp,  imm, abso,  abso, absoW, abso), # E 
+         (  rel, indy,  imp, indy,  zpx,  zpx,  zpxW,  zpx,  imp, absy,  imp, absy, absx, absx, absx, absx),  # F 
+        )
+
+    # flattened so an opcode indexes it directly
+    mode_table = tuple(mode for row in dispatch_table for mode in row)
+
+    # the tables are immutable and shared, so there is no per instance state
+    __slots__ = ()
 
     def handle(self, opcode, registers, memory_controller):
 
         # should value fetched according to mode (if applicable)
         # also updates registers according to mode
-        return self.dispatch_table[(opcode & 0xf0) >> 4][opcode & 0xf](registers, memory_controller)
+        return self.mode_table[opcode](registers, memory_controller)
+
+
+# one instance serves every OpCode and Cpu6502
+shared_addressing_modes = AddressingModes()
@@ -0,0 +1,167 @@
+import os
+import sys
+import time
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from emupy6502.cpu6502 import Cpu6502
+from emupy6502.memory_controller import MemoryController
+
+MEMORY_SIZE = 65536
+
+# What comes back from a worker: the final registers as a dict, the
+# cycles run, the requested memory ranges as (address, bytes) pairs and,
+# if the guest could not be run to completion, the reason why.
+JobResult = namedtuple('JobResult', 'job_id registers cycles ranges error')
+
+
+class Job(object):
+
+    # Everything needed to run one program, kept small so it pickles
+    # cheaply: memory is a list of (address, bytes) segments rather than a
+    # 64K image, registers are a dict of just the values that differ from
+    # reset. The job stops when the PC reaches one of stop_addresses, when
+    # a BRK is about to execute (if stop_on_brk) or after max_cycles.
+    __slots__ = ('job_id', 'segments', 'registers', 'stop_addresses',
+                 'stop_on_brk', 'max_cycles', 'ranges')
+
+    def __init__(self, segments, registers = None, stop_addresses = (), stop_on_brk = True,
+                 max_cycles = 10000000, ranges = (), job_id = None):
+
+        self.job_id = job_id
+        self.segments = tuple((address, bytes(data)) for address, data in segments)
+        self.registers = dict(registers or {})
+        self.stop_addresses = frozenset(stop_addresses)
+        self.stop_on_brk = stop_on_brk
+        self.max_cycles = max_cycles
+        self.ranges = tuple(ranges)
+
+    def __getstate__(self):
+
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+
+def run_job(job, job_id = None):
+
+    # job_id names the result when the job has no id of its own
+    if job.job_id is not None:
+        job_id = job.job_id
+
+    memory_controller = MemoryController(MEMORY_SIZE)
+    for address, data in job.segments:
+        memory_controller.load_binary(data, address)
+
+    cpu = Cpu6502(memory_controller)
+    cpu.registers.update(job.registers)
+
+    buffer = memory_controller.buffer
+    registers = cpu.registers
+    stop_addresses = job.stop_addresses
+    stop_on_brk = job.stop_on_brk
+    max_cycles = job.max_cycles
+
+    def signal():
+        return (registers.pc in stop_addresses
+                or (stop_on_brk and buffer[registers.pc] == 0)
+                or cpu.total_cycles >= max_cycles)
+
+    error = None
+    try:
+        cpu.run_until_signalled(signal)
+    except Exception as exception:
+        error = repr(exception)
+
+    if error is None and cpu.total_cycles >= max_cycles:
+        error = "cycle limit of {0} reached".format(max_cycles)
+
+    ranges = tuple((start, bytes(buffer[start:end])) for start, end in job.ranges)
+    return JobResult(job_id, registers.as_dict(), cpu.total_cycles, ranges, error)
+
+def run_jobs(numbered_jobs):
+
+    # (job_id, job) pairs, the ids being for jobs that have none
+    return [run_job(job, job_id) for job_id, job in numbered_jobs]
+
+def run_batch(jobs, max_workers = None, chunk_size = 16, executor = None):
+
+    # Generator yielding JobResults as they complete, so in no particular
+    # order. Results of jobs without an id are numbered by the job's
+    # position in jobs; the jobs themselves are left as they are.
+    # Jobs travel to the workers in chunks to amortise the pickling and
+    # queueing cost per submission.
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers = max_workers)
+
+    futures = []
+    try:
+        chunk = []
+        for index, job in enumerate(jobs):
+            chunk.append((index, job))
+            if len(chunk) == chunk_size:
+                futures.append(executor.submit(run_jobs, chunk))
+                chunk = []
+
+        if chunk:
+            futures.append(executor.submit(run_jobs, chunk))
+
+        for future in as_completed(futures):
+            for result in future.result():
+                yield result
+    finally:
+        # abandoned part way through, don't run what nobody will read
+        for future in futures:
+            future.cancel()
+
+        if own_executor:
+            executor.shutdown()
+
+def gil_enabled():
+
+    # only free-threaded builds (3.13t onwards) can turn the GIL off
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', None)
+    return True if is_gil_enabled is None else is_gil_enabled()
+
+def run_batch_threaded(jobs, max_workers = None, chunk_size = 16):
+
+    # as run_batch but on threads in this process, which avoids pickling
+    # altogether. CPUs share no mutable state, so on a free-threaded build
+    # the jobs genuinely run in parallel; with the GIL they take turns.
+    with ThreadPoolExecutor(max_workers = max_workers) as executor:
+        for result in run_batch(jobs, chunk_size = chunk_size, executor = executor):
+            yield result
+
+def measure_scaling(job, worker_counts = None, jobs_per_worker = 8, threaded = True):
+
+    # Runs jobs_per_worker copies of job per worker for each worker count
+    # and returns (workers, seconds, speedup over one worker) rows. With
+    # perfect scaling every row takes as long as the first.
+    if worker_counts is None:
+        worker_counts = sorted(set([1, 2, 4, os.cpu_count() or 1]))
+
+    rows = []
+    for workers in worker_counts:
+        jobs = [Job(job.segments, job.registers, job.stop_addresses, job.stop_on_brk,
+                    job.max_cycles, job.ranges) for _ in range(workers * jobs_per_worker)]
+
+        start = time.perf_counter()
+        if threaded:
+            results = list(run_batch_threaded(jobs, max_workers = workers, chunk_size = jobs_per_worker))
+        else:
+            results = list(run_batch(jobs, max_workers = workers, chunk_size = jobs_per_worker))
+        seconds = time.perf_counter() - start
+
+        errors = [result.error for result in results if result.error]
+        if errors:
+            raise RuntimeError("scaling job failed: {0}".format(errors[0]))
+
+        single = rows[0][1] / rows[0][0] if rows else seconds / workers
+        rows.append((workers, seconds, single * workers / seconds))
+
+    return rows
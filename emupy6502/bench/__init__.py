@@ -0,0 +1,134 @@
+import datetime
+import gc
+import json
+import platform
+import statistics
+import time
+
+from collections import namedtuple
+
+from emupy6502.bench.workloads import Workload, workloads, workloads_by_name
+
+# one timed repetition of a workload
+Sample = namedtuple('Sample', 'cycles instructions seconds')
+
+RESULTS_FORMAT = 1
+
+
+def rates(sample):
+
+    # emulated MHz, instructions per second and host ns per instruction
+    return (sample.cycles / sample.seconds / 1000000,
+            sample.instructions / sample.seconds,
+            sample.seconds * 1000000000 / sample.instructions)
+
+def measure(workload, cycles = 200000, repetitions = 5, warmup = 1, clock = time.perf_counter):
+
+    # Runs the workload for warmup untimed repetitions, so caches and the
+    # interpreter's specialisations have settled, then times repetitions
+    # more of cycles cycles each. The collector is kept out of the timed
+    # runs, the hot loop shouldn't be allocating anyway.
+    cpu = workload.build()
+    for _ in range(warmup):
+        cpu.run(cycles)
+
+    samples = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repetitions):
+            gc.collect()
+            start = clock()
+            result = cpu.run(cycles)
+            seconds = clock() - start
+            samples.append(Sample(result.cycles, result.instructions, seconds))
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    return samples
+
+def best_of(repeats, timed):
+
+    # the fastest of repeats calls to timed, as timeit does, since noise
+    # only ever makes things slower
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return min(timed() for _ in range(repeats))
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+def summarise(samples):
+
+    mhz, instructions_per_second, ns_per_instruction = zip(*(rates(sample) for sample in samples))
+    return {
+        'mhz': statistics.median(mhz),
+        'instructions_per_second': statistics.median(instructions_per_second),
+        'ns_per_instruction': statistics.median(ns_per_instruction),
+        'best_mhz': max(mhz),
+        'worst_mhz': min(mhz),
+    }
+
+def environment():
+
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+    }
+
+def run_suite(names = None, cycles = 200000, repetitions = 5, warmup = 1, clock = time.perf_counter):
+
+    # everything needed to compare against another run later, the raw
+    # samples included
+    selected = workloads if names is None else [workloads_by_name[name] for name in names]
+
+    results = {
+        'format': RESULTS_FORMAT,
+        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'environment': environment(),
+        'parameters': {'cycles': cycles, 'repetitions': repetitions, 'warmup': warmup},
+        'workloads': {},
+    }
+
+    for workload in selected:
+        samples = measure(workload, cycles, repetitions, warmup, clock)
+        results['workloads'][workload.name] = {
+            'description': workload.description,
+            'samples': [sample._asdict() for sample in samples],
+            'summary': summarise(samples),
+        }
+
+    return results
+
+def save_results(results, filename):
+
+    with open(filename, 'w') as results_file:
+        json.dump(results, results_file, indent = 2, sort_keys = True)
+
+def load_results(filename):
+
+    with open(filename) as results_file:
+        results = json.load(results_file)
+
+    if results.get('format') != RESULTS_FORMAT:
+        raise ValueError("{0} is not a benchmark results file this version can read".format(filename))
+
+    return results
+
+def samples_of(results, name):
+
+    return [Sample(**sample) for sample in results['workloads'][name]['samples']]
+
+def format_results(results):
+
+    lines = ["{0:10} {1:>10} {2:>14} {3:>12}".format("workload", "MHz", "instr/s", "ns/instr")]
+    for name, workload in results['workloads'].items():
+        summary = workload['summary']
+        lines.append("{0:10} {1:10.3f} {2:14,.0f} {3:12.1f}".format(
+            name, summary['mhz'], summary['instructions_per_second'], summary['ns_per_instruction']))
+
+    return "\n".join(lines)
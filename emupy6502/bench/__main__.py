@@ -0,0 +1,31 @@
+import argparse
+
+from emupy6502.bench import format_results, run_suite, save_results
+from emupy6502.bench.workloads import workloads_by_name
+
+
+def main(arguments = None):
+
+    parser = argparse.ArgumentParser(prog = 'python -m emupy6502.bench',
+                                     description = "Times the standard 6502 workloads.")
+    parser.add_argument('workloads', nargs = '*',
+                        help = "workloads to run, all of them by default: {0}".format(", ".join(workloads_by_name)))
+    parser.add_argument('--cycles', type = int, default = 200000, help = "emulated cycles per repetition")
+    parser.add_argument('--repetitions', type = int, default = 5)
+    parser.add_argument('--warmup', type = int, default = 1, help = "untimed repetitions first")
+    parser.add_argument('--output', help = "save the results as JSON here")
+    options = parser.parse_args(arguments)
+
+    for name in options.workloads:
+        if name not in workloads_by_name:
+            parser.error("unknown workload {0}".format(name))
+
+    results = run_suite(options.workloads or None, options.cycles, options.repetitions, options.warmup)
+    print(format_results(results))
+
+    if options.output:
+        save_results(results, options.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,249 @@
+import argparse
+import os
+import sys
+import tracemalloc
+
+from array import array
+from collections import namedtuple
+
+from emupy6502.bench.workloads import workloads, workloads_by_name
+
+# Runs a workload under tracemalloc to find allocations in the hot loop.
+# Two things are measured:
+#   retained: blocks still alive after the run, per source line of the
+#     audited files. A handful are just the machine's current state,
+#     register values and addresses above 256 are int objects, but a
+#     count that grows with the run is a leak.
+#   transient: a sample of instructions is run OpCode.execute a half at
+#     a time, the addressing mode and then the handler, with the traced
+#     memory peak read around each. Anything either half allocates, even
+#     if it is freed again straight away, counts as an allocation against
+#     that function of opcodes.py or addressing_modes.py (what the memory
+#     controller allocates counts against the function reading it). The
+#     allocations per instruction are what a budget of 0 checks.
+
+audited_files = ('opcodes.py', 'addressing_modes.py')
+
+LineAllocations = namedtuple('LineAllocations', 'filename lineno blocks size')
+
+# calls: times the function ran over the sample, allocations: how many of
+# those allocated, size: the bytes they peaked at between them
+FunctionAllocations = namedtuple('FunctionAllocations', 'filename lineno name calls allocations size')
+
+# lines: LineAllocations retained per audited source line, biggest first
+# sampled: instructions run a half at a time for the transient figures
+# allocations: mode and handler calls that allocated over the sample
+# functions: FunctionAllocations that allocated, most allocations first
+# opcodes: {opcode: largest transient bytes seen for one instruction}
+AllocationReport = namedtuple('AllocationReport',
+                              'workload instructions retained_blocks retained_size peak_size lines '
+                              'sampled allocations functions opcodes')
+
+
+class AllocationBudgetExceeded(Exception):
+
+    def __init__(self, message, report):
+
+        super(AllocationBudgetExceeded, self).__init__(message)
+        self.report = report
+
+
+def audit_filters(files = audited_files):
+
+    # files are relative to the package or absolute paths
+    package = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return [tracemalloc.Filter(True, os.path.join(package, filename)) for filename in files]
+
+def reset_peak(base):
+
+    # the size read back is kept in base, an array, so storing it doesn't
+    # allocate; the peak is reset again once the tuple it came in is gone
+    tracemalloc.reset_peak()
+    traced = tracemalloc.get_traced_memory()
+    base[0] = traced[0]
+    del traced
+    tracemalloc.reset_peak()
+
+def peak_above(base):
+
+    return tracemalloc.get_traced_memory()[1] - base[0]
+
+def sample_allocations(cpu, instructions):
+
+    # ({function: [calls, allocations, bytes]}, {opcode: largest bytes})
+    memory_controller = cpu.memory_controller
+    registers = cpu.registers
+    mode_table = cpu.opcodes.mode_table
+    handler_table = cpu.opcodes.handler_table
+
+    functions = {}
+    opcodes = {}
+    base = array('q', [0])
+    for _ in range(instructions):
+        opcode = memory_controller.read(registers.pc)
+        registers.pc += 1
+        registers.extra_cycles = 0
+        mode = mode_table[opcode]
+        handler = handler_table[opcode]
+
+        reset_peak(base)
+        operand = mode(registers, memory_controller)
+        mode_size = peak_above(base)
+
+        reset_peak(base)
+        handler(registers, operand, memory_controller)
+        handler_size = peak_above(base)
+
+        for function, size in ((mode, mode_size), (handler, handler_size)):
+            counts = functions.setdefault(function, [0, 0, 0])
+            counts[0] += 1
+            if size > 0:
+                counts[1] += 1
+                counts[2] += size
+
+        opcodes[opcode] = max(opcodes.get(opcode, 0), mode_size + handler_size)
+
+    return functions, opcodes
+
+def audit(workload, cycles = 20000, warmup = 20000, sample_instructions = 1000, files = audited_files):
+
+    # warm up first so nothing that is only allocated once (caches, the
+    # interpreter's specialisations) is counted against the loop
+    cpu = workload.build()
+    cpu.run(warmup)
+
+    filters = audit_filters(files)
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+
+    try:
+        before = tracemalloc.take_snapshot().filter_traces(filters)
+
+        tracemalloc.reset_peak()
+        start_size = tracemalloc.get_traced_memory()[0]
+        result = cpu.run(cycles)
+        peak_size = tracemalloc.get_traced_memory()[1]
+
+        after = tracemalloc.take_snapshot().filter_traces(filters)
+
+        functions, opcodes = sample_allocations(cpu, sample_instructions)
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+
+    lines = [LineAllocations(statistic.traceback[0].filename, statistic.traceback[0].lineno,
+                             statistic.count_diff, statistic.size_diff)
+             for statistic in after.compare_to(before, 'lineno')
+             if statistic.count_diff > 0]
+
+    allocating = [FunctionAllocations(function.__code__.co_filename, function.__code__.co_firstlineno,
+                                      function.__name__, calls, allocations, size)
+                  for function, (calls, allocations, size) in functions.items()
+                  if allocations]
+    allocating.sort(key = lambda function: (-function.allocations, -function.size, function.name))
+
+    return AllocationReport(workload.name,
+                            result.instructions,
+                            sum(line.blocks for line in lines),
+                            sum(line.size for line in lines),
+                            peak_size - start_size,
+                            lines,
+                            sample_instructions,
+                            sum(function.allocations for function in allocating),
+                            allocating,
+                            opcodes)
+
+def blocks_per_instruction(report):
+
+    return report.retained_blocks / report.instructions if report.instructions else 0.0
+
+def allocations_per_instruction(report):
+
+    return report.allocations / report.sampled if report.sampled else 0.0
+
+def check_budget(report, blocks_per_instruction_budget = 0.01, peak_size_budget = None,
+                 allocations_per_instruction_budget = None):
+
+    # raises AllocationBudgetExceeded if the run retained more blocks per
+    # instruction, peaked higher, or the sample allocated more often per
+    # instruction than allowed. A budget of 0 allows none at all.
+    per_instruction = blocks_per_instruction(report)
+    if per_instruction > blocks_per_instruction_budget:
+        raise AllocationBudgetExceeded(
+            "{0} retained {1:.4f} blocks per instruction, budget {2}".format(
+                report.workload, per_instruction, blocks_per_instruction_budget), report)
+
+    if peak_size_budget is not None and report.peak_size > peak_size_budget:
+        raise AllocationBudgetExceeded(
+            "{0} peaked at {1} bytes of transient allocations, budget {2}".format(
+                report.workload, report.peak_size, peak_size_budget), report)
+
+    allocations = allocations_per_instruction(report)
+    if allocations_per_instruction_budget is not None and allocations > allocations_per_instruction_budget:
+        raise AllocationBudgetExceeded(
+            "{0} allocated {1:.2f} times per instruction, budget {2}".format(
+                report.workload, allocations, allocations_per_instruction_budget), report)
+
+    return report
+
+def format_report(report):
+
+    lines = ["{0}: {1} instructions, {2} blocks ({3} bytes) retained, {4:.4f} per instruction, "
+             "transient peak {5} bytes".format(report.workload, report.instructions, report.retained_blocks,
+                                                report.retained_size, blocks_per_instruction(report),
+                                                report.peak_size)]
+
+    for line in report.lines:
+        lines.append("  {0}:{1}: {2} blocks, {3} bytes".format(
+            os.path.basename(line.filename), line.lineno, line.blocks, line.size))
+
+    lines.append("  {0} allocations over {1} sampled instructions, {2:.2f} per instruction".format(
+        report.allocations, report.sampled, allocations_per_instruction(report)))
+    for function in report.functions:
+        lines.append("    {0}:{1} {2}: {3} of {4} calls, {5} bytes".format(
+            os.path.basename(function.filename), function.lineno, function.name,
+            function.allocations, function.calls, function.size))
+
+    allocating = [(opcode, size) for opcode, size in report.opcodes.items() if size]
+    if allocating:
+        lines.append("  transient bytes per instruction:")
+        for opcode, size in sorted(allocating, key = lambda item: (-item[1], item[0])):
+            lines.append("    {0:#04x}: {1}".format(opcode, size))
+
+    return "\n".join(lines)
+
+
+def main(arguments = None):
+
+    parser = argparse.ArgumentParser(prog = 'python -m emupy6502.bench.allocations',
+                                     description = "Audits the workloads for allocations in the hot loop.")
+    parser.add_argument('workloads', nargs = '*',
+                        help = "workloads to audit, all of them by default: {0}".format(", ".join(workloads_by_name)))
+    parser.add_argument('--cycles', type = int, default = 20000)
+    parser.add_argument('--budget', type = float,
+                        help = "allocations allowed per sampled instruction, 0 for none")
+    parser.add_argument('--retained-budget', type = float, default = 0.01,
+                        help = "retained blocks allowed per instruction")
+    parser.add_argument('--peak-budget', type = int, help = "transient peak allowed in bytes")
+    options = parser.parse_args(arguments)
+
+    for name in options.workloads:
+        if name not in workloads_by_name:
+            parser.error("unknown workload {0}".format(name))
+
+    status = 0
+    for workload in [workloads_by_name[name] for name in options.workloads] or workloads:
+        report = audit(workload, options.cycles)
+        print(format_report(report))
+        try:
+            check_budget(report, options.retained_budget, options.peak_budget, options.budget)
+        except AllocationBudgetExceeded as exceeded:
+            print("  OVER BUDGET: {0}".format(exceeded))
+            status = 1
+
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
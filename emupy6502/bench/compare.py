@@ -0,0 +1,159 @@
+import argparse
+import bisect
+import math
+import statistics
+import sys
+
+from collections import namedtuple
+
+from emupy6502.bench import format_results, load_results, rates, run_suite, samples_of
+from emupy6502.bench.workloads import workloads_by_name
+
+# Compares the per-repetition ns per instruction of two benchmark runs
+# workload by workload with Welch's t-test, which doesn't assume the two
+# runs are equally noisy. A workload is a regression when it got slower by
+# more than the threshold and the confidence interval for the change
+# doesn't include zero.
+
+# two sided critical values of Student's t, by confidence then degrees of
+# freedom, falling back on the normal distribution past the end
+t_table_df = tuple(range(1, 31)) + (40, 60, 120)
+t_table = {
+    90: (6.314, 2.920, 2.353, 2.132, 2.015, 1.943, 1.895, 1.860, 1.833, 1.812,
+         1.796, 1.782, 1.771, 1.761, 1.753, 1.746, 1.740, 1.734, 1.729, 1.725,
+         1.721, 1.717, 1.714, 1.711, 1.708, 1.706, 1.703, 1.701, 1.699, 1.697,
+         1.684, 1.671, 1.658),
+    95: (12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+         2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+         2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,
+         2.021, 2.000, 1.980),
+    99: (63.657, 9.925, 5.841, 4.604, 4.032, 3.707, 3.499, 3.355, 3.250, 3.169,
+         3.106, 3.055, 3.012, 2.977, 2.947, 2.921, 2.898, 2.878, 2.861, 2.845,
+         2.831, 2.819, 2.807, 2.797, 2.787, 2.779, 2.771, 2.763, 2.756, 2.750,
+         2.704, 2.660, 2.617),
+}
+normal_critical = {90: 1.645, 95: 1.960, 99: 2.576}
+
+# change, low and high are the candidate's ns per instruction relative to
+# the baseline's, so 0.05 is 5% slower; status is 'regression',
+# 'improvement', 'unchanged' or 'insufficient samples'
+Comparison = namedtuple('Comparison', 'name baseline_ns candidate_ns change low high t status')
+
+
+def critical_t(df, confidence = 95):
+
+    # rounds df down to the table, which errs on the side of a wider interval
+    if confidence not in t_table:
+        raise ValueError("confidence must be one of {0}".format(sorted(t_table)))
+
+    if df > t_table_df[-1] * 2:
+        return normal_critical[confidence]
+
+    index = bisect.bisect_right(t_table_df, max(df, 1)) - 1
+    return t_table[confidence][index]
+
+def welch(baseline, candidate, confidence = 95):
+
+    # (difference in means, its confidence interval, t) for candidate - baseline
+    baseline_mean = statistics.mean(baseline)
+    candidate_mean = statistics.mean(candidate)
+    difference = candidate_mean - baseline_mean
+
+    baseline_term = statistics.variance(baseline) / len(baseline)
+    candidate_term = statistics.variance(candidate) / len(candidate)
+    standard_error = math.sqrt(baseline_term + candidate_term)
+
+    if standard_error == 0:
+        # noiseless samples, any difference at all is real
+        t = math.copysign(math.inf, difference) if difference else 0.0
+        return difference, difference, difference, t
+
+    df = (baseline_term + candidate_term) ** 2 / (
+        baseline_term ** 2 / (len(baseline) - 1) + candidate_term ** 2 / (len(candidate) - 1))
+    margin = critical_t(df, confidence) * standard_error
+
+    return difference, difference - margin, difference + margin, difference / standard_error
+
+def ns_per_instruction(samples):
+
+    return [rates(sample)[2] for sample in samples]
+
+def compare_samples(name, baseline, candidate, threshold = 0.05, confidence = 95):
+
+    baseline_ns = ns_per_instruction(baseline)
+    candidate_ns = ns_per_instruction(candidate)
+    baseline_mean = statistics.mean(baseline_ns)
+    candidate_mean = statistics.mean(candidate_ns)
+
+    if len(baseline_ns) < 2 or len(candidate_ns) < 2:
+        change = candidate_mean / baseline_mean - 1
+        return Comparison(name, baseline_mean, candidate_mean, change, None, None, None, 'insufficient samples')
+
+    difference, low, high, t = welch(baseline_ns, candidate_ns, confidence)
+    change, low, high = difference / baseline_mean, low / baseline_mean, high / baseline_mean
+
+    if low > 0 and change > threshold:
+        status = 'regression'
+    elif high < 0 and -change > threshold:
+        status = 'improvement'
+    else:
+        status = 'unchanged'
+
+    return Comparison(name, baseline_mean, candidate_mean, change, low, high, t, status)
+
+def compare_results(baseline, candidate, threshold = 0.05, confidence = 95):
+
+    # one Comparison per workload the two runs have in common
+    return [compare_samples(name, samples_of(baseline, name), samples_of(candidate, name), threshold, confidence)
+            for name in baseline['workloads'] if name in candidate['workloads']]
+
+def format_comparisons(comparisons, confidence = 95):
+
+    lines = ["{0:10} {1:>10} {2:>10} {3:>8} {4:>20}  {5}".format(
+        "workload", "base ns", "new ns", "change", "{0}% interval".format(confidence), "status")]
+
+    for comparison in comparisons:
+        if comparison.low is None:
+            interval = ""
+        else:
+            interval = "{0:+7.1%} .. {1:+7.1%}".format(comparison.low, comparison.high)
+        lines.append("{0:10} {1:10.1f} {2:10.1f} {3:+8.1%} {4:>20}  {5}".format(
+            comparison.name, comparison.baseline_ns, comparison.candidate_ns, comparison.change,
+            interval, comparison.status))
+
+    return "\n".join(lines)
+
+
+def main(arguments = None):
+
+    parser = argparse.ArgumentParser(prog = 'python -m emupy6502.bench.compare',
+                                     description = "Compares two benchmark runs, or a fresh run "
+                                                   "against a stored baseline.")
+    parser.add_argument('baseline', help = "baseline results JSON")
+    parser.add_argument('candidate', nargs = '?',
+                        help = "results JSON to compare, by default the suite is run now")
+    parser.add_argument('--threshold', type = float, default = 5.0,
+                        help = "percent slowdown that counts as a regression")
+    parser.add_argument('--confidence', type = int, default = 95, choices = sorted(t_table))
+    options = parser.parse_args(arguments)
+
+    baseline = load_results(options.baseline)
+    if options.candidate:
+        candidate = load_results(options.candidate)
+    else:
+        parameters = baseline['parameters']
+        names = [name for name in baseline['workloads'] if name in workloads_by_name]
+        candidate = run_suite(names, parameters['cycles'],
+                              parameters['repetitions'], parameters['warmup'])
+        print(format_results(candidate))
+        print()
+
+    comparisons = compare_results(baseline, candidate, options.threshold / 100, options.confidence)
+    print(format_comparisons(comparisons, options.confidence))
+
+    # a non zero exit fails a CI step on any regression
+    return 1 if any(comparison.status == 'regression' for comparison in comparisons) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+import argparse
+import sys
+import time
+
+from collections import namedtuple
+
+from emupy6502.bench import best_of
+from emupy6502.bench.workloads import sqrt_routine
+from emupy6502.cpu6502 import Cpu6502
+from emupy6502.lockstep import LockstepEngine
+from emupy6502.memory_controller import MemoryController
+
+# Times the integer square root of every input in a range, once on a
+# separate Cpu6502 per input and once on a LockstepEngine with a lane per
+# input, and checks both got the same roots. Both start from loaded
+# machines, so what is timed is the emulation, not the setup.
+
+PROGRAM_ADDRESS = 0x600
+sqrt_program = sqrt_routine + bytes([0x00])
+
+# the program and its zero page fit under $0800, so that is all the
+# memory each lane needs
+LANE_MEMORY_SIZE = 0x800
+
+# seconds for all the inputs; speedup is scalar over lockstep
+LockstepTiming = namedtuple('LockstepTiming', 'inputs scalar_seconds lockstep_seconds speedup')
+
+
+def scalar_cpus(numbers):
+
+    cpus = []
+    for number in numbers:
+        memory_controller = MemoryController(65536)
+        memory_controller.load_binary(sqrt_program, PROGRAM_ADDRESS)
+        memory_controller.write(0xf0, number & 0xff)
+        memory_controller.write(0xf1, number >> 8)
+        cpu = Cpu6502(memory_controller)
+        cpu.registers.pc = PROGRAM_ADDRESS
+        cpus.append(cpu)
+    return cpus
+
+def lockstep_engine(numbers, memory_size = LANE_MEMORY_SIZE):
+
+    engine = LockstepEngine(len(numbers), memory_size = memory_size)
+    engine.load(sqrt_program, PROGRAM_ADDRESS)
+    engine.pc[:] = PROGRAM_ADDRESS
+    engine.memory[:, 0xf0] = [number & 0xff for number in numbers]
+    engine.memory[:, 0xf1] = [number >> 8 for number in numbers]
+    return engine
+
+def run_scalar(cpus):
+
+    for cpu in cpus:
+        read = cpu.memory_controller.read
+        registers = cpu.registers
+        cpu.run_until_signalled(lambda: read(registers.pc) == 0)
+    return [cpu.memory_controller.read(0xf6) for cpu in cpus]
+
+def run_lockstep(engine):
+
+    engine.run()
+    return engine.memory[:, 0xf6].tolist()
+
+def time_sqrt(inputs = 1000, repeats = 3, clock = time.perf_counter):
+
+    numbers = [(number * 65535) // max(inputs - 1, 1) for number in range(inputs)]
+    roots = []
+
+    def timed(build, run):
+        def timing():
+            machines = build(numbers)
+            start = clock()
+            roots.append(run(machines))
+            return clock() - start
+        return timing
+
+    scalar_seconds = best_of(repeats, timed(scalar_cpus, run_scalar))
+    lockstep_seconds = best_of(repeats, timed(lockstep_engine, run_lockstep))
+
+    if any(found != roots[0] for found in roots):
+        raise AssertionError("lockstep and scalar roots differ")
+
+    speedup = scalar_seconds / lockstep_seconds if lockstep_seconds else 0.0
+    return LockstepTiming(inputs, scalar_seconds, lockstep_seconds, speedup)
+
+def format_timing(timing):
+
+    return "{0} inputs: scalar {1:.3f}s ({2:.1f} us each), lockstep {3:.3f}s ({4:.1f} us each), {5:.1f}x".format(
+        timing.inputs, timing.scalar_seconds, timing.scalar_seconds * 1000000 / timing.inputs,
+        timing.lockstep_seconds, timing.lockstep_seconds * 1000000 / timing.inputs, timing.speedup)
+
+
+def main(arguments = None):
+
+    parser = argparse.ArgumentParser(prog = 'python -m emupy6502.bench.lockstep',
+                                     description = "Compares the lockstep engine with separate CPUs "
+                                                   "on a square root sweep.")
+    parser.add_argument('inputs', nargs = '*', type = int, default = [100, 1000, 10000],
+                        help = "numbers of inputs to sweep")
+    parser.add_argument('--repeats', type = int, default = 3, help = "best of this many timings")
+    options = parser.parse_args(arguments)
+
+    for inputs in options.inputs:
+        print(format_timing(time_sqrt(inputs, options.repeats)))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
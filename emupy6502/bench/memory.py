@@ -0,0 +1,157 @@
+import argparse
+import json
+import random
+import time
+
+from collections import namedtuple
+
+from emupy6502.bench import best_of
+from emupy6502.memory_controller import MemoryController
+from emupy6502.mmap_memory_controller import MmapMemoryController
+from emupy6502.paged_memory_controller import PagedMemoryController, SharedRom
+
+# Times the raw read, write and word read (two reads put together, as the
+# addressing modes do) of each memory backend over a few access
+# patterns, with the cost of the loop itself taken off. The paged and
+# shared backends have a 16K ROM at $c000, so some random accesses land
+# on ROM pages, where writes are dropped.
+
+ROM_ADDRESS = 0xc000
+ROM_SIZE = 0x4000
+
+# ns per access
+MemoryTiming = namedtuple('MemoryTiming', 'backend pattern read_ns write_ns word_read_ns')
+
+
+class SubclassedMemoryController(MemoryController):
+
+    # the shape of the test controllers: overrides that chain up with super
+    def read(self, address):
+
+        return super(SubclassedMemoryController, self).read(address)
+
+    def write(self, address, value):
+
+        super(SubclassedMemoryController, self).write(address, value)
+
+
+def shared_rom_controller():
+
+    rom = SharedRom.create_shared(bytes(ROM_SIZE), ROM_ADDRESS)
+    return PagedMemoryController([rom]), rom
+
+def backends():
+
+    # (name, factory) where factory gives (memory controller, cleanup or None)
+    return (
+        ('plain', lambda: (MemoryController(65536), None)),
+        ('subclassed', lambda: (SubclassedMemoryController(65536), None)),
+        ('paged', lambda: (PagedMemoryController([SharedRom(bytes(ROM_SIZE), ROM_ADDRESS)]), None)),
+        ('mmap', lambda: (MmapMemoryController(), None)),
+        ('shared', shared_rom_controller),
+    )
+
+def patterns(count = 4096, seed = 6502):
+
+    # addresses leave room for the second byte of a word read
+    generator = random.Random(seed)
+    return (
+        ('sequential', [0x0200 + index for index in range(count)]),
+        ('zero page', [index & 0xfe for index in range(count)]),
+        ('random', [generator.randrange(0xffff) for _ in range(count)]),
+    )
+
+def time_accesses(memory_controller, addresses, repeats = 5, clock = time.perf_counter):
+
+    read = memory_controller.read
+    write = memory_controller.write
+
+    def overhead():
+        start = clock()
+        for address in addresses:
+            pass
+        return clock() - start
+
+    def reading():
+        start = clock()
+        for address in addresses:
+            read(address)
+        return clock() - start
+
+    def writing():
+        start = clock()
+        for address in addresses:
+            write(address, 0x55)
+        return clock() - start
+
+    def reading_words():
+        start = clock()
+        for address in addresses:
+            read(address) | (read(address + 1) << 8)
+        return clock() - start
+
+    loop = best_of(repeats, overhead)
+    return tuple(max(best_of(repeats, timed) - loop, 0.0) * 1000000000 / len(addresses)
+                 for timed in (reading, writing, reading_words))
+
+def time_backends(names = None, count = 4096, repeats = 5, clock = time.perf_counter):
+
+    timings = []
+    for name, factory in backends():
+        if names is not None and name not in names:
+            continue
+
+        try:
+            memory_controller, cleanup = factory()
+        except OSError:
+            # no shared memory on this host
+            continue
+
+        try:
+            for pattern, addresses in patterns(count):
+                timings.append(MemoryTiming(name, pattern, *time_accesses(memory_controller, addresses, repeats, clock)))
+        finally:
+            if cleanup is not None:
+                cleanup.close()
+                cleanup.unlink()
+            if hasattr(memory_controller, 'close'):
+                memory_controller.close()
+
+    return timings
+
+def format_table(timings):
+
+    lines = ["{0:12} {1:12} {2:>9} {3:>9} {4:>9}".format("backend", "pattern", "read ns", "write ns", "word ns")]
+    for timing in timings:
+        lines.append("{0:12} {1:12} {2:9.1f} {3:9.1f} {4:9.1f}".format(*timing))
+
+    return "\n".join(lines)
+
+
+def main(arguments = None):
+
+    parser = argparse.ArgumentParser(prog = 'python -m emupy6502.bench.memory',
+                                     description = "Times memory accesses on each memory backend.")
+    parser.add_argument('backends', nargs = '*',
+                        help = "backends to time, all of them by default: {0}".format(
+                            ", ".join(name for name, _ in backends())))
+    parser.add_argument('--count', type = int, default = 4096, help = "accesses per timing")
+    parser.add_argument('--repeats', type = int, default = 5, help = "best of this many timings")
+    parser.add_argument('--output', help = "save the timings as JSON here")
+    options = parser.parse_args(arguments)
+
+    known = [name for name, _ in backends()]
+    for name in options.backends:
+        if name not in known:
+            parser.error("unknown backend {0}".format(name))
+
+    timings = time_backends(options.backends or None, options.count, options.repeats)
+    print(format_table(timings))
+
+    if options.output:
+        with open(options.output, 'w') as output:
+            json.dump([timing._asdict() for timing in timings], output, indent = 2)
+
+
+if __name__ == '__main__':
+    main()
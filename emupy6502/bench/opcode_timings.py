@@ -0,0 +1,175 @@
+import argparse
+import json
+import time
+
+from collections import namedtuple
+
+from emupy6502.addressing_modes import AddressingModes
+from emupy6502.bench import best_of
+from emupy6502.memory_controller import MemoryController
+from emupy6502.opcodes import OpCode, shared_opcodes
+from emupy6502.registers import Registers
+
+try:
+    from emupy6502.lockstep import LockstepEngine, operation_table
+except ImportError:
+    LockstepEngine = None
+
+# Times every opcode on its own, so a slow handler or addressing mode
+# shows up directly instead of being averaged into a whole workload.
+# Each opcode sits at $0600 with $10 $02 after it, so its operand is
+# $0210, zero page $10 or a short forward branch depending on the mode,
+# and the PC is put back before every execution. Only the PC is reset,
+# so registers and memory drift as e.g. INX or DEC keep running, the same
+# for every run of the tool.
+
+PROGRAM_ADDRESS = 0x600
+OPERAND_BYTES = bytes([0x10, 0x02])
+
+# ns per instruction for each engine, None where the opcode isn't
+# implemented by that engine
+OpcodeTiming = namedtuple('OpcodeTiming', 'opcode mnemonic mode cycles scalar_ns lockstep_ns')
+
+mnemonic_table = tuple(name for row in OpCode.opcode_table for name in row)
+
+
+def implemented(opcode):
+
+    registers, memory_controller = opcode_machine(opcode)
+    try:
+        shared_opcodes.execute(opcode, registers, memory_controller)
+    except KeyError:
+        return False
+    return True
+
+def opcode_machine(opcode):
+
+    memory_controller = MemoryController(65536)
+    memory_controller.load_binary(bytes([opcode]) + OPERAND_BYTES, PROGRAM_ADDRESS)
+    registers = Registers()
+    registers.pc = PROGRAM_ADDRESS + 1
+    return registers, memory_controller
+
+def time_scalar(opcode, iterations = 2000, repeats = 3, clock = time.perf_counter):
+
+    # through OpCode.execute exactly as Cpu6502.run calls it, less the
+    # cost of the loop and PC reset around it
+    registers, memory_controller = opcode_machine(opcode)
+    execute = shared_opcodes.execute
+    pc = PROGRAM_ADDRESS + 1
+    loop = range(iterations)
+
+    def overhead():
+        start = clock()
+        for _ in loop:
+            registers.pc = pc
+        return clock() - start
+
+    def executing():
+        start = clock()
+        for _ in loop:
+            registers.pc = pc
+            execute(opcode, registers, memory_controller)
+        return clock() - start
+
+    elapsed = best_of(repeats, executing) - best_of(repeats, overhead)
+    return max(elapsed, 0.0) * 1000000000 / iterations
+
+def time_lockstep(opcode, iterations = 200, lanes = 64, repeats = 3, clock = time.perf_counter):
+
+    # one LockstepEngine step runs the opcode on every lane, so the time
+    # per instruction is the step time shared between the lanes
+    engine = LockstepEngine(lanes)
+    engine.load(bytes([opcode]) + OPERAND_BYTES, PROGRAM_ADDRESS)
+    pc = engine.pc
+    step = engine.step
+
+    def stepping():
+        start = clock()
+        for _ in range(iterations):
+            pc[:] = PROGRAM_ADDRESS
+            step()
+        return clock() - start
+
+    return best_of(repeats, stepping) * 1000000000 / (iterations * lanes)
+
+def time_opcodes(opcodes = range(256), iterations = 2000, lockstep = True, lanes = 64, repeats = 3,
+                 clock = time.perf_counter):
+
+    lockstep = lockstep and LockstepEngine is not None
+    # each lockstep step does lanes instructions' worth of work
+    lockstep_iterations = max(1, iterations // lanes)
+
+    timings = []
+    for opcode in opcodes:
+        scalar_ns = time_scalar(opcode, iterations, repeats, clock) if implemented(opcode) else None
+
+        lockstep_ns = None
+        # BRK halts a lockstep lane rather than running
+        if lockstep and opcode != 0x00 and operation_table[opcode] is not None:
+            lockstep_ns = time_lockstep(opcode, lockstep_iterations, lanes, repeats, clock)
+
+        timings.append(OpcodeTiming(opcode,
+                                    mnemonic_table[opcode],
+                                    AddressingModes.mode_table[opcode].__name__,
+                                    OpCode.cycle_table[opcode],
+                                    scalar_ns,
+                                    lockstep_ns))
+
+    return timings
+
+def by_mode(timings):
+
+    # {mode: [timings]}, in table order within each mode
+    modes = {}
+    for timing in timings:
+        modes.setdefault(timing.mode, []).append(timing)
+    return modes
+
+def format_ns(ns):
+
+    return "{0:10.0f}".format(ns) if ns is not None else "{0:>10}".format("-")
+
+def format_table(timings):
+
+    lines = ["{0:6} {1:>4} {2:6} {3:>6} {4:>10} {5:>10}".format(
+        "mode", "op", "name", "cycles", "scalar ns", "lockstep")]
+
+    for mode, group in sorted(by_mode(timings).items()):
+        for timing in group:
+            lines.append("{0:6} {1:#04x} {2:6} {3:6} {4} {5}".format(
+                mode, timing.opcode, timing.mnemonic, timing.cycles,
+                format_ns(timing.scalar_ns), format_ns(timing.lockstep_ns)))
+
+        implemented_ns = [timing.scalar_ns for timing in group if timing.scalar_ns is not None]
+        if implemented_ns:
+            lines.append("{0:6} mean of {1} implemented {2:>9} {3}".format(
+                mode, len(implemented_ns), "", format_ns(sum(implemented_ns) / len(implemented_ns))))
+        lines.append("")
+
+    lines.append("- not implemented by that engine")
+    return "\n".join(lines)
+
+
+def main(arguments = None):
+
+    parser = argparse.ArgumentParser(prog = 'python -m emupy6502.bench.opcode_timings',
+                                     description = "Times each opcode in isolation.")
+    parser.add_argument('--iterations', type = int, default = 2000, help = "executions per opcode")
+    parser.add_argument('--repeats', type = int, default = 3, help = "best of this many timings")
+    parser.add_argument('--lanes', type = int, default = 64, help = "lockstep engine lanes")
+    parser.add_argument('--no-lockstep', action = 'store_true', help = "only time OpCode.execute")
+    parser.add_argument('--output', help = "save the timings as JSON here")
+    options = parser.parse_args(arguments)
+
+    timings = time_opcodes(iterations = options.iterations, lockstep = not options.no_lockstep,
+                           lanes = options.lanes, repeats = options.repeats)
+    print(format_table(timings))
+
+    if options.output:
+        with open(options.output, 'w') as output:
+            json.dump([timing._asdict() for timing in timings], output, indent = 2)
+
+
+if __name__ == '__main__':
+    main()
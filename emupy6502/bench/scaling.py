@@ -0,0 +1,49 @@
+import argparse
+import sys
+
+from emupy6502.batch import Job, gil_enabled, measure_scaling
+
+# Times the same CPU bound job on growing numbers of workers, threads and
+# then processes, to see how the batch runners scale. Threads only scale
+# on a free threaded build, where the GIL is off.
+
+PROGRAM_ADDRESS = 0x600
+
+# INX, BNE $0600, INY, BNE $0600, BRK: 65536 trips round the loop
+scaling_program = bytes([0xe8, 0xd0, 0xfd, 0xc8, 0xd0, 0xfa, 0x00])
+
+
+def scaling_job():
+
+    return Job([(PROGRAM_ADDRESS, scaling_program)], {'pc': PROGRAM_ADDRESS})
+
+def format_rows(rows):
+
+    return "\n".join("  workers:{0:3} time:{1:8.3f}s speedup:{2:6.2f}".format(workers, seconds, speedup)
+                     for workers, seconds, speedup in rows)
+
+
+def main(arguments = None):
+
+    parser = argparse.ArgumentParser(prog = 'python -m emupy6502.bench.scaling',
+                                     description = "Times a batch of jobs on growing numbers of workers.")
+    parser.add_argument('workers', nargs = '*', type = int,
+                        help = "worker counts to try, by default 1, 2, 4 and the CPU count")
+    parser.add_argument('--jobs-per-worker', type = int, default = 2)
+    parser.add_argument('--runner', choices = ('threads', 'processes', 'both'), default = 'both')
+    options = parser.parse_args(arguments)
+
+    print("GIL enabled: {0}".format(gil_enabled()))
+    for threaded in (True, False):
+        name = "threads" if threaded else "processes"
+        if options.runner not in (name, 'both'):
+            continue
+        print(name)
+        print(format_rows(measure_scaling(scaling_job(), options.workers or None, options.jobs_per_worker,
+                                          threaded)))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
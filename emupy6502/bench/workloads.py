@@ -0,0 +1,187 @@
+from emupy6502.cpu6502 import Cpu6502
+from emupy6502.memory_controller import MemoryController
+
+# Every workload is a loop that never ends, so the benchmark can give each
+# repetition the same fixed cycle budget through Cpu6502.run and get the
+# same instruction stream every time.
+
+# mult10 from the tests, A = 10 * 10 over and over
+#  0600 LDA #$0a
+#  0602 ASL
+#  0603 STA $0680
+#  0606 ASL
+#  0607 ASL
+#  0608 CLC
+#  0609 ADC $0680
+#  060c JMP $0600
+mult10_program = bytes([
+    0xa9, 0x0a, 0x0a, 0x8d, 0x80, 0x06, 0x0a, 0x0a, 0x18, 0x6d, 0x80, 0x06,
+    0x4c, 0x00, 0x06])
+
+# the 16 bit square root from the tests (less its BRK), run on 529 with
+# the inputs set up again each time round
+#  0600 LDA #$11
+#  0602 STA $f0
+#  0604 LDA #$02
+#  0606 STA $f1
+#  0608 <sqrt routine>
+#  0650 JMP $0600
+sqrt_routine = bytes([
+    0xa9, 0x00, 0x85, 0xf2, 0x85, 0xf3, 0x85, 0xf6, 0xa2, 0x08, 0x06, 0xf6, 0x06, 0xf0, 0x26, 0xf1,
+    0x26, 0xf2, 0x26, 0xf3, 0x06, 0xf0, 0x26, 0xf1, 0x26, 0xf2, 0x26, 0xf3, 0xa5, 0xf6, 0x85, 0xf4,
+    0xa9, 0x00, 0x85, 0xf5, 0x38, 0x26, 0xf4, 0x26, 0xf5, 0xa5, 0xf3, 0xc5, 0xf5, 0x90, 0x16, 0xd0,
+    0x06, 0xa5, 0xf2, 0xc5, 0xf4, 0x90, 0x0e, 0xa5, 0xf2, 0xe5, 0xf4, 0x85, 0xf2, 0xa5, 0xf3, 0xe5,
+    0xf5, 0x85, 0xf3, 0xe6, 0xf6, 0xca, 0xd0, 0xc2])
+sqrt_program = (bytes([0xa9, 0x11, 0x85, 0xf0, 0xa9, 0x02, 0x85, 0xf1]) + sqrt_routine +
+                bytes([0x4c, 0x00, 0x06]))
+
+# copies 1K from $1000 to $2000 through (zp),Y pointers
+#  0600 LDA #$00
+#  0602 STA $f0
+#  0604 STA $f2
+#  0606 LDA #$10
+#  0608 STA $f1
+#  060a LDA #$20
+#  060c STA $f3
+#  060e LDX #$04
+#  0610 LDY #$00
+#  0612 LDA ($f0),Y
+#  0614 STA ($f2),Y
+#  0616 INY
+#  0617 BNE $0612
+#  0619 INC $f1
+#  061b INC $f3
+#  061d DEX
+#  061e BNE $0612
+#  0620 JMP $0600
+memcopy_program = bytes([
+    0xa9, 0x00, 0x85, 0xf0, 0x85, 0xf2, 0xa9, 0x10, 0x85, 0xf1, 0xa9, 0x20, 0x85, 0xf3, 0xa2, 0x04,
+    0xa0, 0x00, 0xb1, 0xf0, 0x91, 0xf2, 0xc8, 0xd0, 0xf9, 0xe6, 0xf1, 0xe6, 0xf3, 0xca, 0xd0, 0xf2,
+    0x4c, 0x00, 0x06])
+
+# adds the 4 byte BCD number at $f4 into the one at $f0, both stored high
+# byte first, in decimal mode. Decimal mode isn't emulated, so the sums
+# come out binary, but the instruction mix is that of a BCD score or clock
+# counter.
+#  0600 SED
+#  0601 CLC
+#  0602 LDX #$03
+#  0604 LDA $f0,X
+#  0606 ADC $f4,X
+#  0608 STA $f0,X
+#  060a DEX
+#  060b BPL $0604
+#  060d CLD
+#  060e JMP $0600
+bcd_program = bytes([
+    0xf8, 0x18, 0xa2, 0x03, 0xb5, 0xf0, 0x75, 0xf4, 0x95, 0xf0, 0xca, 0x10, 0xf7, 0xd8, 0x4c, 0x00,
+    0x06])
+
+# bubble sorts a fresh copy of the 32 bytes at $1000 in zero page at $80
+#  0600 LDX #$1f
+#  0602 LDA $1000,X
+#  0605 STA $80,X
+#  0607 DEX
+#  0608 BPL $0602
+#  060a LDY #$00         ; nothing swapped yet
+#  060c LDX #$00
+#  060e LDA $80,X
+#  0610 CMP $81,X
+#  0612 BCC $0622        ; already in order
+#  0614 BEQ $0622
+#  0616 STA $f0          ; swap the pair
+#  0618 LDA $81,X
+#  061a STA $80,X
+#  061c LDA $f0
+#  061e STA $81,X
+#  0620 LDY #$01
+#  0622 INX
+#  0623 CPX #$1f
+#  0625 BNE $060e
+#  0627 DEY
+#  0628 BEQ $060a        ; go again if anything moved
+#  062a JMP $0600
+sort_program = bytes([
+    0xa2, 0x1f, 0xbd, 0x00, 0x10, 0x95, 0x80, 0xca, 0x10, 0xf8, 0xa0, 0x00, 0xa2, 0x00, 0xb5, 0x80,
+    0xd5, 0x81, 0x90, 0x0e, 0xf0, 0x0c, 0x85, 0xf0, 0xb5, 0x81, 0x95, 0x80, 0xa5, 0xf0, 0x95, 0x81,
+    0xa0, 0x01, 0xe8, 0xe0, 0x1f, 0xd0, 0xe7, 0x88, 0xf0, 0xe0, 0x4c, 0x00, 0x06])
+sort_data = bytes((index * 113 + 71) & 0xff for index in range(32))
+
+# waits on the ready bit of a device's status register, then reads its
+# data register into a 256 byte buffer at $0200
+#  0600 LDX #$00
+#  0602 LDA $d000
+#  0605 AND #$80
+#  0607 BEQ $0602
+#  0609 LDA $d001
+#  060c STA $0200,X
+#  060f INX
+#  0610 BNE $0602
+#  0612 JMP $0600
+polling_program = bytes([
+    0xa2, 0x00, 0xad, 0x00, 0xd0, 0x29, 0x80, 0xf0, 0xf9, 0xad, 0x01, 0xd0, 0x9d, 0x00, 0x02, 0xe8,
+    0xd0, 0xf0, 0x4c, 0x00, 0x06])
+
+DEVICE_STATUS = 0xd000
+DEVICE_DATA = 0xd001
+DEVICE_READY = 0x80
+
+
+class PollingDeviceMemoryController(MemoryController):
+
+    # a device whose status register reports ready on every
+    # polls_per_byte'th read, handing out a counting byte each time
+    def __init__(self, polls_per_byte = 4):
+
+        super(PollingDeviceMemoryController, self).__init__(65536)
+        self.polls_per_byte = polls_per_byte
+        self.polls = 0
+        self.data = 0
+
+    def read(self, address):
+
+        if address == DEVICE_STATUS:
+            self.polls += 1
+            return DEVICE_READY if self.polls % self.polls_per_byte == 0 else 0
+
+        if address == DEVICE_DATA:
+            self.data = (self.data + 1) & 0xff
+            return self.data
+
+        return self.buffer[address]
+
+
+class Workload(object):
+
+    def __init__(self, name, description, program, data = (), memory_controller = None):
+
+        # data is (address, bytes) pairs loaded alongside the program,
+        # memory_controller a factory for the controller to run on
+        self.name = name
+        self.description = description
+        self.program = program
+        self.data = data
+        self.memory_controller = memory_controller or (lambda: MemoryController(65536))
+
+    def build(self):
+
+        # a fresh CPU with the workload loaded and ready to run
+        memory_controller = self.memory_controller()
+        cpu = Cpu6502(memory_controller)
+        memory_controller.load_binary(self.program, 0x600, cpu)
+        for address, data in self.data:
+            memory_controller.load_binary(data, address)
+        return cpu
+
+
+workloads = (
+    Workload('mult10', "multiply by 10 with shifts and an add", mult10_program),
+    Workload('sqrt', "16 bit integer square root", sqrt_program),
+    Workload('memcopy', "1K block copy through (zp),Y", memcopy_program),
+    Workload('bcd', "4 byte add in decimal mode", bcd_program),
+    Workload('sort', "bubble sort of 32 bytes", sort_program, ((0x1000, sort_data),)),
+    Workload('polling', "polled reads from a memory mapped device", polling_program,
+             memory_controller = PollingDeviceMemoryController),
+)
+
+workloads_by_name = {workload.name: workload for workload in workloads}
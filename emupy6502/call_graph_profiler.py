@@ -0,0 +1,154 @@
+from collections import namedtuple
+
+from emupy6502.symbols import hex_name
+
+BRK = 0x00
+JSR = 0x20
+RTI = 0x40
+RTS = 0x60
+
+# calls: times entered; inclusive counts a recursive subroutine's cycles
+# only once, for its outermost activation
+SubroutineProfile = namedtuple('SubroutineProfile', 'address calls inclusive exclusive')
+
+
+class Frame(object):
+
+    __slots__ = ('address', 'sp', 'start_cycles', 'path')
+
+    def __init__(self, address, sp, start_cycles, path):
+
+        self.address = address
+        # the stack pointer inside the call, which the matching RTS or RTI
+        # finds the stack at
+        self.sp = sp
+        self.start_cycles = start_cycles
+        self.path = path
+
+
+class CallGraphProfiler(object):
+
+    # Single steps a Cpu6502 and keeps a shadow call stack: JSR and BRK
+    # push a frame for the code they enter, RTS and RTI pop it. Every
+    # instruction's cycles go to the frame running it (a JSR's to the
+    # caller, an RTS's to the callee) and to the path of frames leading to
+    # it, which is what folded stack output is made of. Code that unwinds
+    # the stack itself (PLA PLA, or TXS) is coped with by popping every
+    # frame whose stack pointer the RTS or RTI finds the stack above.
+    # Frames are named by name(address), $xxxx unless a symbol lookup such
+    # as SymbolTable.name is given.
+    def __init__(self, cpu, name = hex_name, root = 'main'):
+
+        self.cpu = cpu
+        self.name = name
+        self.root = root
+
+        self.cycles = 0
+        self.calls = {}
+        self.inclusive = {}
+        self.exclusive = {}
+        # (path of frame addresses from the root) -> exclusive cycles
+        self.folded = {}
+        self.frames = [Frame(None, None, 0, ())]
+        self._active = {}
+
+    def _enter(self, address, sp):
+
+        path = self.frames[-1].path + (address,)
+        self.frames.append(Frame(address, sp, self.cycles, path))
+        self.calls[address] = self.calls.get(address, 0) + 1
+        self._active[address] = self._active.get(address, 0) + 1
+
+    def _leave(self):
+
+        frame = self.frames.pop()
+        active = self._active[frame.address] - 1
+        self._active[frame.address] = active
+        if not active:
+            self.inclusive[frame.address] = self.inclusive.get(frame.address, 0) + self.cycles - frame.start_cycles
+
+    def step(self):
+
+        cpu = self.cpu
+        registers = cpu.registers
+        # peeked, so the profiler doesn't add a read of its own
+        opcode = cpu.memory_controller.peek(registers.pc)
+        sp = registers.sp
+
+        frame = self.frames[-1]
+        cycles = cpu.step()
+        if cpu.stop_reason is not None:
+            # the quotas stopped it, nothing ran so there is nothing to record
+            return 0
+        self.cycles += cycles
+
+        if frame.address is not None:
+            self.exclusive[frame.address] = self.exclusive.get(frame.address, 0) + cycles
+        self.folded[frame.path] = self.folded.get(frame.path, 0) + cycles
+
+        if opcode == JSR or opcode == BRK:
+            self._enter(registers.pc, registers.sp)
+        elif opcode == RTS or opcode == RTI:
+            # the callee's frame was made with the stack at sp
+            while len(self.frames) > 1 and self.frames[-1].sp <= sp:
+                self._leave()
+
+        return cycles
+
+    def run(self, cycles = None, signal = None):
+
+        # steps until cycles have run, signal() returns True or the CPU's
+        # quotas stop it
+        start = self.cycles
+        while cycles is None or self.cycles - start < cycles:
+            if signal is not None and signal():
+                break
+            self.step()
+            if self.cpu.stop_reason is not None:
+                break
+
+        return self.cycles - start
+
+    def subroutines(self):
+
+        # SubroutineProfiles, biggest inclusive first. Subroutines still
+        # running count what they have used so far.
+        inclusive = dict(self.inclusive)
+        counted = set()
+        for frame in self.frames[1:]:
+            if frame.address not in counted:
+                counted.add(frame.address)
+                inclusive[frame.address] = inclusive.get(frame.address, 0) + self.cycles - frame.start_cycles
+
+        profiles = [SubroutineProfile(address, self.calls[address], inclusive.get(address, 0),
+                                      self.exclusive.get(address, 0))
+                    for address in self.calls]
+        return sorted(profiles, key = lambda profile: (-profile.inclusive, profile.address))
+
+    def folded_lines(self):
+
+        # one "root;caller;callee cycles" line per call path, the format
+        # flamegraph.pl and speedscope read
+        lines = []
+        for path, cycles in sorted(self.folded.items()):
+            names = [self.root] + [self.name(address) for address in path]
+            lines.append("{0} {1}".format(";".join(names), cycles))
+        return lines
+
+    def write_folded(self, output):
+
+        # output is a filename or an open text file
+        if isinstance(output, str):
+            with open(output, 'w') as output_file:
+                return self.write_folded(output_file)
+
+        for line in self.folded_lines():
+            output.write(line + "\n")
+
+    def report(self, top = 20):
+
+        lines = ["{0:24} {1:>8} {2:>12} {3:>12}".format("subroutine", "calls", "inclusive", "exclusive")]
+        for profile in self.subroutines()[:top]:
+            lines.append("{0:24} {1:8} {2:12} {3:12}".format(
+                self.name(profile.address), profile.calls, profile.inclusive, profile.exclusive))
+        return "\n".join(lines)
@@ -0,0 +1,201 @@
+from emupy6502.memory_controller import MemoryController
+from emupy6502.opcodes import shared_opcodes
+from emupy6502.registers import Registers
+
+BRK = 0x00
+BRANCH_OPCODES = frozenset((0x10, 0x30, 0x50, 0x70, 0x90, 0xb0, 0xd0, 0xf0))
+
+# histogram slots per opcode, indexed by the extra cycles it took: 0 or
+# 1 for a page crossing, up to 2 for a branch taken across a page
+EXTRA_SLOTS = 4
+
+
+class AccessCountingMemoryController(MemoryController):
+
+    def __init__(self):
+
+        super(AccessCountingMemoryController, self).__init__(65536)
+        self.reads = 0
+        self.writes = 0
+
+    def read(self, address):
+
+        self.reads += 1
+        return self.buffer[address]
+
+    def write(self, address, value):
+
+        self.writes += 1
+        self.buffer[address] = value
+
+
+def measure_accesses():
+
+    # (reads, writes) per opcode, found by running each one once, opcode
+    # fetch included. No handler here varies its accesses with the data,
+    # so one run gives the count for every run.
+    table = []
+    for opcode in range(256):
+        memory_controller = AccessCountingMemoryController()
+        memory_controller.buffer[0x600:0x603] = bytes([opcode, 0x10, 0x02])
+        registers = Registers()
+        registers.pc = 0x601
+        memory_controller.reads = 1
+        try:
+            shared_opcodes.execute(opcode, registers, memory_controller)
+        except KeyError:
+            # unimplemented, it never gets past the fetch
+            memory_controller.reads = 1
+        table.append((memory_controller.reads, memory_controller.writes))
+
+    return tuple(table)
+
+_access_table = None
+
+def access_table():
+
+    # measured the first time it is needed rather than on import
+    global _access_table
+    if _access_table is None:
+        _access_table = measure_accesses()
+    return _access_table
+
+
+class PerformanceCounters(object):
+
+    # Instructions and cycles are added once per block of execution (a
+    # run, run_for or run_until_signalled call, an async slice, a step),
+    # so keeping them costs nothing per instruction. The detailed counters
+    # (branches, page crossings, reads and writes, interrupts) all come
+    # from one histogram of (opcode, extra cycles), which is only kept
+    # when detailed is set, as it costs a list increment per instruction.
+    # Those read as None otherwise. Hosts that skip over idle loops rather
+    # than emulate them record what they skipped with skip_idle.
+    def __init__(self, detailed = False):
+
+        self.detailed = detailed
+        self.histogram = [0] * (256 * EXTRA_SLOTS) if detailed else None
+        self.reset()
+
+    def reset(self):
+
+        self.instructions = 0
+        self.cycles = 0
+        self.idle_skipped_cycles = 0
+        # zeroed in place, executes from counting() keep filling it in
+        if self.histogram is not None:
+            self.histogram[:] = [0] * len(self.histogram)
+
+    def add_block(self, instructions, cycles):
+
+        self.instructions += instructions
+        self.cycles += cycles
+
+    def skip_idle(self, cycles):
+
+        self.idle_skipped_cycles += cycles
+
+    def counting(self, execute):
+
+        # the execute to use in an instruction loop, which fills in the
+        # histogram when detailed
+        histogram = self.histogram
+        if histogram is None:
+            return execute
+
+        def counting_execute(opcode, registers, memory_controller):
+            cycles = execute(opcode, registers, memory_controller)
+            histogram[opcode * EXTRA_SLOTS + registers.extra_cycles] += 1
+            return cycles
+
+        return counting_execute
+
+    def _by_extra(self, opcode):
+
+        base = opcode * EXTRA_SLOTS
+        return self.histogram[base:base + EXTRA_SLOTS]
+
+    def opcode_counts(self):
+
+        if self.histogram is None:
+            return None
+        return [sum(self._by_extra(opcode)) for opcode in range(256)]
+
+    def extra_cycle_counts(self):
+
+        # {extra cycles: instructions that took that many}
+        if self.histogram is None:
+            return None
+
+        counts = {}
+        for index, count in enumerate(self.histogram):
+            if count:
+                extra = index % EXTRA_SLOTS
+                counts[extra] = counts.get(extra, 0) + count
+        return counts
+
+    @property
+    def branches_taken(self):
+
+        if self.histogram is None:
+            return None
+        return sum(sum(self._by_extra(opcode)[1:]) for opcode in BRANCH_OPCODES)
+
+    @property
+    def branches_not_taken(self):
+
+        if self.histogram is None:
+            return None
+        return sum(self._by_extra(opcode)[0] for opcode in BRANCH_OPCODES)
+
+    @property
+    def page_cross_penalties(self):
+
+        # a taken branch pays one cycle for being taken, a second for
+        # crossing a page; everything else only pays for crossing
+        if self.histogram is None:
+            return None
+
+        penalties = 0
+        for opcode in range(256):
+            first_penalty = 2 if opcode in BRANCH_OPCODES else 1
+            penalties += sum(self._by_extra(opcode)[first_penalty:])
+        return penalties
+
+    @property
+    def reads(self):
+
+        if self.histogram is None:
+            return None
+        table = access_table()
+        return sum(count * table[opcode][0] for opcode, count in enumerate(self.opcode_counts()))
+
+    @property
+    def writes(self):
+
+        if self.histogram is None:
+            return None
+        table = access_table()
+        return sum(count * table[opcode][1] for opcode, count in enumerate(self.opcode_counts()))
+
+    @property
+    def interrupts(self):
+
+        # BRK is the only interrupt the emulator services so far
+        if self.histogram is None:
+            return None
+        return sum(self._by_extra(BRK))
+
+    def as_dict(self):
+
+        return {
+            'instructions': self.instructions,
+            'cycles': self.cycles,
+            'branches_taken': self.branches_taken,
+            'branches_not_taken': self.branches_not_taken,
+            'page_cross_penalties': self.page_cross_penalties,
+            'reads': self.reads,
+            'writes': self.writes,
+            'interrupts': self.interrupts,
+            'idle_skipped_cycles': self.idle_skipped_cycles,
+        }
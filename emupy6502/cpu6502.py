@@ -1,5 +1,20 @@
+import asyncio
+import time
+
+from collections import namedtuple
+
+from emupy6502.counters import PerformanceCounters
 from emupy6502.registers import Registers
-from emupy6502.opcodes import OpCode
+from emupy6502.opcodes import shared_opcodes
+from emupy6502.quotas import QuotaExceeded
+
+# cycles and instructions actually run by a call to Cpu6502.run and the
+# cycles it went past its budget, which the next call will make up for
+RunResult = namedtuple('RunResult', 'cycles instructions overshoot')
+
+# what Cpu6502.run_for got through before its deadline and the wall clock
+# time it actually took
+DeadlineResult = namedtuple('DeadlineResult', 'cycles instructions elapsed')
 
 
 class Cpu6502(object):
@@ -9,23 +24,364 @@ class Cpu6502(object):
         self.registers = Registers()
 
         self.memory_controller = memory_controller
-        self.opcodes = OpCode()
-	
+        self.opcodes = shared_opcodes
+        self.total_cycles = 0
+        self.overshoot = 0
+
+        # optional Quotas for untrusted guests, enforced by every way of
+        # running the CPU. When one runs out it stops early and leaves the
+        # StopReason in stop_reason. An instruction whose write is refused
+        # is undone (every register and the write count put back) and
+        # counts for nothing, so raising the quota and carrying on runs it
+        # again.
+        self.quotas = None
+        self.stop_reason = None
+
+        # replace with PerformanceCounters(detailed = True) for the
+        # histogram based counters
+        self.counters = PerformanceCounters()
+
+    # the execute every instruction goes through is built once, when the
+    # counters are set, rather than per step or per run
+    @property
+    def counters(self):
+
+        return self._counters
+
+    @counters.setter
+    def counters(self, counters):
+
+        self._counters = counters
+        self._execute = counters.counting(self.opcodes.execute)
+
+    # the dispatch tables are shared, so only the machine state is pickled
+    def __getstate__(self):
+
+        return (self.registers, self.memory_controller, self.total_cycles, self.overshoot, self.quotas,
+                self.counters)
+
+    def __setstate__(self, state):
+
+        self.opcodes = shared_opcodes
+        (self.registers, self.memory_controller, self.total_cycles, self.overshoot, self.quotas,
+         self.counters) = state
+        self.stop_reason = None
+
+    def _refuse(self, exceeded, state, writes_used):
+
+        # a write quota stopped an instruction part way through, state is
+        # the registers as they were before it, flags included, which
+        # read-modify-write handlers have already changed by the time they
+        # write
+        self.registers.__setstate__(state)
+        self.quotas.writes_used = writes_used
+        self.stop_reason = exceeded.reason
+
+    def step(self):
+
+        # exactly one instruction, returns the cycles it took
+        if self.quotas is not None:
+            return self._step_with_quotas()
+
+        opcode = self.memory_controller.read(self.registers.pc)
+        self.registers.pc += 1
+        cycles = self._execute(opcode, self.registers, self.memory_controller)
+        self.counters.add_block(1, cycles)
+        return cycles
+
+    def _step_with_quotas(self):
+
+        # returns 0 without running anything once the instruction or
+        # cycle quota is used up, or when the instruction's write is refused
+        quotas = self.quotas
+        self.stop_reason = quotas.exhausted()
+        if self.stop_reason is not None:
+            return 0
+
+        memory_controller = quotas.guard(self.memory_controller)
+        registers = self.registers
+        state = registers.__getstate__()
+        writes_used = quotas.writes_used
+        try:
+            opcode = memory_controller.read(registers.pc)
+            registers.pc += 1
+            cycles = self._execute(opcode, registers, memory_controller)
+        except QuotaExceeded as exceeded:
+            self._refuse(exceeded, state, writes_used)
+            return 0
+
+        quotas.charge(1, cycles)
+        self.counters.add_block(1, cycles)
+        return cycles
+
     def run(self, cycles):
 
-        while cycles > 0:
-            opcode = self.memory_controller.read(self.pc)
-            self.registers.pc += 1            
-            cycle_count = OpCode.execute(opcode, self.registers, self.memory_controller)
-            cycles = cycles - cycle_count
+        # Runs whole instructions until the budget is used up. Instructions
+        # can't be split, so the last one usually runs past the budget; that
+        # overshoot is taken off the next call's budget, so back to back
+        # calls of N cycles stay in step with N cycles per call on average.
+        self.stop_reason = None
+        if self.quotas is not None:
+            return self._run_with_quotas(cycles)
+
+        memory_controller = self.memory_controller
+        registers = self.registers
+        execute = self._execute
+
+        budget = cycles - self.overshoot
+        consumed = 0
+        instructions = 0
+        while consumed < budget:
+            opcode = memory_controller.read(registers.pc)
+            registers.pc += 1
+            consumed += execute(opcode, registers, memory_controller)
+            instructions += 1
+
+        self.counters.add_block(instructions, consumed)
+
+        # if the carried overshoot exceeded the whole budget, nothing ran
+        # and what is left of it carries on to the call after
+        self.overshoot = consumed - budget
+        return RunResult(consumed, instructions, self.overshoot)
+
+    def _run_with_quotas(self, cycles):
+
+        quotas = self.quotas
+        memory_controller = quotas.guard(self.memory_controller)
+        registers = self.registers
+        execute = self._execute
+
+        # quotas just shrink the budgets
+        budget = cycles - self.overshoot
+        limit = min(budget, quotas.remaining_cycles())
+        instruction_limit = quotas.remaining_instructions()
+
+        consumed = 0
+        instructions = 0
+        try:
+            while consumed < limit and instructions < instruction_limit:
+                state = registers.__getstate__()
+                writes_used = quotas.writes_used
+                opcode = memory_controller.read(registers.pc)
+                registers.pc += 1
+                consumed += execute(opcode, registers, memory_controller)
+                instructions += 1
+        except QuotaExceeded as exceeded:
+            self._refuse(exceeded, state, writes_used)
+
+        self.counters.add_block(instructions, consumed)
+        quotas.charge(instructions, consumed)
+
+        if self.stop_reason is not None or consumed < budget:
+            self.stop_reason = self.stop_reason or quotas.exhausted()
+            # stopped short of the budget, there is nothing to carry
+            self.overshoot = 0
+            return RunResult(consumed, instructions, 0)
+
+        self.overshoot = consumed - budget
+        return RunResult(consumed, instructions, self.overshoot)
+
+    def run_for(self, seconds, check_interval = 1000, clock = time.perf_counter):
+
+        # Runs until the host clock passes seconds from now, reading the
+        # clock only every check_interval instructions so the loop itself
+        # stays as tight as run's. The CPU is left between instructions, so
+        # calling again simply carries on.
+        self.stop_reason = None
+        if self.quotas is not None:
+            return self._run_for_with_quotas(seconds, check_interval, clock)
+
+        memory_controller = self.memory_controller
+        registers = self.registers
+        execute = self._execute
+
+        start = clock()
+        deadline = start + seconds
+        consumed = 0
+        instructions = 0
+        now = start
+        while now < deadline:
+            for _ in range(check_interval):
+                opcode = memory_controller.read(registers.pc)
+                registers.pc += 1
+                consumed += execute(opcode, registers, memory_controller)
+
+            instructions += check_interval
+            now = clock()
+
+        self.counters.add_block(instructions, consumed)
+        return DeadlineResult(consumed, instructions, now - start)
+
+    def _run_for_with_quotas(self, seconds, check_interval, clock):
+
+        quotas = self.quotas
+        memory_controller = quotas.guard(self.memory_controller)
+        registers = self.registers
+        execute = self._execute
+
+        instruction_limit = quotas.remaining_instructions()
+        cycle_limit = quotas.remaining_cycles()
+
+        start = clock()
+        deadline = start + seconds
+        consumed = 0
+        instructions = 0
+        now = start
+        exhausted = False
+        try:
+            while now < deadline and not exhausted:
+                for _ in range(check_interval):
+                    if instructions >= instruction_limit or consumed >= cycle_limit:
+                        exhausted = True
+                        break
+
+                    state = registers.__getstate__()
+                    writes_used = quotas.writes_used
+                    opcode = memory_controller.read(registers.pc)
+                    registers.pc += 1
+                    consumed += execute(opcode, registers, memory_controller)
+                    instructions += 1
+
+                now = clock()
+        except QuotaExceeded as exceeded:
+            self._refuse(exceeded, state, writes_used)
+            now = clock()
+
+        quotas.charge(instructions, consumed)
+        self.counters.add_block(instructions, consumed)
+
+        if exhausted:
+            self.stop_reason = quotas.exhausted()
+
+        return DeadlineResult(consumed, instructions, now - start)
 
     def run_until_signalled(self, signal):
 
+        self.stop_reason = None
+        if self.quotas is not None:
+            return self._run_until_signalled_with_quotas(signal)
+
+        memory_controller = self.memory_controller
+        execute = self._execute
+        self.total_cycles = 0
+        instructions = 0
+        try:
+            while not signal():
+                opcode = memory_controller.read(self.registers.pc)
+                self.registers.pc += 1
+                self.total_cycles += execute(opcode, self.registers, self.memory_controller)
+                instructions += 1
+        finally:
+            # the signal or a guest error can end the block
+            self.counters.add_block(instructions, self.total_cycles)
+
+        return self.total_cycles
+
+    def _run_until_signalled_with_quotas(self, signal):
+
+        quotas = self.quotas
+        memory_controller = quotas.guard(self.memory_controller)
+        registers = self.registers
+        execute = self._execute
+
+        instruction_limit = quotas.remaining_instructions()
+        cycle_limit = quotas.remaining_cycles()
+
+        self.total_cycles = 0
+        instructions = 0
+        exhausted = False
+        try:
+            while not signal():
+                if instructions >= instruction_limit or self.total_cycles >= cycle_limit:
+                    exhausted = True
+                    break
+
+                state = registers.__getstate__()
+                writes_used = quotas.writes_used
+                opcode = memory_controller.read(registers.pc)
+                registers.pc += 1
+                self.total_cycles += execute(opcode, registers, memory_controller)
+                instructions += 1
+        except QuotaExceeded as exceeded:
+            # the write was refused part way through an instruction
+            self._refuse(exceeded, state, writes_used)
+        finally:
+            quotas.charge(instructions, self.total_cycles)
+            self.counters.add_block(instructions, self.total_cycles)
+
+        if exhausted:
+            self.stop_reason = quotas.exhausted()
+
+        return self.total_cycles
+
+    async def run_async(self, signal = None, slice_cycles = 10000):
+
+        # as run_until_signalled, but hands control back to the event loop
+        # every slice_cycles cycles. Without a signal it runs until the task
+        # is cancelled, or a quota runs out.
+        self.stop_reason = None
+        if self.quotas is not None:
+            return await self._run_async_with_quotas(signal, slice_cycles)
+
         memory_controller = self.memory_controller
+        registers = self.registers
+        execute = self._execute
+        counters = self.counters
+
         self.total_cycles = 0
-        while not signal():
-            opcode = memory_controller.read(self.registers.pc)
-            self.registers.pc += 1
-            self.total_cycles += self.opcodes.execute(opcode, self.registers, self.memory_controller)
+        while True:
+            slice_start = self.total_cycles
+            slice_end = slice_start + slice_cycles
+            instructions = 0
+            try:
+                while self.total_cycles < slice_end:
+                    if signal is not None and signal():
+                        return self.total_cycles
+
+                    opcode = memory_controller.read(registers.pc)
+                    registers.pc += 1
+                    self.total_cycles += execute(opcode, registers, memory_controller)
+                    instructions += 1
+            finally:
+                counters.add_block(instructions, self.total_cycles - slice_start)
+
+            await asyncio.sleep(0)
+
+    async def _run_async_with_quotas(self, signal, slice_cycles):
+
+        quotas = self.quotas
+        memory_controller = quotas.guard(self.memory_controller)
+        registers = self.registers
+        execute = self._execute
+        counters = self.counters
+
+        self.total_cycles = 0
+        while True:
+            slice_start = self.total_cycles
+            # a slice never runs past what is left of the quotas
+            slice_end = slice_start + min(slice_cycles, quotas.remaining_cycles())
+            instruction_limit = quotas.remaining_instructions()
+            instructions = 0
+            try:
+                while self.total_cycles < slice_end and instructions < instruction_limit:
+                    if signal is not None and signal():
+                        return self.total_cycles
+
+                    state = registers.__getstate__()
+                    writes_used = quotas.writes_used
+                    opcode = memory_controller.read(registers.pc)
+                    registers.pc += 1
+                    self.total_cycles += execute(opcode, registers, memory_controller)
+                    instructions += 1
+            except QuotaExceeded as exceeded:
+                self._refuse(exceeded, state, writes_used)
+                return self.total_cycles
+            finally:
+                quotas.charge(instructions, self.total_cycles - slice_start)
+                counters.add_block(instructions, self.total_cycles - slice_start)
+
+            self.stop_reason = quotas.exhausted()
+            if self.stop_reason is not None:
+                return self.total_cycles
 
-        return self.total_cycles
\ No newline at end of file
+            await asyncio.sleep(0)
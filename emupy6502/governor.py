@@ -0,0 +1,95 @@
+import time
+
+from collections import namedtuple
+
+# achieved_mhz: emulated cycles per wall clock microsecond over the run
+# headroom: fraction of wall clock time spent sleeping, 0 means flat out
+# drift: seconds the emulation is behind (positive) or ahead of real time
+GovernorReport = namedtuple('GovernorReport', 'cycles elapsed achieved_mhz headroom drift')
+
+
+class SpeedGovernor(object):
+
+    # Holds a Cpu6502 to a target clock speed by running it in bursts and
+    # sleeping off whatever time each burst saved. Sleeps are worked out
+    # against an absolute schedule (start time plus cycles run / clock
+    # rate) rather than per burst, so sleep overruns and jitter do not
+    # accumulate. If the host falls more than max_lag seconds behind, the
+    # schedule is moved up to now instead of letting the machine sprint to
+    # catch up.
+    def __init__(self, cpu, mhz = 1.023, burst_cycles = None, max_lag = 0.1,
+                 clock = time.perf_counter, sleep = time.sleep):
+
+        self.cpu = cpu
+        self.hz = mhz * 1000000
+        # default to a 60th of a second of emulated time per burst
+        self.burst_cycles = burst_cycles or max(1, int(self.hz / 60))
+        self.max_lag = max_lag
+        self.clock = clock
+        self.sleep = sleep
+
+        self.cycles = 0
+        self.slept = 0.0
+        self.elapsed = 0.0
+        self.resyncs = 0
+        self._schedule_start = None
+        self._schedule_cycles = 0
+
+    def run(self, seconds = None, cycles = None):
+
+        # runs for seconds of wall clock time or cycles emulated cycles,
+        # whichever comes first, or until the CPU's quotas stop it, and
+        # reports on the whole governed run
+        if seconds is None and cycles is None:
+            raise ValueError("give seconds, cycles or both")
+
+        now = self.clock()
+        # time outside run doesn't count, the schedule restarts from here
+        self._schedule_start = now
+        self._schedule_cycles = 0
+        run_start = now
+        start_cycles = self.cycles
+
+        while True:
+            if seconds is not None and now - run_start >= seconds:
+                break
+            if cycles is not None and self.cycles - start_cycles >= cycles:
+                break
+
+            burst = self.burst_cycles
+            if cycles is not None:
+                burst = min(burst, cycles - (self.cycles - start_cycles))
+
+            consumed = self.cpu.run(burst).cycles
+            self.cycles += consumed
+            self._schedule_cycles += consumed
+            if self.cpu.stop_reason is not None:
+                # stopped by its quotas, running again would only spin
+                now = self.clock()
+                break
+
+            target = self._schedule_start + self._schedule_cycles / self.hz
+            now = self.clock()
+            if now < target:
+                self.sleep(target - now)
+                self.slept += target - now
+                now = self.clock()
+            elif now - target > self.max_lag:
+                self._schedule_start = now
+                self._schedule_cycles = 0
+                self.resyncs += 1
+
+        self.elapsed += now - run_start
+        return self.report()
+
+    def report(self):
+
+        elapsed = self.elapsed
+        if not elapsed:
+            return GovernorReport(self.cycles, 0.0, 0.0, 0.0, 0.0)
+
+        return GovernorReport(self.cycles,
+                              elapsed,
+                              self.cycles / elapsed / 1000000,
+                              self.slept / elapsed,
+                              elapsed - self.cycles / self.hz)
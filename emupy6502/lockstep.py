@@ -0,0 +1,450 @@
+import numpy
+
+from emupy6502 import addressing_modes
+from emupy6502.addressing_modes import AddressingModes
+from emupy6502.opcodes import OpCode
+from emupy6502.registers import Registers
+
+# Runs N copies of the same machine in lockstep, one instruction per lane
+# per step. Every register is an array with one entry per lane and every
+# lane has its own memory, a row of a (lanes x memory size) array. Each
+# step the active lanes are grouped by the opcode under their PC and each
+# group is executed as a handful of whole array operations, so lanes that
+# have gone different ways at a branch simply end up in different groups.
+# A lane halts when it reaches BRK or one of stop_addresses, so BRK's
+# push and vector are never run, but RTI is, pulling the status as
+# Registers.set_status_register does. Semantics follow opcodes.py and
+# addressing_modes.py exactly, quirks included.
+#
+# Memory is lanes x memory_size bytes and the default memory_size is the
+# full 64K, so a sweep of 20000 inputs would need 1.3GB. Programs that
+# only touch low memory should pass the smallest memory_size that holds
+# their code and data (a routine at $0600 with its zero page needs
+# 0x800, 20000 lanes of which are 40MB). An address past memory_size
+# raises IndexError. python -m emupy6502.bench.lockstep compares the
+# engine with separate Cpu6502s; the engine only pulls ahead once there
+# are a thousand or so inputs to spread each step's overhead across.
+
+
+def fetch(engine, lanes, address):
+    return engine.memory[lanes, address].astype(numpy.int32)
+
+def operand_byte(engine, lanes):
+    pc = engine.pc[lanes]
+    engine.pc[lanes] = pc + 1
+    return fetch(engine, lanes, pc)
+
+def operand_word(engine, lanes):
+    pc = engine.pc[lanes]
+    engine.pc[lanes] = pc + 2
+    return fetch(engine, lanes, pc), fetch(engine, lanes, pc + 1)
+
+#################################################################################
+# ADDRESSING MODES
+#
+# each returns the operand, a value or an address exactly as the scalar
+# mode would, and the page crossing penalty
+
+def imp(engine, lanes):
+    return None, 0
+
+def imm(engine, lanes):
+    return operand_byte(engine, lanes), 0
+
+def ind(engine, lanes):
+    low_address, high_address = operand_word(engine, lanes)
+    low_result = fetch(engine, lanes, (high_address << 8) + low_address)
+    # deal with the indirect 'quirk' where it cannot straddle pages
+    low_address = numpy.where(low_address == 0xff, 0, low_address + 1)
+    high_result = fetch(engine, lanes, (high_address << 8) + low_address)
+    return (high_result << 8) + low_result, 0
+
+def indx(engine, lanes):
+    zp_address = operand_byte(engine, lanes) + engine.x_index[lanes]
+    low_address = fetch(engine, lanes, zp_address & 0xff)
+    high_address = fetch(engine, lanes, (zp_address + 1) & 0xff)
+    return (high_address << 8) + low_address, 0
+
+def indy(engine, lanes):
+    zp_address = operand_byte(engine, lanes)
+    low_address = fetch(engine, lanes, zp_address)
+    high_address = fetch(engine, lanes, (zp_address + 1) & 0xff)
+    low_address += engine.y_index[lanes]
+    return (high_address << 8) + low_address, (low_address > 255).astype(numpy.int32)
+
+def zpW(engine, lanes):
+    return operand_byte(engine, lanes), 0
+
+def zp(engine, lanes):
+    return fetch(engine, lanes, operand_byte(engine, lanes)), 0
+
+def zpxW(engine, lanes):
+    return (operand_byte(engine, lanes) + engine.x_index[lanes]) & 0xff, 0
+
+def zpx(engine, lanes):
+    return fetch(engine, lanes, zpxW(engine, lanes)[0]), 0
+
+def zpyW(engine, lanes):
+    return (operand_byte(engine, lanes) + engine.y_index[lanes]) & 0xff, 0
+
+def zpy(engine, lanes):
+    return fetch(engine, lanes, zpyW(engine, lanes)[0]), 0
+
+def absoW(engine, lanes):
+    low_address, high_address = operand_word(engine, lanes)
+    return (high_address << 8) + low_address, 0
+
+def abso(engine, lanes):
+    return fetch(engine, lanes, absoW(engine, lanes)[0]), 0
+
+def indexed(engine, lanes, index):
+    low_address, high_address = operand_word(engine, lanes)
+    low_address += index[lanes]
+    return (high_address << 8) + low_address, (low_address > 255).astype(numpy.int32)
+
+def absx(engine, lanes):
+    return indexed(engine, lanes, engine.x_index)
+
+def absy(engine, lanes):
+    return indexed(engine, lanes, engine.y_index)
+
+modes = {
+    addressing_modes.imp: imp,
+    addressing_modes.acc: imp,
+    addressing_modes.imm: imm,
+    addressing_modes.rel: imm,
+    addressing_modes.ind: ind,
+    addressing_modes.indx: indx,
+    addressing_modes.indy: indy,
+    addressing_modes.zpW: zpW,
+    addressing_modes.zp: zp,
+    addressing_modes.zpxW: zpxW,
+    addressing_modes.zpx: zpx,
+    addressing_modes.zpyW: zpyW,
+    addressing_modes.zpy: zpy,
+    addressing_modes.absoW: absoW,
+    addressing_modes.abso: abso,
+    addressing_modes.absx: absx,
+    addressing_modes.absy: absy,
+}
+
+#################################################################################
+# OPERATIONS
+#
+# each returns any extra cycles taken
+
+def set_NZ(engine, lanes, value):
+    engine.negative_flag[lanes] = (value & 0x80) != 0
+    engine.zero_flag[lanes] = value == 0
+
+def set_status(engine, lanes, bits):
+    # as Registers.set_status_register, B and the unused bit are dropped
+    engine.negative_flag[lanes] = (bits & 0x80) != 0
+    engine.overflow_flag[lanes] = (bits & 0x40) != 0
+    engine.decimal_mode_flag[lanes] = (bits & 0x08) != 0
+    engine.interrupt_disable_flag[lanes] = (bits & 0x04) != 0
+    engine.zero_flag[lanes] = (bits & 0x02) != 0
+    engine.carry_flag[lanes] = (bits & 0x01) != 0
+
+def transfer(source, destination):
+    def operation(engine, lanes, operand):
+        value = getattr(engine, source)[lanes]
+        getattr(engine, destination)[lanes] = value
+        set_NZ(engine, lanes, value)
+        return 0
+    return operation
+
+def step_register(register, delta):
+    def operation(engine, lanes, operand):
+        value = (getattr(engine, register)[lanes] + delta) & 0xff
+        getattr(engine, register)[lanes] = value
+        set_NZ(engine, lanes, value)
+        return 0
+    return operation
+
+def load(register, from_memory):
+    def operation(engine, lanes, operand):
+        value = fetch(engine, lanes, operand) if from_memory else operand
+        getattr(engine, register)[lanes] = value
+        set_NZ(engine, lanes, value)
+        return 0
+    return operation
+
+def store(register):
+    def operation(engine, lanes, operand):
+        engine.memory[lanes, operand] = getattr(engine, register)[lanes]
+        return 0
+    return operation
+
+def set_flag(flag, value):
+    def operation(engine, lanes, operand):
+        getattr(engine, flag)[lanes] = value
+        return 0
+    return operation
+
+def branch(flag, taken_when):
+    def operation(engine, lanes, operand):
+        taken = getattr(engine, flag)[lanes] == taken_when
+        # offsets are signed
+        offset = numpy.where(operand > 127, operand - 256, operand)
+        old_pc = engine.pc[lanes]
+        new_pc = numpy.where(taken, old_pc + offset, old_pc)
+        engine.pc[lanes] = new_pc
+        crossed = (old_pc & 0xff00) != (new_pc & 0xff00)
+        return taken.astype(numpy.int32) + crossed
+    return operation
+
+def with_memory_operand(operation):
+    def memory_operation(engine, lanes, operand):
+        return operation(engine, lanes, fetch(engine, lanes, operand))
+    return memory_operation
+
+def nop(engine, lanes, operand):
+    return 0
+
+def jmp(engine, lanes, operand):
+    engine.pc[lanes] = operand
+    return 0
+
+def jsr(engine, lanes, operand):
+    return_address = engine.pc[lanes] - 1
+    sp = engine.sp[lanes]
+    engine.memory[lanes, 0x100 + sp] = (return_address >> 8) & 0xff
+    engine.memory[lanes, 0x100 + ((sp - 1) & 0xff)] = return_address & 0xff
+    engine.sp[lanes] = (sp - 2) & 0xff
+    engine.pc[lanes] = operand
+    return 0
+
+def rts(engine, lanes, operand):
+    sp = engine.sp[lanes]
+    low_address = fetch(engine, lanes, 0x100 + ((sp + 1) & 0xff))
+    high_address = fetch(engine, lanes, 0x100 + ((sp + 2) & 0xff))
+    engine.sp[lanes] = (sp + 2) & 0xff
+    engine.pc[lanes] = ((high_address << 8) + low_address + 1) & 0xffff
+    return 0
+
+def rti(engine, lanes, operand):
+    sp = engine.sp[lanes]
+    set_status(engine, lanes, fetch(engine, lanes, 0x100 + ((sp + 1) & 0xff)))
+    low_address = fetch(engine, lanes, 0x100 + ((sp + 2) & 0xff))
+    high_address = fetch(engine, lanes, 0x100 + ((sp + 3) & 0xff))
+    engine.sp[lanes] = (sp + 3) & 0xff
+    engine.pc[lanes] = (high_address << 8) + low_address
+    return 0
+
+def adc(engine, lanes, operand):
+    accumulator = engine.accumulator[lanes]
+    result = accumulator + operand + engine.carry_flag[lanes]
+    signbits_differ = (operand ^ accumulator) & 0x80
+    resultsign_differs = (operand ^ (result & 0xff)) & 0x80
+    engine.overflow_flag[lanes] = (resultsign_differs != 0) & (signbits_differ == 0)
+    set_NZ(engine, lanes, result & 0xff)
+    engine.accumulator[lanes] = result & 0xff
+    engine.carry_flag[lanes] = result > 255
+    return 0
+
+def sbc(engine, lanes, operand):
+    accumulator = engine.accumulator[lanes]
+    result = accumulator - (~engine.carry_flag[lanes]).astype(numpy.int32) - operand
+    signbits_differ = (operand ^ accumulator) & 0x80
+    resultsign_differs = (accumulator ^ result) & 0x80
+    engine.overflow_flag[lanes] = (resultsign_differs != 0) & (signbits_differ != 0)
+    engine.carry_flag[lanes] = result >= 0
+    engine.accumulator[lanes] = result & 0xff
+    set_NZ(engine, lanes, result & 0xff)
+    return 0
+
+def logical(function):
+    def operation(engine, lanes, operand):
+        value = function(engine.accumulator[lanes], operand)
+        engine.accumulator[lanes] = value
+        set_NZ(engine, lanes, value)
+        return 0
+    return operation
+
+def compare(register):
+    def operation(engine, lanes, operand):
+        difference = getattr(engine, register)[lanes] - operand
+        set_NZ(engine, lanes, difference)
+        engine.carry_flag[lanes] = difference >= 0
+        return 0
+    return operation
+
+def shift(rotate, to_memory):
+    def operation(engine, lanes, operand):
+        value = fetch(engine, lanes, operand) if to_memory else engine.accumulator[lanes]
+        value = value * 2
+        if rotate:
+            value += engine.carry_flag[lanes]
+        engine.carry_flag[lanes] = (value & 0x100) != 0
+        value &= 0xff
+        set_NZ(engine, lanes, value)
+        if to_memory:
+            engine.memory[lanes, operand] = value
+        else:
+            engine.accumulator[lanes] = value
+        return 0
+    return operation
+
+def modify_memory(delta):
+    def operation(engine, lanes, operand):
+        value = (fetch(engine, lanes, operand) + delta) & 0xff
+        set_NZ(engine, lanes, value)
+        engine.memory[lanes, operand] = value
+        return 0
+    return operation
+
+operations = {
+    "nop": nop,
+    "tax": transfer('accumulator', 'x_index'),
+    "tay": transfer('accumulator', 'y_index'),
+    "txa": transfer('x_index', 'accumulator'),
+    "tya": transfer('y_index', 'accumulator'),
+    "tsx": transfer('sp', 'x_index'),
+    "txs": transfer('x_index', 'sp'),
+    "inx": step_register('x_index', 1),
+    "iny": step_register('y_index', 1),
+    "dex": step_register('x_index', -1),
+    "dey": step_register('y_index', -1),
+    "lda": load('accumulator', False),
+    "ldaix": load('accumulator', True),
+    "ldaa": load('accumulator', True),
+    "ldxa": load('x_index', True),
+    "ldya": load('y_index', True),
+    "ldx": load('x_index', False),
+    "ldy": load('y_index', False),
+    "bpl": branch('negative_flag', False),
+    "bmi": branch('negative_flag', True),
+    "bvc": branch('overflow_flag', False),
+    "bvs": branch('overflow_flag', True),
+    "bcc": branch('carry_flag', False),
+    "bcs": branch('carry_flag', True),
+    "bne": branch('zero_flag', False),
+    "beq": branch('zero_flag', True),
+    "clc": set_flag('carry_flag', False),
+    "sec": set_flag('carry_flag', True),
+    "cli": set_flag('interrupt_disable_flag', False),
+    "sei": set_flag('interrupt_disable_flag', True),
+    "clv": set_flag('overflow_flag', False),
+    "cld": set_flag('decimal_mode_flag', False),
+    "sed": set_flag('decimal_mode_flag', True),
+    "adc": adc,
+    "adcM": with_memory_operand(adc),
+    "sbc": sbc,
+    "sbcM": with_memory_operand(sbc),
+    "sta": store('accumulator'),
+    "stx": store('x_index'),
+    "sty": store('y_index'),
+    "aslA": shift(False, False),
+    "aslM": shift(False, True),
+    "rolA": shift(True, False),
+    "rolM": shift(True, True),
+    "cmp": compare('accumulator'),
+    "cpx": compare('x_index'),
+    "cpy": compare('y_index'),
+    "inc": modify_memory(1),
+    "dec": modify_memory(-1),
+    "and": logical(numpy.bitwise_and),
+    "andM": with_memory_operand(logical(numpy.bitwise_and)),
+    "eor": logical(numpy.bitwise_xor),
+    "eorM": with_memory_operand(logical(numpy.bitwise_xor)),
+    "ora": logical(numpy.bitwise_or),
+    "oraM": with_memory_operand(logical(numpy.bitwise_or)),
+    "jmp": jmp,
+    "jsr": jsr,
+    "rts": rts,
+    "rti": rti,
+}
+
+mode_table = tuple(modes[mode] for mode in AddressingModes.mode_table)
+mnemonic_table = tuple(name for row in OpCode.opcode_table for name in row)
+operation_table = tuple(operations.get(name) for name in mnemonic_table)
+
+BRK = 0x00
+
+
+class LockstepEngine(object):
+
+    register_names = ('accumulator', 'x_index', 'y_index', 'sp', 'pc')
+    flag_names = ('carry_flag', 'zero_flag', 'interrupt_disable_flag', 'decimal_mode_flag',
+                  'overflow_flag', 'negative_flag')
+
+    def __init__(self, lanes, memory_size = 65536, stop_addresses = ()):
+
+        self.lanes = lanes
+        self.memory = numpy.zeros((lanes, memory_size), dtype = numpy.uint8)
+        self.stop_addresses = numpy.array(sorted(stop_addresses), dtype = numpy.int32)
+
+        reset = Registers()
+        for name in self.register_names:
+            setattr(self, name, numpy.full(lanes, getattr(reset, name), dtype = numpy.int32))
+        for name in self.flag_names:
+            setattr(self, name, numpy.full(lanes, bool(getattr(reset, name)), dtype = bool))
+
+        self.cycles = numpy.zeros(lanes, dtype = numpy.int64)
+        self.instructions = numpy.zeros(lanes, dtype = numpy.int64)
+        self.halted = numpy.zeros(lanes, dtype = bool)
+
+    def load(self, data, address):
+
+        # the same bytes into every lane
+        data = numpy.frombuffer(bytes(data), dtype = numpy.uint8)
+        self.memory[:, address:address + len(data)] = data
+
+    def lane_registers(self, lane):
+
+        registers = Registers()
+        for name in self.register_names + self.flag_names:
+            setattr(registers, name, getattr(self, name)[lane].item())
+        return registers
+
+    def step(self):
+
+        # one instruction on every lane still running, returns how many ran
+        active = numpy.flatnonzero(~self.halted)
+        pcs = self.pc[active]
+        opcodes = self.memory[active, pcs]
+
+        stopping = opcodes == BRK
+        if len(self.stop_addresses):
+            stopping |= numpy.isin(pcs, self.stop_addresses)
+
+        if stopping.any():
+            self.halted[active[stopping]] = True
+            active = active[~stopping]
+            opcodes = opcodes[~stopping]
+
+        if len(active) == 0:
+            return 0
+
+        if (opcodes == opcodes[0]).all():
+            self._execute(int(opcodes[0]), active)
+        else:
+            for opcode in numpy.unique(opcodes):
+                self._execute(int(opcode), active[opcodes == opcode])
+
+        return len(active)
+
+    def run(self, max_steps = None):
+
+        # steps until every lane halts, returns the number of steps taken
+        steps = 0
+        while max_steps is None or steps < max_steps:
+            if not self.step():
+                break
+            steps += 1
+
+        return steps
+
+    def _execute(self, opcode, lanes):
+
+        operation = operation_table[opcode]
+        if operation is None:
+            raise KeyError(mnemonic_table[opcode])
+
+        self.pc[lanes] += 1
+        operand, mode_penalty = mode_table[opcode](self, lanes)
+        penalty = operation(self, lanes, operand)
+
+        self.cycles[lanes] += OpCode.cycle_table[opcode] + mode_penalty + penalty
+        self.instructions[lanes] += 1
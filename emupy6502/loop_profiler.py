@@ -0,0 +1,150 @@
+from collections import namedtuple
+
+from emupy6502.counters import BRANCH_OPCODES
+from emupy6502.symbols import hex_name
+
+BRK = 0x00
+JSR = 0x20
+JMP = 0x4c
+JMP_INDIRECT = 0x6c
+
+# head: the address jumped back to, tail: the branch or JMP jumping back.
+# iterations: back edges taken plus exits; cycles: the cycles of the timed
+# iterations, all but the first of each time the loop is entered, whose
+# start isn't known until its back edge is seen. average_cycles is per
+# timed iteration, subroutines called from the loop included.
+LoopProfile = namedtuple('LoopProfile',
+                         'head tail iterations cycles average_cycles page_cross_penalties')
+
+
+class Loop(object):
+
+    __slots__ = ('head', 'tail', 'back_edges', 'exits', 'timed_iterations', 'cycles',
+                 'page_cross_penalties', 'started')
+
+    def __init__(self, head, tail):
+
+        self.head = head
+        self.tail = tail
+        self.back_edges = 0
+        self.exits = 0
+        self.timed_iterations = 0
+        self.cycles = 0
+        self.page_cross_penalties = 0
+        # the cycle count at the start of the running iteration, None when
+        # the loop isn't running
+        self.started = None
+
+    def end_iteration(self, cycles):
+
+        self.timed_iterations += 1
+        self.cycles += cycles - self.started
+
+
+def page_cross_penalty(opcode, extra_cycles):
+
+    # a taken branch's first extra cycle is for being taken, not crossing
+    if opcode in BRANCH_OPCODES:
+        return max(extra_cycles - 1, 0)
+    return extra_cycles
+
+
+class LoopProfiler(object):
+
+    # Single steps a Cpu6502 and finds its loops from their back edges: a
+    # taken branch or JMP (absolute or indirect) to an address at or below
+    # itself. A loop runs from the first back edge seen until an
+    # instruction between its head and tail leaves that range, other than
+    # by JSR or BRK, which the loop continues after. The branch at the
+    # tail not being taken is the usual way. Page crossing penalties are
+    # charged to every running loop whose range holds the instruction that
+    # paid them, so an inner loop's count towards its outer loop's too.
+    def __init__(self, cpu, name = hex_name):
+
+        self.cpu = cpu
+        self.name = name
+        self.cycles = 0
+        # (head, tail) -> Loop
+        self.loops = {}
+        self.running = []
+
+    def step(self):
+
+        cpu = self.cpu
+        registers = cpu.registers
+        pc = registers.pc
+        # peeked, so the profiler doesn't add a read of its own
+        opcode = cpu.memory_controller.peek(pc)
+
+        step_cycles = cpu.step()
+        if cpu.stop_reason is not None:
+            # the quotas stopped it, nothing ran so there is nothing to record
+            return 0
+        cycles = self.cycles = self.cycles + step_cycles
+        new_pc = registers.pc
+
+        if new_pc <= pc and (opcode == JMP or opcode == JMP_INDIRECT or
+                             (opcode in BRANCH_OPCODES and registers.extra_cycles)):
+            loop = self.loops.get((new_pc, pc))
+            if loop is None:
+                loop = self.loops[(new_pc, pc)] = Loop(new_pc, pc)
+            if loop.started is None:
+                self.running.append(loop)
+            else:
+                loop.end_iteration(cycles)
+            loop.back_edges += 1
+            loop.started = cycles
+
+        if not self.running:
+            return step_cycles
+
+        penalty = page_cross_penalty(opcode, registers.extra_cycles)
+        if penalty:
+            for loop in self.running:
+                if loop.head <= pc <= loop.tail:
+                    loop.page_cross_penalties += penalty
+
+        if opcode != JSR and opcode != BRK:
+            for loop in list(self.running):
+                if loop.head <= pc <= loop.tail and not loop.head <= new_pc <= loop.tail:
+                    loop.exits += 1
+                    loop.end_iteration(cycles)
+                    loop.started = None
+                    self.running.remove(loop)
+
+        return step_cycles
+
+    def run(self, cycles = None, signal = None):
+
+        # steps until cycles have run, signal() returns True or the CPU's
+        # quotas stop it
+        start = self.cycles
+        while cycles is None or self.cycles - start < cycles:
+            if signal is not None and signal():
+                break
+            self.step()
+            if self.cpu.stop_reason is not None:
+                break
+
+        return self.cycles - start
+
+    def hot_loops(self, top = None):
+
+        # LoopProfiles, most cycles first
+        profiles = []
+        for loop in self.loops.values():
+            average = loop.cycles / loop.timed_iterations if loop.timed_iterations else 0.0
+            profiles.append(LoopProfile(loop.head, loop.tail, loop.back_edges + loop.exits,
+                                        loop.cycles, average, loop.page_cross_penalties))
+        profiles.sort(key = lambda profile: (-profile.cycles, profile.head, profile.tail))
+        return profiles[:top]
+
+    def report(self, top = 20):
+
+        lines = ["{0:24} {1:24} {2:>10} {3:>12} {4:>10} {5:>10}".format(
+            "head", "tail", "iterations", "cycles", "per iter", "page cross")]
+        for profile in self.hot_loops(top):
+            lines.append("{0:24} {1:24} {2:10} {3:12} {4:10.1f} {5:10}".format(
+                self.name(profile.head), self.name(profile.tail), profile.iterations, profile.cycles,
+                profile.average_cycles, profile.page_cross_penalties))
+        return "\n".join(lines)
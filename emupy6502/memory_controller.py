@@ -1,9 +1,22 @@
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+RESET_VECTOR = 0xfffc
+
+INES_MAGIC = b"NES\x1a"
+INES_HEADER_SIZE = 16
+INES_TRAINER_SIZE = 512
+INES_PRG_BANK_SIZE = 0x4000
+
+
 class MemoryController(object):
 
     def __init__(self, buffer_size = None):
 
         if buffer_size:
-            self.buffer = bytearray(buffer_size)     
+            self.buffer = bytearray(buffer_size)
         else:
             self.buffer = None
 
@@ -11,7 +24,214 @@ class MemoryController(object):
 
         return self.buffer[address]
 
+    def peek(self, address):
+
+        # the byte at address without whatever else reading it does on a
+        # device mapped controller, for profilers looking on from outside
+        return self.buffer[address]
+
     def write(self, address, value):
 
         #print("write:{0}:{1}".format(address, value))
-        self.buffer[address] = value
\ No newline at end of file
+        self.buffer[address] = value
+
+    def _place(self, address, data):
+
+        # a slice assignment past the end would grow the bytearray
+        # rather than fail, so check the bounds up front
+        end = address + len(data)
+        if address < 0 or end > len(self.buffer):
+            raise IndexError("{0} bytes at {1:#06x} do not fit in memory".format(len(data), address))
+
+        self.buffer[address:end] = data
+
+    def view(self, start = 0, end = None):
+
+        # zero copy, writes through the view land in emulated memory
+        return memoryview(self.buffer)[start:end]
+
+    def numpy_view(self, start = 0, end = None):
+
+        if numpy is None:
+            raise ImportError("numpy_view needs numpy installed")
+
+        return numpy.frombuffer(self.buffer, dtype = numpy.uint8)[start:end]
+
+    def snapshot(self):
+
+        return bytes(self.buffer)
+
+    def fill(self, start, end, value):
+
+        self._place(start, bytes((value,)) * (end - start))
+
+    def copy(self, source, destination, length):
+
+        # take a copy of the source first so overlapping moves behave
+        self._place(destination, bytes(self.view(source, source + length)))
+
+    def compare(self, address, data):
+
+        return self.view(address, address + len(data)) == data
+
+    def find(self, pattern, start = 0, end = None):
+
+        # returns the address of the first match or -1
+        if end is None:
+            end = len(self.buffer)
+
+        return self.buffer.find(pattern, start, end)
+
+    def diff(self, other):
+
+        # other can be another controller or a snapshot, the result is the
+        # list of addresses whose contents differ
+        if isinstance(other, MemoryController):
+            other = other.view()
+
+        mine = self.view()
+        if len(mine) != len(other):
+            raise ValueError("cannot diff memories of different sizes")
+
+        if numpy is not None:
+            differences = numpy.frombuffer(mine, dtype = numpy.uint8) != numpy.frombuffer(other, dtype = numpy.uint8)
+            return numpy.flatnonzero(differences).tolist()
+
+        # without numpy compare whole pages first, only pages that differ
+        # are walked byte by byte
+        other = memoryview(other)
+        addresses = []
+        for page in range(0, len(mine), 256):
+            if mine[page:page + 256] != other[page:page + 256]:
+                addresses.extend(address for address in range(page, min(page + 256, len(mine)))
+                    if mine[address] != other[address])
+
+        return addresses
+
+    def _start(self, address, cpu):
+
+        if cpu is not None:
+            self._place(RESET_VECTOR, bytes((address & 0xff, (address >> 8) & 0xff)))
+            cpu.registers.pc = address
+
+        return address
+
+    def load_binary(self, data, address = 0, cpu = None):
+
+        # data can be anything supporting the buffer protocol, so an mmap
+        # of a ROM file is placed without an intermediate copy
+        self._place(address, data)
+        return self._start(address, cpu)
+
+    def load_prg(self, data, cpu = None):
+
+        # C64 PRG: two byte little endian load address, then the image
+        if len(data) < 2:
+            raise ValueError("PRG image has no load address")
+
+        address = data[0] | (data[1] << 8)
+        self._place(address, memoryview(data)[2:])
+        return self._start(address, cpu)
+
+    def load_intel_hex(self, text, cpu = None):
+
+        base = 0
+        start = None
+        first = None
+        segment_address = None
+        segment = bytearray()
+
+        for line_number, line in enumerate(text.splitlines(), 1):
+            line = line.strip()
+            if not line:
+                continue
+
+            if line[0] != ':':
+                raise ValueError("line {0}: missing record mark".format(line_number))
+
+            try:
+                record = bytes.fromhex(line[1:])
+            except ValueError:
+                raise ValueError("line {0}: invalid hex digits".format(line_number))
+
+            if len(record) < 5 or len(record) != record[0] + 5:
+                raise ValueError("line {0}: bad record length".format(line_number))
+
+            if sum(record) & 0xff:
+                raise ValueError("line {0}: bad checksum".format(line_number))
+
+            record_type = record[3]
+            payload = record[4:-1]
+
+            if record_type == 0x00:
+                address = base + ((record[1] << 8) | record[2])
+                if first is None:
+                    first = address
+
+                # coalesce contiguous records so each run is a single slice
+                if segment_address is not None and address == segment_address + len(segment):
+                    segment += payload
+                else:
+                    if segment:
+                        self._place(segment_address, segment)
+                    segment_address = address
+                    segment = bytearray(payload)
+            elif record_type == 0x01:
+                break
+            elif record_type in (0x02, 0x04):
+                if len(payload) != 2:
+                    raise ValueError("line {0}: address record needs 2 bytes".format(line_number))
+                base = ((payload[0] << 8) | payload[1]) << (4 if record_type == 0x02 else 16)
+            elif record_type in (0x03, 0x05):
+                if len(payload) != 4:
+                    raise ValueError("line {0}: start address record needs 4 bytes".format(line_number))
+                start = int.from_bytes(payload, 'big')
+                if record_type == 0x03:
+                    start = ((start >> 16) << 4) + (start & 0xffff)
+            else:
+                raise ValueError("line {0}: unknown record type {1:#04x}".format(line_number, record_type))
+
+        if segment:
+            self._place(segment_address, segment)
+
+        if start is None:
+            start = first if first is not None else 0
+
+        return self._start(start, cpu)
+
+    def load_ines(self, data, cpu = None):
+
+        if len(data) < INES_HEADER_SIZE or bytes(data[0:4]) != INES_MAGIC:
+            raise ValueError("not an iNES image")
+
+        mapper = (data[6] >> 4) | (data[7] & 0xf0)
+        if mapper != 0:
+            raise ValueError("mapper {0} is not supported, only NROM (mapper 0) is".format(mapper))
+
+        prg_banks = data[4]
+        if prg_banks not in (1, 2):
+            # anything bigger needs a mapper to bank switch it in
+            raise ValueError("{0} PRG banks need a mapper, only NROM is supported".format(prg_banks))
+
+        offset = INES_HEADER_SIZE
+        view = memoryview(data)
+        if data[6] & 0x04:
+            self._place(0x7000, view[offset:offset + INES_TRAINER_SIZE])
+            offset += INES_TRAINER_SIZE
+
+        prg_size = prg_banks * INES_PRG_BANK_SIZE
+        prg = view[offset:offset + prg_size]
+        if len(prg) != prg_size:
+            raise ValueError("iNES image is truncated")
+
+        self._place(0x8000, prg)
+        if prg_banks == 1:
+            # NROM-128 mirrors its single bank into the top of memory
+            self._place(0xc000, prg)
+
+        # the vector comes from the ROM itself, so only the PC is set
+        address = self.read(RESET_VECTOR) | (self.read(RESET_VECTOR + 1) << 8)
+        if cpu is not None:
+            cpu.registers.pc = address
+
+        return address
@@ -0,0 +1,55 @@
+import mmap
+import os
+
+from emupy6502.memory_controller import MemoryController
+
+
+class MmapMemoryController(MemoryController):
+
+    # With no filename the buffer is anonymous shared memory, which forked
+    # children see live. With a filename the address space is the file
+    # itself: existing contents are used as they are and every write lands
+    # in the page cache, where other processes mapping the file can see it.
+    def __init__(self, buffer_size = 65536, filename = None):
+
+        self.filename = filename
+
+        if filename is None:
+            mapping = mmap.mmap(-1, buffer_size)
+        else:
+            # the mapping keeps its own handle on the file, so ours can be
+            # closed straight away, whether or not mmap succeeded
+            with open(filename, 'a+b') as memory_file:
+                if os.fstat(memory_file.fileno()).st_size < buffer_size:
+                    memory_file.truncate(buffer_size)
+                mapping = mmap.mmap(memory_file.fileno(), buffer_size)
+
+        super(MmapMemoryController, self).__init__()
+        self.buffer = mapping
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *exc_info):
+
+        self.close()
+
+    def flush(self):
+
+        # only meaningful for file backed memory, anonymous maps have
+        # nowhere to flush to
+        if self.filename is not None:
+            self.buffer.flush()
+
+    def checkpoint(self, filename):
+
+        # writes straight from the mapping, no intermediate bytes object
+        with open(filename, 'wb') as checkpoint_file:
+            checkpoint_file.write(self.buffer)
+
+    def close(self):
+
+        if self.buffer is not None and not self.buffer.closed:
+            self.flush()
+            self.buffer.close()
@@ -1,4 +1,17 @@
-from emupy6502.addressing_modes import AddressingModes
+from types import MappingProxyType
+
+from emupy6502.addressing_modes import AddressingModes, shared_addressing_modes
+
+#################################################################################
+# STACK
+
+def push(registers, memory_controller, value):
+    memory_controller.write(0x100 + registers.sp, value)
+    registers.sp = (registers.sp - 1) & 0xff
+
+def pull(registers, memory_controller):
+    registers.sp = (registers.sp + 1) & 0xff
+    return memory_controller.read(0x100 + registers.sp)
 
 #################################################################################
 # SYSTEM
@@ -7,14 +20,24 @@ def nop(registers, operand, memory_controller):
     pass
 
 def brk(registers, operand, memory_controller):
-    memory_controller.write(registers.sp, registers.pc & 0xff)
-    memory_controller.write(registers.sp-1, (registers.pc >> 8) & 0xff)
-    memory_controller.write(registers.sp-2, registers.status_register())
+    # the return address skips the padding byte after BRK, and the
+    # status pushed has B set so the handler can tell it from an IRQ
+    return_address = registers.pc + 1
+    push(registers, memory_controller, (return_address >> 8) & 0xff)
+    push(registers, memory_controller, return_address & 0xff)
+    push(registers, memory_controller, registers.status_register() | 0x10)
+    registers.interrupt_disable_flag = True
 
     low_address = memory_controller.read(0xfffe)
     high_address = memory_controller.read(0xffff)
     registers.pc = (high_address << 8) | low_address
 
+def rti(registers, operand, memory_controller):
+    registers.set_status_register(pull(registers, memory_controller))
+    low_address = pull(registers, memory_controller)
+    high_address = pull(registers, memory_controller)
+    registers.pc = (high_address << 8) + low_address
+
 def tax(registers, operand, memory_controller):
     registers.x_index = registers.accumulator
     registers.set_NZ(registers.x_index)
@@ -115,9 +138,21 @@ def sty(registers, operand, memory_controller):
 def jmp(registers, operand, memory_controller):
     registers.pc = operand
 
+def jsr(registers, operand, memory_controller):
+    # pushes the address of the JSR's last byte, RTS adds the one back on
+    return_address = registers.pc - 1
+    push(registers, memory_controller, (return_address >> 8) & 0xff)
+    push(registers, memory_controller, return_address & 0xff)
+    registers.pc = operand
+
+def rts(registers, operand, memory_controller):
+    low_address = pull(registers, memory_controller)
+    high_address = pull(registers, memory_controller)
+    registers.pc = ((high_address << 8) + low_address + 1) & 0xffff
+
 def take_branch(registers, operand):
 
-    AddressingModes.cycle_count += 1
+    registers.extra_cycles += 1
 
     if operand > 127:
         operand = operand - 256
@@ -126,7 +161,7 @@ def take_branch(registers, operand):
     registers.pc += operand
 
     if (old_pc & 0xff00) != (registers.pc & 0xff00):
-        AddressingModes.cycle_count += 1
+        registers.extra_cycles += 1
 
 def bpl(registers, operand, memory_controller):
     if registers.negative_flag:
@@ -314,50 +349,66 @@ def dec(registers, operand, memory_controller):
     registers.set_NZ(value)
     memory_controller.write(operand, value)
 
+#################################################################################
+# TABLE BUILDING
+
+def unimplemented(mnemonic):
+    # same failure as the old name lookup, but only once the opcode runs
+    def handler(registers, operand, memory_controller):
+        raise KeyError(mnemonic)
+    return handler
+
+def flatten(table):
+    return tuple(entry for row in table for entry in row)
+
+def handlers(opcode_table, dispatch_table):
+    return tuple(dispatch_table[name] if name in dispatch_table else unimplemented(name)
+                 for name in flatten(opcode_table))
+
 class OpCode(object):
 
-    opcode_table = [
+    opcode_table = (
         #|  0 |  1   |  2   |  3   |  4   |  5   |  6   |  7   |  8   |  9   |  A   |  B   |  C   |  D   |  E   |  F   |
-        ["brk", "oraM", "nop", "slo", "nop", "ora", "aslM", "slo", "php", "ora", "aslA", "nop", "nop", "ora", "aslM", "slo"],  # 0
-        ["bpl", "oraM", "nop", "slo", "nop", "ora", "aslM", "slo", "clc", "oraM", "nop", "slo", "nop", "oraM", "aslM", "slo"],  # 1
-        ["jsr", "andM", "nop", "rla", "bit", "and", "rolM", "rla", "plp", "and", "rolA", "nop", "bit", "and", "rolM", "rla"],  # 2
-        ["bmi", "andM", "nop", "rla", "nop", "and", "rol", "rla", "sec", "andM", "nop", "rla", "nop", "andM", "rol", "rla"],  # 3
-        ["rti", "eorM", "nop", "sre", "nop", "eor", "lsr", "sre", "pha", "eor", "lsr", "nop", "jmp", "eor", "lsr", "sre"],  # 4
-        ["bvc", "eorM", "nop", "sre", "nop", "eor", "lsr", "sre", "cli", "eorM", "nop", "sre", "nop", "eorM", "lsr", "sre"],  # 5
-        ["rts", "adcM", "nop", "rra", "nop", "adc", "ror", "rra", "pla", "adc", "ror", "nop", "jmp", "adc", "ror", "rra"],  # 6
-        ["bvs", "adcM", "nop", "rra", "nop", "adc", "ror", "rra", "sei", "adcM", "nop", "rra", "nop", "adcM", "ror", "rra"],  # 7
-        ["nop", "sta", "nop", "sax", "sty", "sta", "stx", "sax", "dey", "nop", "txa", "nop", "sty", "sta", "stx", "sax"],  # 8
-        ["bcc", "sta", "nop", "nop", "sty", "sta", "stx", "sax", "tya", "sta", "txs", "nop", "nop", "sta", "nop", "nop"],  # 9
-        ["ldy", "ldaix", "ldx", "lax", "ldy", "lda", "ldx", "lax", "tay", "lda", "tax", "nop", "ldy", "lda", "ldx", "lax"],  # A
-        ["bcs", "ldaa", "nop", "lax", "ldy", "lda", "ldx", "lax", "clv", "ldaa", "tsx", "lax", "ldya", "ldaa", "ldxa", "lax"],  # B
-        ["cpy", "cmp", "nop", "dcp", "cpy", "cmp", "dec", "dcp", "iny", "cmp", "dex", "nop", "cpy", "cmp", "dec", "dcp"],  # C
-        ["bne", "cmp", "nop", "dcp", "nop", "cmp", "dec", "dcp", "cld", "cmp", "nop", "dcp", "nop", "cmp", "dec", "dcp"],  # D
-        ["cpx", "sbcM", "nop", "isb", "cpx", "sbc", "inc", "isb", "inx", "sbc", "nop", "sbc", "cpx", "sbc", "inc", "isb"],  # E
-        ["beq", "sbcM", "nop", "isb", "nop", "sbc", "inc", "isb", "sed", "sbcM", "nop", "isb", "nop", "sbcM", "inc", "isb"]]  # F
-
-    cycle_counts = [
+        ("brk", "oraM", "nop", "slo", "nop", "ora", "aslM", "slo", "php", "ora", "aslA", "nop", "nop", "ora", "aslM", "slo"),  # 0
+        ("bpl", "oraM", "nop", "slo", "nop", "ora", "aslM", "slo", "clc", "oraM", "nop", "slo", "nop", "oraM", "aslM", "slo"),  # 1
+        ("jsr", "andM", "nop", "rla", "bit", "and", "rolM", "rla", "plp", "and", "rolA", "nop", "bit", "and", "rolM", "rla"),  # 2
+        ("bmi", "andM", "nop", "rla", "nop", "and", "rol", "rla", "sec", "andM", "nop", "rla", "nop", "andM", "rol", "rla"),  # 3
+        ("rti", "eorM", "nop", "sre", "nop", "eor", "lsr", "sre", "pha", "eor", "lsr", "nop", "jmp", "eor", "lsr", "sre"),  # 4
+        ("bvc", "eorM", "nop", "sre", "nop", "eor", "lsr", "sre", "cli", "eorM", "nop", "sre", "nop", "eorM", "lsr", "sre"),  # 5
+        ("rts", "adcM", "nop", "rra", "nop", "adc", "ror", "rra", "pla", "adc", "ror", "nop", "jmp", "adc", "ror", "rra"),  # 6
+        ("bvs", "adcM", "nop", "rra", "nop", "adc", "ror", "rra", "sei", "adcM", "nop", "rra", "nop", "adcM", "ror", "rra"),  # 7
+        ("nop", "sta", "nop", "sax", "sty", "sta", "stx", "sax", "dey", "nop", "txa", "nop", "sty", "sta", "stx", "sax"),  # 8
+        ("bcc", "sta", "nop", "nop", "sty", "sta", "stx", "sax", "tya", "sta", "txs", "nop", "nop", "sta", "nop", "nop"),  # 9
+        ("ldy", "ldaix", "ldx", "lax", "ldy", "lda", "ldx", "lax", "tay", "lda", "tax", "nop", "ldy", "lda", "ldx", "lax"),  # A
+        ("bcs", "ldaa", "nop", "lax", "ldy", "lda", "ldx", "lax", "clv", "ldaa", "tsx", "lax", "ldya", "ldaa", "ldxa", "lax"),  # B
+        ("cpy", "cmp", "nop", "dcp", "cpy", "cmp", "dec", "dcp", "iny", "cmp", "dex", "nop", "cpy", "cmp", "dec", "dcp"),  # C
+        ("bne", "cmp", "nop", "dcp", "nop", "cmp", "dec", "dcp", "cld", "cmp", "nop", "dcp", "nop", "cmp", "dec", "dcp"),  # D
+        ("cpx", "sbcM", "nop", "isb", "cpx", "sbc", "inc", "isb", "inx", "sbc", "nop", "sbc", "cpx", "sbc", "inc", "isb"),  # E
+        ("beq", "sbcM", "nop", "isb", "nop", "sbc", "inc", "isb", "sed", "sbcM", "nop", "isb", "nop", "sbcM", "inc", "isb"))  # F
+
+    cycle_counts = (
         #|  0  |  1  |  2  |  3  |  4  |  5  |  6  |  7  |  8  |  9  |  A  |  B  |  C  |  D  |  E  |  F  |
-           [7,    6,    2,    8,    3,    3,    5,    5,    3,    2,    2,    2,    4,    4,    6,    6],  # 0
-           [2,    5,    2,    8,    4,    4,    6,    6,    2,    4,    2,    7,    4,    4,    7,    7],  # 1
-           [6,    6,    2,    8,    3,    3,    5,    5,    4,    2,    2,    2,    4,    4,    6,    6],  # 2
-           [2,    5,    2,    8,    4,    4,    6,    6,    2,    4,    2,    7,    4,    4,    7,    7],  # 3
-           [6,    6,    2,    8,    3,    3,    5,    5,    3,    2,    2,    2,    3,    4,    6,    6],  # 4
-           [2,    5,    2,    8,    4,    4,    6,    6,    2,    4,    2,    7,    4,    4,    7,    7],  # 5
-           [6,    6,    2,    8,    3,    3,    5,    5,    4,    2,    2,    2,    5,    4,    6,    6],  # 6
-           [2,    5,    2,    8,    4,    4,    6,    6,    2,    4,    2,    7,    4,    4,    7,    7],  # 7
-           [2,    6,    2,    6,    3,    3,    3,    3,    2,    2,    2,    2,    4,    4,    4,    4],  # 8
-           [2,    6,    2,    6,    4,    4,    4,    4,    2,    5,    2,    5,    5,    5,    5,    5],  # 9
-           [2,    6,    2,    6,    3,    3,    3,    3,    2,    2,    2,    2,    4,    4,    4,    4],  # A
-           [2,    5,    2,    5,    4,    4,    4,    4,    2,    4,    2,    4,    4,    4,    4,    4],  # B
-           [2,    6,    2,    8,    3,    3,    5,    5,    2,    2,    2,    2,    4,    4,    6,    6],  # C
-           [2,    5,    2,    8,    4,    4,    6,    6,    2,    4,    2,    7,    4,    4,    7,    7],  # D
-           [2,    6,    2,    8,    3,    3,    5,    5,    2,    2,    2,    2,    4,    4,    6,    6],  # E
-           [2,    5,    2,    8,    4,    4,    6,    6,    2,    4,    2,    7,    4,    4,    7,    7]   # F
-    ]
+           (7,    6,    2,    8,    3,    3,    5,    5,    3,    2,    2,    2,    4,    4,    6,    6),  # 0
+           (2,    5,    2,    8,    4,    4,    6,    6,    2,    4,    2,    7,    4,    4,    7,    7),  # 1
+           (6,    6,    2,    8,    3,    3,    5,    5,    4,    2,    2,    2,    4,    4,    6,    6),  # 2
+           (2,    5,    2,    8,    4,    4,    6,    6,    2,    4,    2,    7,    4,    4,    7,    7),  # 3
+           (6,    6,    2,    8,    3,    3,    5,    5,    3,    2,    2,    2,    3,    4,    6,    6),  # 4
+           (2,    5,    2,    8,    4,    4,    6,    6,    2,    4,    2,    7,    4,    4,    7,    7),  # 5
+           (6,    6,    2,    8,    3,    3,    5,    5,    4,    2,    2,    2,    5,    4,    6,    6),  # 6
+           (2,    5,    2,    8,    4,    4,    6,    6,    2,    4,    2,    7,    4,    4,    7,    7),  # 7
+           (2,    6,    2,    6,    3,    3,    3,    3,    2,    2,    2,    2,    4,    4,    4,    4),  # 8
+           (2,    6,    2,    6,    4,    4,    4,    4,    2,    5,    2,    5,    5,    5,    5,    5),  # 9
+           (2,    6,    2,    6,    3,    3,    3,    3,    2,    2,    2,    2,    4,    4,    4,    4),  # A
+           (2,    5,    2,    5,    4,    4,    4,    4,    2,    4,    2,    4,    4,    4,    4,    4),  # B
+           (2,    6,    2,    8,    3,    3,    5,    5,    2,    2,    2,    2,    4,    4,    6,    6),  # C
+           (2,    5,    2,    8,    4,    4,    6,    6,    2,    4,    2,    7,    4,    4,    7,    7),  # D
+           (2,    6,    2,    8,    3,    3,    5,    5,    2,    2,    2,    2,    4,    4,    6,    6),  # E
+           (2,    5,    2,    8,    4,    4,    6,    6,    2,    4,    2,    7,    4,    4,    7,    7)   # F
+    )
 
     # not strictly necessary, leaving it in for now since I may
     # store some extra information in here per instruction
-    dispatch_table = {
+    dispatch_table = MappingProxyType({
 
         "nop": nop,
         "tax": tax,
@@ -415,22 +466,32 @@ class OpCode(object):
         "eorM": logical_eorM,
         "ora": logical_or,
         "oraM": logical_orM,
-        "jmp": jmp
-    }
+        "jmp": jmp,
+        "jsr": jsr,
+        "rts": rts,
+        "rti": rti
+    })
+
+    # flattened, opcode indexed views of the tables above, built once and
+    # shared by every instance
+    cycle_table = flatten(cycle_counts)
+    handler_table = handlers(opcode_table, dispatch_table)
+    mode_table = AddressingModes.mode_table
 
-    def __init__(self):
+    addressing_modes = shared_addressing_modes
 
-        self.addressing_modes = AddressingModes()
+    __slots__ = ()
 
     def execute(self, opcode, registers, memory_controller):
 
-        addressing_modes = self.addressing_modes
+        # page crossings and taken branches are counted on the registers,
+        # so CPUs running on different threads never share the count
+        registers.extra_cycles = 0
 
-        low_nibble = opcode & 0xf
-        high_nibble = (opcode & 0xf0) >> 4
+        operand = self.mode_table[opcode](registers, memory_controller)
+        self.handler_table[opcode](registers, operand, memory_controller)
+        return self.cycle_table[opcode] + registers.extra_cycles
 
-        AddressingModes.cycle_count = self.cycle_counts[high_nibble][low_nibble]
 
-        operand = addressing_modes.handle(opcode, registers, memory_controller)
-        self.dispatch_table[self.opcode_table[high_nibble][low_nibble]](registers, operand, memory_controller)
-        return AddressingModes.cycle_count
+# one instance serves every Cpu6502
+shared_opcodes = OpCode()
@@ -0,0 +1,175 @@
+from emupy6502 import memory_controller
+from emupy6502.memory_controller import MemoryController
+
+PAGE_SIZE = 256
+PAGE_COUNT = 256
+
+
+class SharedRom(object):
+
+    # An immutable, page aligned image that any number of
+    # PagedMemoryControllers can map without copying it. The pages are
+    # read only memoryviews, so every controller indexes the same bytes.
+    def __init__(self, data, address, shared_memory = None):
+
+        if address % PAGE_SIZE or len(data) % PAGE_SIZE or not data:
+            raise ValueError("ROM images must be whole pages on a page boundary")
+
+        if address + len(data) > PAGE_COUNT * PAGE_SIZE:
+            raise ValueError("ROM image does not fit in memory")
+
+        self.address = address
+        self.size = len(data)
+        self.shared_memory = shared_memory
+
+        # bytes() is a no-op for bytes, everything else is copied once here
+        # rather than once per controller
+        self._memory = memoryview(data if shared_memory else bytes(data)).toreadonly()
+        self.pages = tuple(self._memory[offset:offset + PAGE_SIZE]
+                           for offset in range(0, self.size, PAGE_SIZE))
+
+    @classmethod
+    def create_shared(cls, data, address):
+
+        # places the image in multiprocessing shared memory, workers attach
+        # to it by name (pickling a SharedRom does that automatically)
+        from multiprocessing import shared_memory
+
+        segment = shared_memory.SharedMemory(create = True, size = len(data))
+        segment.buf[:len(data)] = data
+        return cls(segment.buf[:len(data)], address, segment)
+
+    @classmethod
+    def attach(cls, name, address, size):
+
+        from multiprocessing import shared_memory
+
+        segment = shared_memory.SharedMemory(name = name)
+        return cls(segment.buf[:size], address, segment)
+
+    def __reduce__(self):
+
+        if self.shared_memory is not None:
+            return (SharedRom.attach, (self.shared_memory.name, self.address, self.size))
+
+        return (SharedRom, (self._memory.tobytes(), self.address))
+
+    def close(self):
+
+        # the views have to go before the segment will agree to close
+        for page in self.pages:
+            page.release()
+
+        self.pages = ()
+        self._memory.release()
+
+        if self.shared_memory is not None:
+            self.shared_memory.close()
+
+    def unlink(self):
+
+        if self.shared_memory is not None:
+            self.shared_memory.unlink()
+
+
+class PagedMemoryController(MemoryController):
+
+    # 64K address space split into 256 byte pages. ROM pages come from
+    # SharedRom images and are shared, everything else is a RAM page
+    # owned by this controller. Writes to ROM are ignored, as they would
+    # be on the real hardware.
+    def __init__(self, roms = ()):
+
+        super(PagedMemoryController, self).__init__()
+
+        self.roms = tuple(roms)
+        self.read_pages = [None] * PAGE_COUNT
+
+        for rom in self.roms:
+            first = rom.address // PAGE_SIZE
+            for index, page in enumerate(rom.pages):
+                if self.read_pages[first + index] is not None:
+                    raise ValueError("ROM images overlap at {0:#06x}".format((first + index) * PAGE_SIZE))
+                self.read_pages[first + index] = page
+
+        self.write_pages = [None] * PAGE_COUNT
+        for index in range(PAGE_COUNT):
+            if self.read_pages[index] is None:
+                page = bytearray(PAGE_SIZE)
+                self.read_pages[index] = page
+                self.write_pages[index] = page
+
+    @classmethod
+    def _rebuild(cls, roms, ram):
+
+        # ram is the RAM pages' bytes one after the other, in address order
+        controller = cls(roms)
+        offset = 0
+        for page in controller.write_pages:
+            if page is not None:
+                page[:] = ram[offset:offset + PAGE_SIZE]
+                offset += PAGE_SIZE
+        return controller
+
+    # the page tables hold memoryviews, which can't be pickled, so the ROMs
+    # (which pickle themselves, by name if in shared memory) and the RAM
+    # contents are sent instead and the tables built again from them
+    def __reduce__(self):
+
+        ram = b"".join(page for page in self.write_pages if page is not None)
+        return (PagedMemoryController._rebuild, (self.roms, ram))
+
+    def read(self, address):
+
+        return self.read_pages[address >> 8][address & 0xff]
+
+    peek = read
+
+    def write(self, address, value):
+
+        page = self.write_pages[address >> 8]
+        if page is not None:
+            page[address & 0xff] = value
+
+    def _place(self, address, data):
+
+        end = address + len(data)
+        if address < 0 or end > PAGE_COUNT * PAGE_SIZE:
+            raise IndexError("{0} bytes at {1:#06x} do not fit in memory".format(len(data), address))
+
+        for page_number in range(address >> 8, ((end - 1) >> 8) + 1):
+            if self.write_pages[page_number] is None:
+                raise ValueError("cannot load into ROM page {0:#04x}".format(page_number))
+
+        data = memoryview(data)
+        while address < end:
+            offset = address & 0xff
+            count = min(PAGE_SIZE - offset, end - address)
+            self.write_pages[address >> 8][offset:offset + count] = data[:count]
+            data = data[count:]
+            address += count
+
+    # the pages are not contiguous, so the whole address space views are
+    # read only copies rather than live views
+    def snapshot(self):
+
+        return b"".join(self.read_pages)
+
+    def view(self, start = 0, end = None):
+
+        return memoryview(self.snapshot())[start:end]
+
+    def numpy_view(self, start = 0, end = None):
+
+        numpy = memory_controller.numpy
+        if numpy is None:
+            raise ImportError("numpy_view needs numpy installed")
+
+        return numpy.frombuffer(self.snapshot(), dtype = numpy.uint8)[start:end]
+
+    def find(self, pattern, start = 0, end = None):
+
+        if end is None:
+            end = PAGE_COUNT * PAGE_SIZE
+
+        return self.snapshot().find(pattern, start, end)
@@ -0,0 +1,95 @@
+import sys
+
+from collections import namedtuple
+
+# why a guest was stopped: kind is 'instructions', 'cycles' or 'writes',
+# with the quota that was set and how much had been used at the time
+StopReason = namedtuple('StopReason', 'kind limit used')
+
+UNLIMITED = sys.maxsize
+
+
+class QuotaExceeded(Exception):
+
+    def __init__(self, reason):
+
+        super(QuotaExceeded, self).__init__("{0} quota of {1} exceeded".format(reason.kind, reason.limit))
+        self.reason = reason
+
+
+class Quotas(object):
+
+    # Limits on how much an untrusted guest may do over the lifetime of
+    # the CPU it is attached to, None meaning no limit. Usage accumulates
+    # across calls, so a guest run in slices gets one budget in total.
+    def __init__(self, instructions = None, cycles = None, writes = None):
+
+        self.instructions = instructions
+        self.cycles = cycles
+        self.writes = writes
+
+        self.instructions_used = 0
+        self.cycles_used = 0
+        self.writes_used = 0
+
+    def remaining_instructions(self):
+
+        if self.instructions is None:
+            return UNLIMITED
+        return self.instructions - self.instructions_used
+
+    def remaining_cycles(self):
+
+        if self.cycles is None:
+            return UNLIMITED
+        return self.cycles - self.cycles_used
+
+    def charge(self, instructions, cycles):
+
+        self.instructions_used += instructions
+        self.cycles_used += cycles
+
+    def exhausted(self):
+
+        # the StopReason for the first of the instruction and cycle quotas
+        # used up, None if neither is. The write quota is left out: using
+        # it up stops nothing, only a write over it is refused (by the
+        # guard), so a guest can run on as long as it doesn't write.
+        if self.instructions is not None and self.instructions_used >= self.instructions:
+            return StopReason('instructions', self.instructions, self.instructions_used)
+        if self.cycles is not None and self.cycles_used >= self.cycles:
+            return StopReason('cycles', self.cycles, self.cycles_used)
+        return None
+
+    def guard(self, memory_controller):
+
+        # the memory controller the guest should see, only wrapped when
+        # writes need counting
+        if self.writes is None:
+            return memory_controller
+        return WriteQuotaMemoryController(memory_controller, self)
+
+
+class WriteQuotaMemoryController(object):
+
+    # Counts writes on the way through to the real controller and refuses
+    # the one that would go over quota. Reads are the controller's own
+    # bound method, so they cost nothing extra.
+    def __init__(self, memory_controller, quotas):
+
+        self.memory_controller = memory_controller
+        self.quotas = quotas
+        self.read = memory_controller.read
+
+    def write(self, address, value):
+
+        quotas = self.quotas
+        if quotas.writes_used >= quotas.writes:
+            raise QuotaExceeded(StopReason('writes', quotas.writes, quotas.writes_used))
+
+        quotas.writes_used += 1
+        self.memory_controller.write(address, value)
+
+    def __getattr__(self, name):
+
+        return getattr(self.memory_controller, name)
@@ -2,9 +2,19 @@
 
 class Registers(object):
 
+    names = (
+        'accumulator', 'x_index', 'y_index', 'sp', 'pc',
+        'carry_flag', 'zero_flag', 'interrupt_disable_flag', 'decimal_mode_flag',
+        'sw_interrupt', 'overflow_flag', 'negative_flag')
+
+    # extra_cycles is scratch space for the instruction being executed
+    # (page crossings, taken branches) rather than machine state, so it
+    # takes no part in comparisons or pickling
+    __slots__ = names + ('extra_cycles',)
+
     def __eq__(self, other) : 
-        return self.__dict__ == other.__dict__
-        
+        return all(getattr(self, name) == getattr(other, name) for name in self.names)
+
     def __init__(self):
 
         self.accumulator = 0
@@ -21,6 +31,24 @@ class Registers(object):
         self.overflow_flag = False
         self.negative_flag = False
 
+        self.extra_cycles = 0
+
+    # pickles as a bare tuple of values in slot order
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.names)
+
+    def __setstate__(self, state):
+        self.extra_cycles = 0
+        for name, value in zip(self.names, state):
+            setattr(self, name, value)
+
+    def as_dict(self):
+        return dict(zip(self.names, self.__getstate__()))
+
+    def update(self, values):
+        for name, value in values.items():
+            setattr(self, name, value)
+
     def set_NZ(self, value):
 
         self.negative_flag = (value & 0x80)
@@ -36,12 +64,24 @@ class Registers(object):
         self.overflow_flag = resultsign_differs and not signbits_differ
         self.set_NZ(result)
 
+    # NV-BDIZC, bit 5 always reads as set and B only exists on the stack
     def status_register(self):
 
-        bits = 1 if self.overflow_flag else 0
-        bits |= 0x20 if self.decimal_mode_flag else 0
-        bits |= 0x40 if self.interrupt_disable_flag else 0
-        bits |= 0x10 if self.carry_flag else 0
-        bits |= 0x20 if self.zero_flag else 0
-        bits |= 0x40 if self.negative_flag else 0
+        bits = 0x80 if self.negative_flag else 0
+        bits |= 0x40 if self.overflow_flag else 0
+        bits |= 0x20
+        bits |= 0x10 if self.sw_interrupt else 0
+        bits |= 0x08 if self.decimal_mode_flag else 0
+        bits |= 0x04 if self.interrupt_disable_flag else 0
+        bits |= 0x02 if self.zero_flag else 0
+        bits |= 0x01 if self.carry_flag else 0
         return bits
+
+    def set_status_register(self, bits):
+
+        self.negative_flag = bool(bits & 0x80)
+        self.overflow_flag = bool(bits & 0x40)
+        self.decimal_mode_flag = bool(bits & 0x08)
+        self.interrupt_disable_flag = bool(bits & 0x04)
+        self.zero_flag = bool(bits & 0x02)
+        self.carry_flag = bool(bits & 0x01)
@@ -0,0 +1,142 @@
+from array import array
+from collections import Counter, namedtuple
+
+from emupy6502.symbols import hex_name
+
+JSR = 0x20
+STACK_PAGE = 0x100
+
+# pc: the sampled address, samples: how often, share: fraction of all samples
+HotSpot = namedtuple('HotSpot', 'pc samples share')
+
+
+def record_stack(cpu, stacks, base, max_depth):
+
+    # Recovers the call stack from the 6502 stack page into stacks from
+    # base on, innermost call first, as the addresses of the subroutines
+    # called, and returns how many it found. Anything on the stack that
+    # looks like a return address (the byte three before it is a JSR) is
+    # taken to be one and whatever else is there (pushed data) is skipped.
+    # Exact for code that only uses the stack for calls, a good guess for
+    # everything else (pushed data can look like a return address), and
+    # free until it is needed. Memory is peeked, so device registers the
+    # guesses land on are never read.
+    peek = cpu.memory_controller.peek
+    address = cpu.registers.sp + 1
+    depth = 0
+
+    while address < 0xff and depth < max_depth:
+        return_address = peek(STACK_PAGE + address) | (peek(STACK_PAGE + address + 1) << 8)
+        call = return_address - 2
+        if call >= 0 and peek(call) == JSR:
+            stacks[base + depth] = peek(call + 1) | (peek(call + 2) << 8)
+            depth += 1
+            address += 2
+        else:
+            address += 1
+
+    return depth
+
+def walk_stack(cpu, max_depth = 8):
+
+    # record_stack as a list
+    stacks = array('H', bytes(2 * max_depth))
+    return stacks[:record_stack(cpu, stacks, 0, max_depth)].tolist()
+
+
+class SamplingProfiler(object):
+
+    # Runs a Cpu6502 in slices of interval cycles through Cpu6502.run and
+    # records where it is after each one, so the instruction loop itself
+    # is untouched and the cost is one sample per interval. Samples go
+    # into arrays sized up front: the PC, and a shadow call stack of up to
+    # stack_depth callee addresses from record_stack. Once capacity samples
+    # are taken the rest are only counted in dropped. Reports show
+    # addresses as name(address), $xxxx unless a symbol lookup such as
+    # SymbolTable.name is given.
+    def __init__(self, cpu, interval = 1000, capacity = 100000, stack_depth = 8, name = hex_name):
+
+        self.cpu = cpu
+        self.name = name
+        self.interval = interval
+        self.capacity = capacity
+        self.stack_depth = stack_depth
+
+        self.pcs = array('H', bytes(2 * capacity))
+        self.depths = array('B', bytes(capacity))
+        self.stacks = array('H', bytes(2 * capacity * stack_depth))
+        self.count = 0
+        self.dropped = 0
+        self.cycles = 0
+
+    def sample(self):
+
+        # records the CPU's state now, for hosts that drive it themselves
+        count = self.count
+        if count == self.capacity:
+            self.dropped += 1
+            return
+
+        self.pcs[count] = self.cpu.registers.pc
+        self.depths[count] = record_stack(self.cpu, self.stacks, count * self.stack_depth, self.stack_depth)
+        self.count = count + 1
+
+    def run(self, cycles):
+
+        # returns the cycles actually run, short if the CPU's quotas stop it
+        run = self.cpu.run
+        interval = self.interval
+        remaining = cycles
+
+        while remaining > 0:
+            consumed = run(min(interval, remaining)).cycles
+            self.cycles += consumed
+            remaining -= consumed
+            self.sample()
+            if self.cpu.stop_reason is not None:
+                break
+
+        return cycles - max(remaining, 0)
+
+    def stack(self, index):
+
+        # the shadow call stack of sample index, innermost first
+        base = index * self.stack_depth
+        return self.stacks[base:base + self.depths[index]].tolist()
+
+    def hot_spots(self, top = 20):
+
+        counts = Counter(self.pcs[:self.count])
+        return [HotSpot(pc, samples, samples / self.count) for pc, samples in counts.most_common(top)]
+
+    def hot_subroutines(self, top = 20):
+
+        # inclusive: a subroutine counts for every sample taken inside it
+        # or anything it called
+        counts = Counter()
+        for index in range(self.count):
+            counts.update(set(self.stack(index)))
+        return [HotSpot(address, samples, samples / self.count) for address, samples in counts.most_common(top)]
+
+    def report(self, top = 20):
+
+        lines = ["{0} samples every {1} cycles, {2} dropped".format(self.count, self.interval, self.dropped)]
+        if not self.count:
+            return lines[0]
+
+        # named up front so the column fits the longest name
+        hot_spots = [(self.name(pc), samples, share) for pc, samples, share in self.hot_spots(top)]
+        subroutines = [(self.name(address), samples, share)
+                       for address, samples, share in self.hot_subroutines(top)]
+        width = max(len(name) for name, _, _ in hot_spots + subroutines)
+
+        lines.append("hot spots:")
+        for name, samples, share in hot_spots:
+            lines.append("  {0:{3}} {1:8} {2:7.2%}".format(name, samples, share, width))
+
+        if subroutines:
+            lines.append("subroutines, inclusive:")
+            for name, samples, share in subroutines:
+                lines.append("  {0:{3}} {1:8} {2:7.2%}".format(name, samples, share, width))
+
+        return "\n".join(lines)
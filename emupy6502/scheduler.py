@@ -0,0 +1,184 @@
+import heapq
+import itertools
+
+# Stride scheduling: a machine's pass value advances by its stride for
+# every quantum's worth of cycles it actually used, and the runnable
+# machine with the lowest pass runs next. Higher priorities mean shorter
+# strides and so proportionally more cycles.
+STRIDE_SCALE = 1 << 20
+
+JMP_ABSOLUTE = 0x4c
+BRANCH_TO_SELF = 0xfe
+
+# opcode: (flag, branch taken when flag is)
+branches = {
+    0x10: ('negative_flag', False),
+    0x30: ('negative_flag', True),
+    0x50: ('overflow_flag', False),
+    0x70: ('overflow_flag', True),
+    0x90: ('carry_flag', False),
+    0xb0: ('carry_flag', True),
+    0xd0: ('zero_flag', False),
+    0xf0: ('zero_flag', True),
+}
+
+
+def is_idle_loop(cpu):
+
+    # True when the CPU is parked on an instruction that jumps to itself,
+    # it can make no progress until something outside changes its state
+    registers = cpu.registers
+    memory_controller = cpu.memory_controller
+    pc = registers.pc
+    opcode = memory_controller.read(pc)
+
+    if opcode == JMP_ABSOLUTE:
+        return (memory_controller.read(pc + 1) | (memory_controller.read(pc + 2) << 8)) == pc
+
+    if opcode in branches and memory_controller.read(pc + 1) == BRANCH_TO_SELF:
+        flag, taken_when = branches[opcode]
+        return bool(getattr(registers, flag)) == taken_when
+
+    return False
+
+
+class Machine(object):
+
+    __slots__ = ('cpu', 'name', 'priority', 'stride', 'pass_value', 'cycles', 'slices',
+                 'blocked', 'idle', 'finished', 'done', 'ticket')
+
+    def __init__(self, cpu, name, priority, done):
+
+        self.cpu = cpu
+        self.name = name
+        self.priority = priority
+        self.stride = STRIDE_SCALE // priority
+        self.pass_value = 0
+        self.cycles = 0
+        self.slices = 0
+        self.blocked = False
+        self.idle = False
+        self.finished = False
+        self.done = done
+        self.ticket = 0
+
+    @property
+    def runnable(self):
+
+        return not (self.blocked or self.idle or self.finished)
+
+
+class Scheduler(object):
+
+    # Multiplexes many Cpu6502 instances onto the calling thread, giving
+    # each a quantum of cycles in turn. Machines that are blocked (waiting
+    # on I/O, see block and wake), spinning in an idle loop (when
+    # detect_idle is on) or done are kept out of the run queue entirely.
+    def __init__(self, quantum = 10000, detect_idle = True):
+
+        self.quantum = quantum
+        self.detect_idle = detect_idle
+        self.machines = []
+        self.run_queue = []
+        self.global_pass = 0
+        self._sequence = itertools.count()
+
+    def add(self, cpu, priority = 1, name = None, done = None):
+
+        # done, if given, is called between slices and retires the machine
+        # once it returns True; a machine its quotas stop is retired too
+        if priority < 1:
+            raise ValueError("priority must be at least 1")
+
+        machine = Machine(cpu, name if name is not None else len(self.machines), priority, done)
+        machine.pass_value = self.global_pass
+        self.machines.append(machine)
+        self._enqueue(machine)
+        return machine
+
+    def remove(self, machine):
+
+        self.machines.remove(machine)
+        machine.finished = True
+        machine.ticket += 1
+
+    def block(self, machine):
+
+        machine.blocked = True
+        machine.ticket += 1
+
+    def wake(self, machine):
+
+        # clears blocked and idle; a machine woken after a long sleep starts
+        # from the current pass so it cannot monopolise the CPU catching up
+        was_runnable = machine.runnable
+        machine.blocked = False
+        machine.idle = False
+        if machine.runnable and not was_runnable:
+            machine.pass_value = max(machine.pass_value, self.global_pass)
+            self._enqueue(machine)
+
+    def _enqueue(self, machine):
+
+        machine.ticket += 1
+        heapq.heappush(self.run_queue, (machine.pass_value, next(self._sequence), machine.ticket, machine))
+
+    def _next(self):
+
+        while self.run_queue:
+            pass_value, _, ticket, machine = heapq.heappop(self.run_queue)
+            if ticket == machine.ticket and machine.runnable:
+                return machine
+        return None
+
+    def run_slice(self):
+
+        # runs the next machine for one quantum, returns it or None when
+        # nothing is runnable
+        machine = self._next()
+        if machine is None:
+            return None
+
+        self.global_pass = machine.pass_value
+        consumed = machine.cpu.run(self.quantum).cycles
+
+        machine.cycles += consumed
+        machine.slices += 1
+        # charge for what was used, so any overshoot counts against it
+        machine.pass_value += machine.stride * consumed // self.quantum
+
+        # a machine stopped by its quotas would only stop again straight
+        # away, so it is retired along with the ones that are done
+        if machine.cpu.stop_reason is not None or (machine.done is not None and machine.done()):
+            machine.finished = True
+        elif self.detect_idle and is_idle_loop(machine.cpu):
+            machine.idle = True
+        else:
+            self._enqueue(machine)
+
+        return machine
+
+    def run(self, slices = None):
+
+        # runs until nothing is runnable or slices have been handed out,
+        # returns the number of slices run
+        count = 0
+        while slices is None or count < slices:
+            if self.run_slice() is None:
+                break
+            count += 1
+        return count
+
+    def accounting(self):
+
+        # per machine (name, priority, cycles, share of all cycles run,
+        # share its priority entitles it to among the machines here)
+        total_cycles = sum(machine.cycles for machine in self.machines)
+        total_priority = sum(machine.priority for machine in self.machines)
+
+        return [(machine.name,
+                 machine.priority,
+                 machine.cycles,
+                 machine.cycles / total_cycles if total_cycles else 0.0,
+                 machine.priority / total_priority if total_priority else 0.0)
+                for machine in self.machines]
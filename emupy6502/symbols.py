@@ -0,0 +1,179 @@
+import bisect
+import re
+
+from collections import namedtuple
+
+Symbol = namedtuple('Symbol', 'address name')
+SourceLine = namedtuple('SourceLine', 'address filename line')
+
+# name=value pairs of a ca65 debug file line, values quoted when they are
+# strings, which may contain commas
+dbg_field = re.compile(r'(\w+)=("(?:[^"\\]|\\.)*"|[^,]*)')
+
+# "al C:0810 .start", the C: (the CPU's memory space) is optional
+vice_label = re.compile(r'^al\s+(?:[A-Za-z]+:)?([0-9A-Fa-f]{1,4})\s+\.?(\S+)')
+
+
+def hex_name(address):
+
+    return "${0:04x}".format(address)
+
+
+class SymbolTable(object):
+
+    # Addresses to symbols and source lines. Both are kept as sorted lists
+    # of addresses alongside what is at them, built on the first lookup
+    # after anything was added, so looking up is a bisect. An address
+    # between two symbols resolves to the one below it plus an offset, up
+    # to max_offset bytes past it, after which it is left as hex (the last
+    # label in a program shouldn't name everything above it).
+    def __init__(self, max_offset = 0x100):
+
+        self.max_offset = max_offset
+        self.symbols = {}
+        self.lines = {}
+        self._symbol_index = None
+        self._line_index = None
+
+    def __len__(self):
+
+        return len(self.symbols)
+
+    def add_symbol(self, address, name):
+
+        # the first name given to an address is the one reports use
+        if address not in self.symbols:
+            self.symbols[address] = name
+            self._symbol_index = None
+
+    def add_line(self, address, filename, line, size = 1):
+
+        # size is how many bytes the line assembled to
+        if address not in self.lines:
+            self.lines[address] = (filename, line, size)
+            self._line_index = None
+
+    def _below(self, index, address):
+
+        addresses = index[0]
+        position = bisect.bisect_right(addresses, address) - 1
+        if position < 0:
+            return None
+        return position
+
+    def symbol(self, address):
+
+        # (Symbol at or below address, offset from it), or None
+        if self._symbol_index is None:
+            addresses = sorted(self.symbols)
+            self._symbol_index = (addresses, [self.symbols[found] for found in addresses])
+
+        position = self._below(self._symbol_index, address)
+        if position is None:
+            return None
+
+        found = self._symbol_index[0][position]
+        if address - found > self.max_offset:
+            return None
+        return Symbol(found, self._symbol_index[1][position]), address - found
+
+    def source_line(self, address):
+
+        # the SourceLine the code at address was assembled from, or None
+        if self._line_index is None:
+            addresses = sorted(self.lines)
+            self._line_index = (addresses, [self.lines[found] for found in addresses])
+
+        position = self._below(self._line_index, address)
+        if position is None:
+            return None
+
+        found = self._line_index[0][position]
+        filename, line, size = self._line_index[1][position]
+        if address >= found + size:
+            return None
+        return SourceLine(found, filename, line)
+
+    def name(self, address):
+
+        # "name", "name+3" or "$xxxx", the name hook for the profilers
+        found = self.symbol(address)
+        if found is None:
+            return hex_name(address)
+
+        symbol, offset = found
+        return "{0}+{1}".format(symbol.name, offset) if offset else symbol.name
+
+    def describe(self, address):
+
+        # name(address) with the source line, when there is one
+        source_line = self.source_line(address)
+        if source_line is None:
+            return self.name(address)
+        return "{0} ({1}:{2})".format(self.name(address), source_line.filename, source_line.line)
+
+
+def open_lines(source):
+
+    # source is a filename or an iterable of lines, an open file say
+    if isinstance(source, str):
+        with open(source) as source_file:
+            return source_file.read().splitlines()
+    return list(source)
+
+def load_vice_labels(source, table = None):
+
+    # VICE monitor label files, as written by ld65 -Ln or the monitor's
+    # save_labels. Returns the table, a new one unless one is given.
+    table = SymbolTable() if table is None else table
+    for text in open_lines(source):
+        match = vice_label.match(text.strip())
+        if match:
+            table.add_symbol(int(match.group(1), 16), match.group(2))
+    return table
+
+def parse_dbg_line(text):
+
+    # ("sym", {"id": "0", "name": "start", ...}) for one line of a ca65
+    # debug file, strings unquoted
+    kind, rest = (text.strip().split(None, 1) + ['', ''])[:2]
+    fields = {}
+    for key, value in dbg_field.findall(rest):
+        if value.startswith('"'):
+            value = value[1:-1].replace('\\"', '"').replace('\\\\', '\\')
+        fields[key] = value
+    return kind, fields
+
+def load_ca65_dbg(source, table = None):
+
+    # ld65 --dbgfile output. Labels (sym type=lab) become symbols, equates
+    # are constants rather than addresses and are left out. Source lines
+    # are found through their spans, which are offsets into segments.
+    table = SymbolTable() if table is None else table
+    records = {'file': {}, 'seg': {}, 'span': {}, 'line': [], 'sym': []}
+
+    for text in open_lines(source):
+        kind, fields = parse_dbg_line(text)
+        if kind in ('file', 'seg', 'span'):
+            records[kind][fields['id']] = fields
+        elif kind in ('line', 'sym'):
+            records[kind].append(fields)
+
+    for fields in records['sym']:
+        if fields.get('type') == 'lab' and 'val' in fields:
+            table.add_symbol(int(fields['val'], 0), fields['name'])
+
+    # lines from macro expansions (type=1 and up) come after the source
+    # lines, so the source line wins where both cover an address
+    lines = sorted(records['line'], key = lambda fields: int(fields.get('type', '0')))
+    for fields in lines:
+        if 'span' not in fields:
+            continue
+        filename = records['file'][fields['file']]['name']
+        for span_id in fields['span'].split('+'):
+            span = records['span'][span_id]
+            segment = records['seg'][span['seg']]
+            address = int(segment['start'], 0) + int(span['start'], 0)
+            table.add_line(address, filename, int(fields['line']), int(span['size'], 0))
+
+    return table
@@ -0,0 +1,158 @@
+import queue
+import threading
+
+from concurrent.futures import Future
+
+from emupy6502.registers import Registers
+
+
+class ThreadedRunner(object):
+
+    # Runs a Cpu6502 on its own thread. The controlling thread talks to it
+    # only through a SimpleQueue, which the emulation thread drains between
+    # quanta, so there is nothing in the instruction loop itself to slow it
+    # down. Every command returns a Future that completes once the command
+    # has been carried out.
+    def __init__(self, cpu, quantum = 10000, paused = False):
+
+        self.cpu = cpu
+        self.quantum = quantum
+        self.paused = paused
+        self.cycles = 0
+        self.error = None
+
+        self._commands = queue.SimpleQueue()
+        # only guards shutting down against commands arriving at the same
+        # time, the emulation thread never takes it while running
+        self._closing = threading.Lock()
+        self._closed = False
+        self._running = False
+        self._thread = threading.Thread(target = self._loop, daemon = True)
+
+    def start(self):
+
+        self._running = True
+        self._thread.start()
+        return self
+
+    def __enter__(self):
+
+        return self.start()
+
+    def __exit__(self, *exc_info):
+
+        self.stop().result()
+        self.join()
+
+    def join(self, timeout = None):
+
+        self._thread.join(timeout)
+
+    def _send(self, command, *args):
+
+        future = Future()
+        with self._closing:
+            if self._closed:
+                future.set_exception(self.error or RuntimeError("runner has stopped"))
+            else:
+                self._commands.put((command, args, future))
+        return future
+
+    def pause(self):
+
+        return self._send('pause')
+
+    def resume(self):
+
+        return self._send('resume')
+
+    def step(self, instructions = 1):
+
+        # runs exactly this many instructions, the future gives the cycles
+        return self._send('step', instructions)
+
+    def snapshot(self):
+
+        # the future gives a copy of the registers and of memory
+        return self._send('snapshot')
+
+    def poke(self, address, data):
+
+        # data is a single byte value or a bytes-like run of them
+        return self._send('poke', address, data)
+
+    def stop(self):
+
+        return self._send('stop')
+
+    def _handle(self, command, args, future):
+
+        if command == 'pause':
+            self.paused = True
+            future.set_result(self.cycles)
+        elif command == 'resume':
+            self.paused = False
+            future.set_result(self.cycles)
+        elif command == 'step':
+            cycles = 0
+            try:
+                for _ in range(args[0]):
+                    cycles += self.cpu.step()
+            except Exception as exception:
+                # the guest is broken, so the runner stops as well
+                future.set_exception(exception)
+                raise
+            finally:
+                self.cycles += cycles
+            future.set_result(cycles)
+        elif command == 'snapshot':
+            registers = Registers()
+            registers.__setstate__(self.cpu.registers.__getstate__())
+            future.set_result((registers, self.cpu.memory_controller.snapshot()))
+        elif command == 'poke':
+            address, data = args
+            try:
+                if isinstance(data, int):
+                    self.cpu.memory_controller.write(address, data)
+                else:
+                    self.cpu.memory_controller.load_binary(data, address)
+            except Exception as exception:
+                future.set_exception(exception)
+            else:
+                future.set_result(None)
+        elif command == 'stop':
+            self._running = False
+            future.set_result(self.cycles)
+        else:
+            future.set_exception(ValueError("unknown command {0}".format(command)))
+
+    def _loop(self):
+
+        commands = self._commands
+
+        try:
+            while self._running:
+                if self.paused:
+                    # nothing to run, so wait for the next command
+                    self._handle(*commands.get())
+                    continue
+
+                while not commands.empty():
+                    self._handle(*commands.get_nowait())
+
+                if self._running and not self.paused:
+                    self.cycles += self.cpu.run(self.quantum).cycles
+                    if self.cpu.stop_reason is not None:
+                        # stopped by its quotas, running again would only
+                        # spin, so the runner stops as it would for stop()
+                        break
+        except Exception as exception:
+            self.error = exception
+        finally:
+            self._running = False
+            # nobody is going to service what is left
+            with self._closing:
+                self._closed = True
+                while not commands.empty():
+                    _, _, future = commands.get_nowait()
+                    future.set_exception(self.error or RuntimeError("runner has stopped"))
@@ -7,5 +7,7 @@ setup(name='emupy6502',
       author_email='crispg72@users.noreply.github.com',
       url='https://github.com/crispg72/emupy6502',
       license='MIT',
+      python_requires='>=3.9',
       packages=find_packages(exclude=['contrib', 'docs', 'tests']),
+      extras_require={'numpy': ['numpy']},
      )
@@ -0,0 +1,46 @@
+from emupy6502.cpu6502 import Cpu6502
+from emupy6502.memory_controller import MemoryController
+
+# The machine factory and guest programs the tests share. Programs are
+# built to run from $0600, where the factories leave the PC.
+
+PROGRAM_ADDRESS = 0x600
+
+# JMP $0600 forever, 3 cycles a trip
+busy_loop_instructions = bytes([0x4c, 0x00, 0x06])
+
+# INX, JMP $0600
+counting_loop_instructions = bytes([0xe8, 0x4c, 0x00, 0x06])
+
+#  0600 JSR $0610
+#  0603 JMP $0600
+#  0610 JSR $0620
+#  0613 RTS
+#  0620 LDX #$00
+#  0622 DEX
+#  0623 BNE $0622
+#  0625 RTS
+nested_segments = (
+    (0x600, bytes([0x20, 0x10, 0x06, 0x4c, 0x00, 0x06])),
+    (0x610, bytes([0x20, 0x20, 0x06, 0x60])),
+    (0x620, bytes([0xa2, 0x00, 0xca, 0xd0, 0xfd, 0x60])),
+)
+
+
+def load_cpu(segments, quotas = None, counters = None):
+
+    # segments are (address, bytes) pairs, loaded into 64K of plain memory
+    memory_controller = MemoryController(65536)
+    for address, data in segments:
+        memory_controller.load_binary(data, address)
+
+    cpu = Cpu6502(memory_controller)
+    cpu.registers.pc = PROGRAM_ADDRESS
+    cpu.quotas = quotas
+    if counters is not None:
+        cpu.counters = counters
+    return cpu
+
+def make_cpu(instructions, quotas = None, counters = None):
+
+    return load_cpu(((PROGRAM_ADDRESS, instructions),), quotas, counters)
@@ -265,7 +265,6 @@ def test_absolute_x():
     registers = Registers()
     registers.pc = 1 #fake loading of opcode
     registers.x_index = 0x3
-    AddressingModes.cycle_count = 0
 
     with patch.object(MemoryController, 'read') as mock_memory_controller:
 
@@ -278,7 +277,7 @@ def test_absolute_x():
         assert mock_memory_controller.read.call_args_list[1] == unittest.mock.call(2)
         assert registers.pc == 3
         assert value == 0xc003
-        assert AddressingModes.cycle_count == 0
+        assert registers.extra_cycles == 0
 
 def test_absolute_x_page_boundary():
 
@@ -286,7 +285,6 @@ def test_absolute_x_page_boundary():
     registers = Registers()
     registers.pc = 1 #fake loading of opcode
     registers.x_index = 0x3
-    AddressingModes.cycle_count = 0
 
     with patch.object(MemoryController, 'read') as mock_memory_controller:
 
@@ -299,7 +297,7 @@ def test_absolute_x_page_boundary():
         assert mock_memory_controller.read.call_args_list[1] == unittest.mock.call(2)
         assert registers.pc == 3
         assert value == 0xc101
-        assert AddressingModes.cycle_count == 1
+        assert registers.extra_cycles == 1
 
 def test_absolute_y():
 
@@ -307,7 +305,6 @@ def test_absolute_y():
     registers = Registers()
     registers.pc = 1 #fake loading of opcode
     registers.y_index = 0x3
-    AddressingModes.cycle_count = 0
 
     with patch.object(MemoryController, 'read') as mock_memory_controller:
 
@@ -320,7 +317,7 @@ def test_absolute_y():
         assert mock_memory_controller.read.call_args_list[1] == unittest.mock.call(2)
         assert registers.pc == 3
         assert value == 0xc003
-        assert AddressingModes.cycle_count == 0
+        assert registers.extra_cycles == 0
 
 def test_absolute_y_page_boundary():
 
@@ -328,7 +325,6 @@ def test_absolute_y_page_boundary():
     registers = Registers()
     registers.pc = 1 #fake loading of opcode
     registers.y_index = 0x3
-    AddressingModes.cycle_count = 0
 
     with patch.object(MemoryController, 'read') as mock_memory_controller:
 
@@ -341,7 +337,7 @@ def test_absolute_y_page_boundary():
         assert mock_memory_controller.read.call_args_list[1] == unittest.mock.call(2)
         assert registers.pc == 3
         assert value == 0xc101
-        assert AddressingModes.cycle_count == 1
+        assert registers.extra_cycles == 1
 
 def test_indirect_indexed_y():
 
@@ -349,7 +345,6 @@ def test_indirect_indexed_y():
     registers = Registers()
     registers.pc = 1 #fake loading of opcode
     registers.y_index = 0x3
-    AddressingModes.cycle_count = 0
 
     with patch.object(MemoryController, 'read') as mock_memory_controller:
 
@@ -363,7 +358,7 @@ def test_indirect_indexed_y():
         assert mock_memory_controller.read.call_args_list[2] == unittest.mock.call(0x2b)
         assert registers.pc == 2
         assert value == 0x402b
-        assert AddressingModes.cycle_count == 0
+        assert registers.extra_cycles == 0
 
 def test_indirect_indexed_y_zp_boundary():
 
@@ -371,7 +366,6 @@ def test_indirect_indexed_y_zp_boundary():
     registers = Registers()
     registers.pc = 1 #fake loading of opcode
     registers.y_index = 0x3
-    AddressingModes.cycle_count = 0
 
     with patch.object(MemoryController, 'read') as mock_memory_controller:
 
@@ -385,7 +379,7 @@ def test_indirect_indexed_y_zp_boundary():
         assert mock_memory_controller.read.call_args_list[2] == unittest.mock.call(0x00)
         assert registers.pc == 2
         assert value == 0x402b
-        assert AddressingModes.cycle_count == 0
+        assert registers.extra_cycles == 0
 
 def test_indirect_indexed_y_page_boundary():
 
@@ -393,7 +387,6 @@ def test_indirect_indexed_y_page_boundary():
     registers = Registers()
     registers.pc = 1 #fake loading of opcode
     registers.y_index = 0x3
-    AddressingModes.cycle_count = 0
 
     with patch.object(MemoryController, 'read') as mock_memory_controller:
 
@@ -407,4 +400,4 @@ def test_indirect_indexed_y_page_boundary():
         assert mock_memory_controller.read.call_args_list[2] == unittest.mock.call(0x2b)
         assert registers.pc == 2
         assert value == 0x4101
-        assert AddressingModes.cycle_count == 1
\ No newline at end of file
+        assert registers.extra_cycles == 1
\ No newline at end of file
@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+from emupy6502.bench.allocations import AllocationBudgetExceeded, allocations_per_instruction, audit, \
+    audited_files, blocks_per_instruction, check_budget, format_report
+from emupy6502.bench.workloads import Workload, mult10_program, workloads_by_name
+from emupy6502.memory_controller import MemoryController
+
+
+class LeakyMemoryController(MemoryController):
+
+    def __init__(self):
+
+        super(LeakyMemoryController, self).__init__(65536)
+        self.log = []
+
+    def read(self, address):
+
+        self.log.append([address])
+        return self.buffer[address]
+
+class CopyingMemoryController(MemoryController):
+
+    def read(self, address):
+
+        # a copy of the byte that is gone again before the read returns
+        return bytes(self.buffer[address:address + 1])[0]
+
+leaky_workload = Workload('leaky', "keeps a list per read", mult10_program,
+                          memory_controller = LeakyMemoryController)
+copying_workload = Workload('copying', "copies every byte it reads", mult10_program,
+                            memory_controller = lambda: CopyingMemoryController(65536))
+
+def test_hot_loop_retains_nothing_per_instruction():
+
+    report = audit(workloads_by_name['mult10'], cycles = 5000, warmup = 5000, sample_instructions = 100)
+
+    assert report.instructions > 1000
+    assert blocks_per_instruction(report) < 0.01
+    assert check_budget(report) is report
+    assert report.sampled == 100
+    assert 'mult10' in format_report(report)
+
+def test_leak_is_attributed_and_over_budget():
+
+    report = audit(leaky_workload, cycles = 2000, warmup = 100, sample_instructions = 10, files = (__file__,))
+
+    # at least one list for every instruction's opcode fetch
+    assert report.retained_blocks >= report.instructions
+    assert all(line.filename == __file__ for line in report.lines)
+
+    with pytest.raises(AllocationBudgetExceeded) as exceeded:
+        check_budget(report)
+    assert exceeded.value.report is report
+
+def test_peak_budget():
+
+    report = audit(workloads_by_name['sort'], cycles = 2000, warmup = 2000, sample_instructions = 10)
+
+    with pytest.raises(AllocationBudgetExceeded):
+        check_budget(report, peak_size_budget = -1)
+
+def test_transient_allocations_are_attributed_to_functions():
+
+    report = audit(copying_workload, cycles = 2000, warmup = 2000, sample_instructions = 200)
+
+    # nothing is kept, but every read allocates while it runs
+    assert blocks_per_instruction(report) < 0.01
+    assert allocations_per_instruction(report) >= 0.5
+    assert all(os.path.basename(function.filename) in audited_files for function in report.functions)
+    assert 'absoW' in [function.name for function in report.functions]
+    assert 'absoW' in format_report(report)
+
+def test_zero_allocation_budget():
+
+    report = audit(workloads_by_name['mult10'], cycles = 2000, warmup = 2000, sample_instructions = 100)
+
+    # addresses and a PC above 255 are new int objects
+    assert report.allocations > 0
+    with pytest.raises(AllocationBudgetExceeded):
+        check_budget(report, allocations_per_instruction_budget = 0)
+
+    clean = report._replace(allocations = 0, functions = [])
+    assert check_budget(clean, allocations_per_instruction_budget = 0) is clean
@@ -0,0 +1,121 @@
+import pickle
+import pytest
+
+from concurrent.futures import ThreadPoolExecutor
+
+from emupy6502.batch import Job, measure_scaling, run_batch, run_batch_threaded, run_job
+from emupy6502.cpu6502 import Cpu6502
+from emupy6502.memory_controller import MemoryController
+from emupy6502.registers import Registers
+
+from tests.helpers import busy_loop_instructions
+
+# ASL, STA $060B, ASL, ASL, CLC, ADC $060B, BRK
+mult10_instructions = bytes([0x0a, 0x8d, 0x0b, 0x06, 0x0a, 0x0a, 0x18, 0x6d, 0x0b, 0x06, 0x0])
+
+
+def mult10_job(value, **kwargs):
+
+    return Job([(0x600, mult10_instructions)], {'pc': 0x600, 'accumulator': value}, **kwargs)
+
+def test_registers_pickle_as_values():
+
+    registers = Registers()
+    registers.accumulator = 0x42
+    registers.carry_flag = True
+    assert registers.__getstate__()[0] == 0x42
+    assert pickle.loads(pickle.dumps(registers)) == registers
+
+def test_cpu_round_trips_through_pickle():
+
+    memory_controller = MemoryController(65536)
+    memory_controller.load_binary(mult10_instructions, 0x600)
+    cpu = Cpu6502(memory_controller)
+    cpu.registers.pc = 0x600
+    cpu.registers.accumulator = 7
+
+    copy = pickle.loads(pickle.dumps(cpu))
+    assert copy.registers == cpu.registers
+    assert copy.memory_controller.buffer == memory_controller.buffer
+    assert copy.opcodes is cpu.opcodes
+
+def test_run_job_stops_before_brk():
+
+    result = run_job(mult10_job(10, ranges = [(0x60b, 0x60c)]))
+    assert result.error is None
+    assert result.registers['accumulator'] == 100
+    assert result.registers['pc'] == 0x60a
+    assert result.ranges == ((0x60b, bytes([20])),)
+    assert result.cycles > 0
+
+def test_run_job_stop_address():
+
+    result = run_job(mult10_job(3, stop_addresses = [0x604]))
+    assert result.registers['pc'] == 0x604
+    assert result.registers['accumulator'] == 6
+
+def test_run_job_reports_cycle_limit():
+
+    result = run_job(Job([(0x600, busy_loop_instructions)], {'pc': 0x600}, max_cycles = 300))
+    assert result.error == "cycle limit of 300 reached"
+    assert result.cycles >= 300
+
+def test_run_job_reports_guest_errors():
+
+    # PHP is not implemented
+    result = run_job(Job([(0x600, b"\x08")], {'pc': 0x600}))
+    assert result.error is not None
+
+def test_jobs_pickle_compactly():
+
+    assert len(pickle.dumps(mult10_job(10))) < 300
+
+def test_run_batch_across_processes():
+
+    jobs = [mult10_job(value) for value in range(20)]
+    results = sorted(run_batch(jobs, max_workers = 2, chunk_size = 3))
+    assert [result.job_id for result in results] == list(range(20))
+    assert [result.registers['accumulator'] for result in results] == [(value * 10) & 0xff for value in range(20)]
+
+def test_run_batch_leaves_jobs_unchanged():
+
+    jobs = [mult10_job(value) for value in range(4)]
+    with ThreadPoolExecutor(2) as executor:
+        first = sorted(run_batch(jobs, executor = executor))
+        # resubmitted behind another job, the numbering follows the new order
+        second = sorted(run_batch([mult10_job(9)] + jobs, executor = executor))
+
+    assert [job.job_id for job in jobs] == [None] * 4
+    assert [result.job_id for result in first] == [0, 1, 2, 3]
+    assert [result.registers['accumulator'] for result in second] == [90, 0, 10, 20, 30]
+
+def test_run_batch_with_supplied_executor():
+
+    with ThreadPoolExecutor(2) as executor:
+        results = list(run_batch([mult10_job(5, job_id = 'five')], executor = executor))
+
+    assert results[0].job_id == 'five'
+    assert results[0].registers['accumulator'] == 50
+
+def test_run_batch_threaded():
+
+    jobs = [mult10_job(value) for value in range(10)]
+    results = sorted(run_batch_threaded(jobs, max_workers = 3, chunk_size = 2))
+    assert [result.registers['accumulator'] for result in results] == [value * 10 for value in range(10)]
+
+def test_threads_do_not_share_cycle_counts():
+
+    # a page crossing STA abs,X on every trip so extra cycles are counted
+    # LDX #$ff, loop: STA $06ff,X, DEY, BNE loop, BRK
+    program = bytes([0xa2, 0xff, 0x9d, 0xff, 0x06, 0x88, 0xd0, 0xfa, 0x00])
+    expected = run_job(Job([(0x600, program)], {'pc': 0x600})).cycles
+
+    jobs = [Job([(0x600, program)], {'pc': 0x600}) for _ in range(16)]
+    assert set(result.cycles for result in run_batch_threaded(jobs, max_workers = 4, chunk_size = 1)) == set([expected])
+
+def test_measure_scaling_reports_each_worker_count():
+
+    rows = measure_scaling(mult10_job(3), worker_counts = [1, 2], jobs_per_worker = 2)
+    assert [row[0] for row in rows] == [1, 2]
+    assert rows[0][2] == pytest.approx(1.0)
+    assert all(seconds > 0 for _, seconds, _ in rows)
@@ -0,0 +1,117 @@
+import pytest
+
+from emupy6502.bench import Sample, format_results, load_results, measure, rates, run_suite, \
+    samples_of, save_results, summarise
+from emupy6502.bench.workloads import sort_data, sqrt_routine, workloads, workloads_by_name
+
+
+def run_to(cpu, address):
+
+    # at least one instruction, then on until address comes round
+    cpu.step()
+    while cpu.registers.pc != address:
+        cpu.step()
+
+class FakeClock(object):
+
+    def __init__(self, tick = 0.5):
+
+        self.now = 0.0
+        self.tick = tick
+
+    def __call__(self):
+
+        self.now += self.tick
+        return self.now
+
+def test_every_workload_runs_forever():
+
+    for workload in workloads:
+        cpu = workload.build()
+        result = cpu.run(20000)
+        assert result.cycles >= 20000
+
+def test_mult10_workload():
+
+    cpu = workloads_by_name['mult10'].build()
+    run_to(cpu, 0x60c)
+    assert cpu.registers.accumulator == 100
+
+def test_sqrt_workload():
+
+    cpu = workloads_by_name['sqrt'].build()
+    run_to(cpu, 0x608 + len(sqrt_routine))
+    assert cpu.memory_controller.read(0xf6) == 23
+    assert cpu.memory_controller.read(0xf2) == 0
+
+def test_memcopy_workload():
+
+    cpu = workloads_by_name['memcopy'].build()
+    cpu.memory_controller.load_binary(bytes(range(256)) * 4, 0x1000)
+    run_to(cpu, 0x620)
+    assert cpu.memory_controller.compare(0x2000, bytes(range(256)) * 4)
+
+def test_bcd_workload():
+
+    cpu = workloads_by_name['bcd'].build()
+    cpu.memory_controller.load_binary(bytes([0x00, 0x00, 0x00, 0xff]), 0xf4)
+    run_to(cpu, 0x60e)
+    run_to(cpu, 0x60e)
+    assert cpu.memory_controller.compare(0xf0, bytes([0x00, 0x00, 0x01, 0xfe]))
+
+def test_sort_workload():
+
+    cpu = workloads_by_name['sort'].build()
+    run_to(cpu, 0x62a)
+    assert cpu.memory_controller.compare(0x80, bytes(sorted(sort_data)))
+
+def test_polling_workload():
+
+    cpu = workloads_by_name['polling'].build()
+    run_to(cpu, 0x612)
+    assert cpu.memory_controller.compare(0x200, bytes(range(1, 256)) + bytes([0]))
+    assert cpu.memory_controller.polls == 4 * 256
+
+def test_rates():
+
+    mhz, instructions_per_second, ns_per_instruction = rates(Sample(2000000, 500000, 2.0))
+    assert mhz == 1.0
+    assert instructions_per_second == 250000
+    assert ns_per_instruction == 4000
+
+def test_measure_runs_warmup_then_repetitions():
+
+    samples = measure(workloads_by_name['mult10'], cycles = 1000, repetitions = 3, warmup = 2,
+                      clock = FakeClock())
+    assert len(samples) == 3
+    assert all(sample.seconds == 0.5 for sample in samples)
+    # the overshoot carries from one repetition to the next
+    assert all(990 < sample.cycles < 1010 for sample in samples)
+
+def test_summarise_takes_medians():
+
+    summary = summarise([Sample(1000000, 1000, 1.0), Sample(1000000, 1000, 0.5), Sample(1000000, 1000, 2.0)])
+    assert summary['mhz'] == 1.0
+    assert summary['best_mhz'] == 2.0
+    assert summary['worst_mhz'] == 0.5
+    assert summary['ns_per_instruction'] == 1000000
+
+def test_results_round_trip(tmp_path):
+
+    results = run_suite(['mult10', 'sort'], cycles = 1000, repetitions = 2, warmup = 0, clock = FakeClock())
+    filename = str(tmp_path / 'results.json')
+    save_results(results, filename)
+
+    loaded = load_results(filename)
+    assert sorted(loaded['workloads']) == ['mult10', 'sort']
+    assert loaded['parameters'] == {'cycles': 1000, 'repetitions': 2, 'warmup': 0}
+    assert samples_of(loaded, 'sort') == samples_of(results, 'sort')
+    assert 'mult10' in format_results(loaded)
+
+def test_load_results_rejects_other_files(tmp_path):
+
+    filename = tmp_path / 'other.json'
+    filename.write_text('{"workloads": {}}')
+
+    with pytest.raises(ValueError):
+        load_results(str(filename))
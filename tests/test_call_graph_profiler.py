@@ -0,0 +1,137 @@
+import io
+
+from emupy6502.call_graph_profiler import CallGraphProfiler
+from emupy6502.counters import AccessCountingMemoryController
+from emupy6502.cpu6502 import Cpu6502
+from emupy6502.quotas import Quotas, StopReason
+
+from tests.helpers import load_cpu, nested_segments
+
+# one pass of nested_segments: JSR + JMP in main, JSR + RTS in $0610,
+# LDX, 256 DEX, 255 BNEs taken and one not, RTS in $0620
+main_cycles = 6 + 3
+outer_cycles = 6 + 6
+inner_cycles = 2 + 256 * 2 + 255 * 3 + 2 + 6
+pass_cycles = main_cycles + outer_cycles + inner_cycles
+
+#  0600 BRK
+#  0602 JMP $0602
+#  0700 INX
+#  0701 RTI
+interrupt_segments = (
+    (0x600, bytes([0x00, 0xea, 0x4c, 0x02, 0x06])),
+    (0x700, bytes([0xe8, 0x40])),
+    (0xfffe, bytes([0x00, 0x07])),
+)
+
+
+def test_inclusive_and_exclusive_cycles():
+
+    profiler = CallGraphProfiler(load_cpu(nested_segments))
+
+    assert profiler.run(pass_cycles * 3) == pass_cycles * 3
+    assert profiler.cpu.registers.pc == 0x600
+    assert profiler.frames[-1].address is None
+
+    assert profiler.calls == {0x610: 3, 0x620: 3}
+    assert profiler.exclusive == {0x610: outer_cycles * 3, 0x620: inner_cycles * 3}
+    assert profiler.inclusive == {0x610: (outer_cycles + inner_cycles) * 3, 0x620: inner_cycles * 3}
+    assert [profile.address for profile in profiler.subroutines()] == [0x610, 0x620]
+
+def test_folded_stacks():
+
+    profiler = CallGraphProfiler(load_cpu(nested_segments))
+    profiler.run(pass_cycles)
+
+    output = io.StringIO()
+    profiler.write_folded(output)
+    assert output.getvalue().splitlines() == [
+        "main {0}".format(main_cycles),
+        "main;$0610 {0}".format(outer_cycles),
+        "main;$0610;$0620 {0}".format(inner_cycles),
+    ]
+
+def test_names_come_from_the_hook():
+
+    names = {0x610: 'outer', 0x620: 'inner'}
+    profiler = CallGraphProfiler(load_cpu(nested_segments), name = names.get)
+    profiler.run(pass_cycles)
+
+    assert profiler.folded_lines()[-1] == "main;outer;inner {0}".format(inner_cycles)
+    report = profiler.report().splitlines()
+    assert report[1].split() == ['outer', '1', str(outer_cycles + inner_cycles), str(outer_cycles)]
+    assert report[2].split() == ['inner', '1', str(inner_cycles), str(inner_cycles)]
+
+def test_subroutines_still_running_count_so_far():
+
+    profiler = CallGraphProfiler(load_cpu(nested_segments))
+    profiler.run(signal = lambda: profiler.cpu.registers.pc == 0x622)
+
+    assert [frame.address for frame in profiler.frames[1:]] == [0x610, 0x620]
+    assert profiler.inclusive == {}
+    profiles = profiler.subroutines()
+    assert [(profile.address, profile.inclusive) for profile in profiles] == [(0x610, 6 + 2), (0x620, 2)]
+
+def test_unwinding_the_stack_by_hand_pops_frames():
+
+    #  0600 JSR $0610
+    #  0603 JMP $0603
+    #  0610 JSR $0620
+    #  0613 RTS
+    #  0620 TSX
+    #  0621 INX
+    #  0622 INX
+    #  0623 TXS       drops $0610's return address
+    #  0624 RTS       back to $0603, skipping $0610's RTS
+    cpu = load_cpu((
+        (0x600, bytes([0x20, 0x10, 0x06, 0x4c, 0x03, 0x06])),
+        (0x610, bytes([0x20, 0x20, 0x06, 0x60])),
+        (0x620, bytes([0xba, 0xe8, 0xe8, 0x9a, 0x60])),
+    ))
+    profiler = CallGraphProfiler(cpu)
+    profiler.run(signal = lambda: cpu.registers.pc == 0x603)
+
+    assert len(profiler.frames) == 1
+    assert set(profiler.inclusive) == {0x610, 0x620}
+
+def test_interrupts_are_frames():
+
+    profiler = CallGraphProfiler(load_cpu(interrupt_segments))
+    profiler.run(signal = lambda: profiler.cpu.registers.pc == 0x602)
+
+    assert profiler.cpu.registers.x_index == 1
+    assert profiler.calls == {0x700: 1}
+    assert len(profiler.frames) == 1
+    assert profiler.folded_lines() == ["main 7", "main;$0700 8"]
+
+def test_profiling_adds_no_reads():
+
+    def counting_cpu():
+        memory_controller = AccessCountingMemoryController()
+        cpu = Cpu6502(memory_controller)
+        for address, data in nested_segments:
+            memory_controller.load_binary(data, address)
+        cpu.registers.pc = 0x600
+        return cpu
+
+    profiled = counting_cpu()
+    CallGraphProfiler(profiled).run(pass_cycles)
+    plain = counting_cpu()
+    plain.run_until_signalled(lambda: plain.total_cycles >= pass_cycles)
+
+    assert profiled.memory_controller.reads == plain.memory_controller.reads
+
+def test_stops_without_recording_when_the_quotas_stop_the_cpu():
+
+    # JSR pushes its return address, so with no writes allowed the first
+    # one is refused and no call happens
+    cpu = load_cpu(nested_segments)
+    cpu.quotas = Quotas(writes = 0)
+    profiler = CallGraphProfiler(cpu)
+
+    assert profiler.run(1000) == 0
+    assert cpu.stop_reason == StopReason('writes', 0, 0)
+    assert profiler.step() == 0
+    assert profiler.calls == {}
+    assert profiler.folded == {}
+    assert len(profiler.frames) == 1
@@ -0,0 +1,102 @@
+import pytest
+
+from emupy6502.bench import Sample, save_results
+from emupy6502.bench.compare import compare_results, compare_samples, critical_t, format_comparisons, \
+    main, welch
+
+
+def samples(*ns_per_instruction):
+
+    # 1000 instructions a repetition, so seconds * 1e6 is ns per instruction
+    return [Sample(4000, 1000, ns / 1000000) for ns in ns_per_instruction]
+
+def results(**workloads):
+
+    return {
+        'format': 1,
+        'parameters': {'cycles': 4000, 'repetitions': 5, 'warmup': 0},
+        'workloads': {name: {'samples': [sample._asdict() for sample in workload_samples],
+                             'summary': {}, 'description': name}
+                      for name, workload_samples in workloads.items()},
+    }
+
+def test_critical_t():
+
+    assert critical_t(1) == 12.706
+    assert critical_t(8) == 2.306
+    # rounded down to the table
+    assert critical_t(8.9) == 2.306
+    assert critical_t(50) == 2.021
+    assert critical_t(10000) == 1.960
+    assert critical_t(0.5, 99) == 63.657
+
+    with pytest.raises(ValueError):
+        critical_t(10, 80)
+
+def test_welch():
+
+    difference, low, high, t = welch([10, 11, 9, 10, 10], [12, 13, 11, 12, 12])
+
+    # equal variances of 0.5 over 5 samples each give 8 degrees of freedom
+    assert difference == 2
+    assert t == pytest.approx(4.472, abs = 0.001)
+    assert low == pytest.approx(2 - 2.306 * 0.4472, abs = 0.001)
+    assert high == pytest.approx(2 + 2.306 * 0.4472, abs = 0.001)
+
+def test_noiseless_samples():
+
+    assert welch([5, 5, 5], [5, 5, 5]) == (0, 0, 0, 0.0)
+    assert welch([5, 5, 5], [6, 6, 6])[3] == float('inf')
+
+def test_slowdown_is_a_regression():
+
+    comparison = compare_samples('sort', samples(1000, 1010, 990, 1000, 1000), samples(1200, 1210, 1190, 1200, 1200))
+    assert comparison.status == 'regression'
+    assert comparison.change == pytest.approx(0.2)
+    assert 0 < comparison.low < comparison.change < comparison.high
+
+def test_small_slowdown_is_under_threshold():
+
+    comparison = compare_samples('sort', samples(1000, 1001, 999), samples(1020, 1021, 1019))
+    assert comparison.low > 0
+    assert comparison.status == 'unchanged'
+
+def test_noise_is_not_a_regression():
+
+    comparison = compare_samples('sort', samples(1000, 1400, 700), samples(1300, 900, 1500))
+    assert comparison.low < 0 < comparison.high
+    assert comparison.status == 'unchanged'
+
+def test_speedup_is_an_improvement():
+
+    comparison = compare_samples('sort', samples(1000, 1010, 990), samples(800, 810, 790))
+    assert comparison.status == 'improvement'
+
+def test_single_samples_cannot_be_tested():
+
+    comparison = compare_samples('sort', samples(1000), samples(2000))
+    assert comparison.status == 'insufficient samples'
+    assert comparison.change == 1.0
+
+def test_compare_results_only_shared_workloads():
+
+    baseline = results(sort = samples(1000, 1010, 990), bcd = samples(500, 505, 495))
+    candidate = results(sort = samples(1000, 1010, 990), sqrt = samples(1, 2, 3))
+
+    comparisons = compare_results(baseline, candidate)
+    assert [comparison.name for comparison in comparisons] == ['sort']
+    assert 'sort' in format_comparisons(comparisons)
+
+def test_main_exit_status(tmp_path, capsys):
+
+    baseline = str(tmp_path / 'baseline.json')
+    slower = str(tmp_path / 'slower.json')
+    same = str(tmp_path / 'same.json')
+    save_results(results(sort = samples(1000, 1010, 990)), baseline)
+    save_results(results(sort = samples(2000, 2010, 1990)), slower)
+    save_results(results(sort = samples(1000, 1011, 991)), same)
+
+    assert main([baseline, slower]) == 1
+    assert 'regression' in capsys.readouterr().out
+    assert main([baseline, same]) == 0
+    assert main([baseline, slower, '--threshold', '150']) == 0
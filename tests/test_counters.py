@@ -0,0 +1,154 @@
+import asyncio
+import pickle
+
+from emupy6502.counters import PerformanceCounters, access_table
+from emupy6502.cpu6502 import Cpu6502
+from emupy6502.memory_controller import MemoryController
+
+from tests.helpers import busy_loop_instructions, make_cpu
+
+#  0600 LDX #$03
+#  0602 DEX
+#  0603 BNE $0602
+#  0605 LDY #$01
+#  0607 LDA $02ff,Y
+#  060a STA $0200
+#  060d BRK
+counted_instructions = bytes([0xa2, 0x03, 0xca, 0xd0, 0xfd, 0xa0, 0x01, 0xb9, 0xff, 0x02, 0x8d, 0x00, 0x02,
+                              0x00])
+
+
+def test_access_table():
+
+    table = access_table()
+    assert access_table() is table
+
+    # opcode fetch included
+    assert table[0xea] == (1, 0)
+    assert table[0xa9] == (2, 0)
+    assert table[0xad] == (4, 0)
+    assert table[0x8d] == (3, 1)
+    assert table[0xee] == (4, 1)
+    assert table[0x00] == (3, 3)
+    # unimplemented
+    assert table[0x08] == (1, 0)
+    assert table[0x20] == (3, 2)
+
+def test_totals_are_kept_without_detail():
+
+    cpu = make_cpu(busy_loop_instructions, counters = PerformanceCounters())
+    cpu.run(300)
+    cpu.run(300)
+
+    assert cpu.counters.instructions == 200
+    assert cpu.counters.cycles == 600
+    assert cpu.counters.histogram is None
+    assert cpu.counters.branches_taken is None
+    assert cpu.counters.reads is None
+    assert cpu.counters.as_dict()['writes'] is None
+
+def test_detailed_counters():
+
+    cpu = make_cpu(counted_instructions, counters = PerformanceCounters(detailed = True))
+    cycles = sum(cpu.step() for _ in range(11))
+    counters = cpu.counters
+
+    assert counters.instructions == 11
+    assert counters.cycles == cycles
+    assert counters.branches_taken == 2
+    assert counters.branches_not_taken == 1
+    assert counters.page_cross_penalties == 1
+    assert counters.reads == 23
+    assert counters.writes == 4
+    assert counters.interrupts == 1
+    assert counters.opcode_counts()[0xca] == 3
+    assert counters.extra_cycle_counts() == {0: 8, 1: 3}
+
+def test_branch_across_page_is_one_penalty():
+
+    # BNE at $06fd back to $06f0 stays on the page, BNE at $0700 to $06f0 crosses it
+    memory_controller = MemoryController(65536)
+    cpu = Cpu6502(memory_controller)
+    memory_controller.load_binary(bytes([0xd0, 0xee]), 0x700, cpu)
+    cpu.counters = PerformanceCounters(detailed = True)
+
+    assert cpu.step() == 4
+    assert cpu.counters.branches_taken == 1
+    assert cpu.counters.page_cross_penalties == 1
+
+def test_run_until_signalled_counts_instructions():
+
+    cpu = make_cpu(busy_loop_instructions, counters = PerformanceCounters())
+    calls = []
+
+    def signal():
+        calls.append(None)
+        return len(calls) > 10
+
+    cpu.run_until_signalled(signal)
+    assert cpu.counters.instructions == 10
+    assert cpu.counters.cycles == 30
+
+def test_run_async_counts_every_slice():
+
+    cpu = make_cpu(busy_loop_instructions, counters = PerformanceCounters(detailed = True))
+    calls = []
+
+    def signal():
+        calls.append(None)
+        return len(calls) > 100
+
+    asyncio.run(cpu.run_async(signal, slice_cycles = 30))
+    assert cpu.counters.instructions == 100
+    assert cpu.counters.cycles == 300
+    assert cpu.counters.opcode_counts()[0x4c] == 100
+
+def test_skip_idle_and_reset():
+
+    counters = PerformanceCounters(detailed = True)
+    counters.add_block(5, 10)
+    counters.skip_idle(1000)
+    assert counters.idle_skipped_cycles == 1000
+
+    counters.reset()
+    assert counters.as_dict() == {
+        'instructions': 0, 'cycles': 0, 'branches_taken': 0, 'branches_not_taken': 0,
+        'page_cross_penalties': 0, 'reads': 0, 'writes': 0, 'interrupts': 0, 'idle_skipped_cycles': 0,
+    }
+
+def test_reset_keeps_counting():
+
+    cpu = make_cpu(busy_loop_instructions, counters = PerformanceCounters(detailed = True))
+    histogram = cpu.counters.histogram
+    cpu.run(30)
+
+    cpu.counters.reset()
+    assert cpu.counters.histogram is histogram
+    assert cpu.counters.opcode_counts()[0x4c] == 0
+
+    cpu.step()
+    cpu.run(30)
+    assert cpu.counters.opcode_counts()[0x4c] == 11
+
+def test_execute_is_built_when_the_counters_are_set():
+
+    cpu = make_cpu(busy_loop_instructions, counters = PerformanceCounters())
+    execute = cpu._execute
+    cpu.step()
+    cpu.run(30)
+    assert cpu._execute is execute
+
+    cpu.counters = PerformanceCounters(detailed = True)
+    assert cpu._execute is not execute
+    cpu.step()
+    assert cpu.counters.opcode_counts()[0x4c] == 1
+
+def test_counters_survive_pickling():
+
+    cpu = make_cpu(busy_loop_instructions, counters = PerformanceCounters(detailed = True))
+    cpu.run(30)
+
+    restored = pickle.loads(pickle.dumps(cpu))
+    restored.run(30)
+    assert restored.counters.instructions == 20
+    assert restored.counters.opcode_counts()[0x4c] == 20
@@ -1,9 +1,14 @@
+import asyncio
+import pytest
 import time
-from emupy6502.cpu6502 import Cpu6502
+from emupy6502.cpu6502 import Cpu6502, DeadlineResult, RunResult
 
 from unittest.mock import patch, Mock
 from emupy6502.memory_controller import MemoryController
 from emupy6502.registers import Registers
+from emupy6502.opcodes import OpCode
+
+from tests.helpers import busy_loop_instructions
 
 
 class MemoryControllerForTesting(MemoryController):
@@ -40,8 +45,7 @@ mult10_instructions = [ 0x0a, 0x8d, 0x0b, 0x06, 0x0a, 0x0a, 0x18, 0x6d, 0x0b, 0x
 def test_execute_mult10_function_10x10():
 
     test_memory_controller = MemoryControllerForTesting()
-    for byte in range(len(mult10_instructions)):
-        test_memory_controller.buffer[0x600+byte] = mult10_instructions[byte]
+    test_memory_controller.load_binary(bytes(mult10_instructions), 0x600)
 
     cpu = Cpu6502(test_memory_controller)
     cpu.registers.pc = 0x0600
@@ -58,8 +62,7 @@ def test_execute_mult10_function_10x10():
 def test_execute_mult10_function_10xminus10():
 
     test_memory_controller = MemoryControllerForTesting()
-    for byte in range(len(mult10_instructions)):
-        test_memory_controller.buffer[0x600+byte] = mult10_instructions[byte]
+    test_memory_controller.load_binary(bytes(mult10_instructions), 0x600)
 
     cpu = Cpu6502(test_memory_controller)
     cpu.registers.pc = 0x0600
@@ -160,8 +163,7 @@ sqrt_instructions = [
 def test_execute_sqrt_function_1():
 
     test_memory_controller = MemoryControllerForTesting()
-    for byte in range(len(sqrt_instructions)):
-        test_memory_controller.buffer[0x600+byte] = sqrt_instructions[byte]
+    test_memory_controller.load_binary(bytes(sqrt_instructions), 0x600)
 
     test_memory_controller.buffer[0xf0] = 0x11
     test_memory_controller.buffer[0xf1] = 2
@@ -207,8 +209,7 @@ fibonacci_instructions = [ 0xa9, 0x00, 0x85, 0xf0, 0xa9, 0x01, 0x85, 0xf1, 0xa2,
 def test_execute_fibonacci_function_1():
 
     test_memory_controller = MemoryControllerForTesting()
-    for byte in range(len(fibonacci_instructions)):
-        test_memory_controller.buffer[0x600+byte] = fibonacci_instructions[byte]
+    test_memory_controller.load_binary(bytes(fibonacci_instructions), 0x600)
 
     cpu = Cpu6502(test_memory_controller)
     cpu.registers.pc = 0x0600
@@ -266,8 +267,7 @@ divide_instructions = [ 0xA9, 0x00, 0x8D, 0x5C, 0x00, 0x8D, 0x5D, 0x00, 0xA2, 0x
 def test_execute_16bit_divide_function_1():
 
     test_memory_controller = MemoryControllerForTesting()
-    for byte in range(len(divide_instructions)):
-        test_memory_controller.buffer[0x600+byte] = divide_instructions[byte]
+    test_memory_controller.load_binary(bytes(divide_instructions), 0x600)
 
     divisions = [
         (32, 8, 4, 0),
@@ -324,8 +324,7 @@ subtract_16bit_instructions = [ 0x38, 0xA5, 0x20, 0xE5, 0x22, 0x85, 0x24, 0xA5,
 def test_execute_16bit_subtract_function():
 
     test_memory_controller = MemoryControllerForTesting()
-    for byte in range(len(subtract_16bit_instructions)):
-        test_memory_controller.buffer[0x600+byte] = subtract_16bit_instructions[byte]
+    test_memory_controller.load_binary(bytes(subtract_16bit_instructions), 0x600)
 
     subtractions = [
         (5000, 3000, 2000),
@@ -360,4 +359,146 @@ def test_execute_16bit_subtract_function():
         assert result == subtraction[2]
 
     print("Clocks:{0}".format(total_clocks))
-    print("Time:{0}".format(time.perf_counter() - start))
\ No newline at end of file
+    print("Time:{0}".format(time.perf_counter() - start))
+
+#############################################
+
+def test_cpus_share_dispatch_tables():
+
+    first = Cpu6502(MemoryControllerForTesting())
+    second = Cpu6502(MemoryControllerForTesting())
+    assert first.opcodes is second.opcodes
+    assert first.opcodes.addressing_modes is OpCode().addressing_modes
+    assert isinstance(OpCode.handler_table, tuple)
+    assert len(OpCode.handler_table) == len(OpCode.cycle_table) == 256
+
+def test_unimplemented_opcode_raises():
+
+    test_memory_controller = MemoryControllerForTesting()
+    # PHP is not implemented yet
+    test_memory_controller.load_binary(b"\x08", 0x600)
+
+    cpu = Cpu6502(test_memory_controller)
+    cpu.registers.pc = 0x0600
+
+    with pytest.raises(KeyError):
+        cpu.run_until_signalled(test_memory_controller.is_signalled)
+
+#############################################
+
+def test_run_executes_whole_instructions_for_budget():
+
+    test_memory_controller = MemoryControllerForTesting()
+    test_memory_controller.load_binary(busy_loop_instructions, 0x600)
+
+    cpu = Cpu6502(test_memory_controller)
+    cpu.registers.pc = 0x0600
+
+    # JMP absolute is 3 cycles, so a budget of 10 runs 4 of them
+    assert cpu.run(10) == RunResult(12, 4, 2)
+    assert cpu.registers.pc == 0x0600
+
+def test_run_carries_overshoot_into_next_call():
+
+    test_memory_controller = MemoryControllerForTesting()
+    test_memory_controller.load_binary(busy_loop_instructions, 0x600)
+
+    cpu = Cpu6502(test_memory_controller)
+    cpu.registers.pc = 0x0600
+
+    assert cpu.run(10) == RunResult(12, 4, 2)
+    assert cpu.run(10) == RunResult(9, 3, 1)
+    assert cpu.run(10) == RunResult(9, 3, 0)
+
+    # overshoot bigger than the budget: nothing runs, the rest carries
+    cpu.run(5)
+    assert cpu.overshoot == 1
+    assert cpu.run(1) == RunResult(0, 0, 0)
+
+def test_step_runs_one_instruction():
+
+    test_memory_controller = MemoryControllerForTesting()
+    test_memory_controller.load_binary(bytes(mult10_instructions), 0x600)
+
+    cpu = Cpu6502(test_memory_controller)
+    cpu.registers.pc = 0x0600
+    cpu.registers.accumulator = 1
+
+    assert cpu.step() == 2
+    assert cpu.registers.pc == 0x601
+    assert cpu.step() == 4
+    assert cpu.registers.pc == 0x604
+
+def test_run_async_stops_on_signal():
+
+    test_memory_controller = MemoryControllerForTesting()
+    test_memory_controller.load_binary(bytes(mult10_instructions), 0x600)
+
+    cpu = Cpu6502(test_memory_controller)
+    cpu.registers.pc = 0x0600
+    cpu.registers.accumulator = 10
+
+    total_clocks = asyncio.run(cpu.run_async(test_memory_controller.is_signalled, slice_cycles = 4))
+    assert cpu.registers.accumulator == 100
+    assert total_clocks == cpu.total_cycles
+
+def test_run_async_yields_to_other_tasks():
+
+    machines = []
+    for _ in range(2):
+        test_memory_controller = MemoryControllerForTesting()
+        test_memory_controller.load_binary(busy_loop_instructions, 0x600)
+        cpu = Cpu6502(test_memory_controller)
+        cpu.registers.pc = 0x0600
+        machines.append(cpu)
+
+    ticks = []
+
+    async def ticker():
+        for tick in range(5):
+            ticks.append([cpu.total_cycles for cpu in machines])
+            await asyncio.sleep(0)
+
+    async def main():
+        tasks = [asyncio.ensure_future(cpu.run_async(slice_cycles = 30)) for cpu in machines]
+        await ticker()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions = True)
+
+    asyncio.run(main())
+
+    # both machines advance a slice at a time while the ticker keeps running
+    assert ticks[-1][0] > ticks[1][0] > 0
+    assert ticks[-1][1] > ticks[1][1] > 0
+    assert all(cycles % 30 == 0 for tick in ticks for cycles in tick)
+
+def test_run_for_checks_clock_every_interval():
+
+    test_memory_controller = MemoryControllerForTesting()
+    test_memory_controller.load_binary(busy_loop_instructions, 0x600)
+
+    cpu = Cpu6502(test_memory_controller)
+    cpu.registers.pc = 0x0600
+
+    # a fake clock that moves one second per reading
+    readings = iter(range(100))
+    result = cpu.run_for(2.5, check_interval = 10, clock = lambda: next(readings))
+
+    # started at 0, read at 1, 2 and 3 with ten instructions between reads
+    assert result == DeadlineResult(90, 30, 3)
+    assert next(readings) == 4
+
+def test_run_for_is_resumable():
+
+    test_memory_controller = MemoryControllerForTesting()
+    test_memory_controller.load_binary(busy_loop_instructions, 0x600)
+
+    cpu = Cpu6502(test_memory_controller)
+    cpu.registers.pc = 0x0600
+
+    first = cpu.run_for(0.01, check_interval = 100)
+    second = cpu.run_for(0.01, check_interval = 100)
+    assert first.instructions > 0 and second.instructions > 0
+    assert first.elapsed >= 0.01
+    assert cpu.registers.pc == 0x0600
@@ -0,0 +1,74 @@
+import pytest
+
+from emupy6502.governor import SpeedGovernor
+from emupy6502.quotas import Quotas, StopReason
+
+from tests.helpers import busy_loop_instructions, make_cpu
+
+
+class FakeTime(object):
+
+    # a clock that only moves when slept on, plus a fixed cost per burst
+    # to stand in for the host doing the emulation
+    def __init__(self, cost_per_reading = 0.0):
+
+        self.now = 0.0
+        self.cost_per_reading = cost_per_reading
+
+    def clock(self):
+
+        self.now += self.cost_per_reading
+        return self.now
+
+    def sleep(self, seconds):
+
+        self.now += seconds
+
+def test_fast_host_is_held_to_target_speed():
+
+    fake = FakeTime()
+    governor = SpeedGovernor(make_cpu(busy_loop_instructions), mhz = 1.0, burst_cycles = 3000, clock = fake.clock, sleep = fake.sleep)
+
+    report = governor.run(seconds = 0.1)
+    assert report.achieved_mhz == pytest.approx(1.0, rel = 0.01)
+    assert report.headroom == pytest.approx(1.0)
+    assert abs(report.drift) < 0.001
+    assert governor.resyncs == 0
+
+def test_cycle_limit_stops_run():
+
+    fake = FakeTime()
+    governor = SpeedGovernor(make_cpu(busy_loop_instructions), mhz = 2.0, burst_cycles = 300, clock = fake.clock, sleep = fake.sleep)
+
+    report = governor.run(cycles = 3000)
+    assert 3000 <= report.cycles < 3003
+    assert report.elapsed == pytest.approx(0.0015, rel = 0.01)
+
+def test_slow_host_reports_no_headroom_and_resyncs():
+
+    # every burst of 1000 cycles (1ms at 1MHz) costs 2ms of host time
+    fake = FakeTime(cost_per_reading = 0.002)
+    governor = SpeedGovernor(make_cpu(busy_loop_instructions), mhz = 1.0, burst_cycles = 999, max_lag = 0.01,
+                             clock = fake.clock, sleep = fake.sleep)
+
+    report = governor.run(seconds = 0.2)
+    assert report.headroom == 0.0
+    assert report.achieved_mhz < 0.6
+    assert governor.resyncs > 0
+
+def test_needs_a_limit():
+
+    with pytest.raises(ValueError):
+        SpeedGovernor(make_cpu(busy_loop_instructions)).run()
+
+def test_stops_when_the_quotas_stop_the_cpu():
+
+    fake = FakeTime()
+    cpu = make_cpu(busy_loop_instructions)
+    cpu.quotas = Quotas(cycles = 900)
+    governor = SpeedGovernor(cpu, mhz = 1.0, burst_cycles = 300, clock = fake.clock, sleep = fake.sleep)
+
+    report = governor.run(seconds = 10.0)
+    assert cpu.stop_reason == StopReason('cycles', 900, 900)
+    assert report.cycles == 900
+    assert report.elapsed < 0.01
@@ -17,23 +17,27 @@ def test_execute_nop():
         mock_memory_controller.assert_not_called()
         assert registers == Registers()
 
-def test_execute_brk():
+def test_execute_brk_pushes_return_address_and_status():
 
     opcode = OpCode()
     registers = Registers()
-    registers.sp = 0x200
+    registers.pc = 0x0600
+    registers.carry_flag = True
+    registers.interrupt_disable_flag = False
 
     mock_memory_controller = Mock()
     mock_memory_controller.read.side_effect = [0x00, 0x21]
 
-    registers.pc += 1 #need to fake the cpu reading the opcode        
+    registers.pc += 1 #need to fake the cpu reading the opcode
     count = opcode.execute(0x0, registers, mock_memory_controller)
     assert count == 7
-    assert mock_memory_controller.read.call_count == 2
-    assert mock_memory_controller.write.call_count == 3
-    assert mock_memory_controller.write.call_args_list[0], unittest.mock.call(0x200 == 1)
-    assert mock_memory_controller.write.call_args_list[1], unittest.mock.call(0x1ff == 0)
-    assert mock_memory_controller.write.call_args_list[2], unittest.mock.call(0x1fe == registers.status_register())
+
+    # BRK's padding byte is skipped, B and bit 5 are set on the pushed status
+    assert mock_memory_controller.write.call_args_list == [
+        unittest.mock.call(0x1fd, 0x06), unittest.mock.call(0x1fc, 0x02), unittest.mock.call(0x1fb, 0x31)]
+    assert mock_memory_controller.read.call_args_list == [unittest.mock.call(0xfffe), unittest.mock.call(0xffff)]
+    assert registers.sp == 0xfa
+    assert registers.interrupt_disable_flag
     assert registers.pc == 0x2100
 
 def test_execute_tax():
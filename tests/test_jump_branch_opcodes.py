@@ -343,3 +343,81 @@ def test_execute_beq_branch_taken():
         # Tested more thoroughly in addressing_modes_tests
         assert mock_memory_controller.read.call_count == 1
         assert registers.pc == 0xc000
+
+def test_execute_jsr():
+
+    opcode = OpCode()
+    registers = Registers()
+    registers.pc = 0x0600
+
+    with patch.object(MemoryController, 'read') as mock_memory_controller:
+
+        mock_memory_controller.read.side_effect = [0x00, 0xc0]
+        registers.pc += 1 #need to fake the cpu reading the opcode
+        count = opcode.execute(0x20, registers, mock_memory_controller)
+        assert count == 6
+
+        # the address of the JSR's last byte, high byte first
+        assert mock_memory_controller.write.call_args_list == [
+            unittest.mock.call(0x1fd, 0x06), unittest.mock.call(0x1fc, 0x02)]
+        assert registers.sp == 0xfb
+        assert registers.pc == 0xc000
+
+def test_execute_rts():
+
+    opcode = OpCode()
+    registers = Registers()
+    registers.sp = 0xfb
+    registers.pc = 0xc000
+
+    with patch.object(MemoryController, 'read') as mock_memory_controller:
+
+        mock_memory_controller.read.side_effect = [0x02, 0x06]
+        registers.pc += 1 #need to fake the cpu reading the opcode
+        count = opcode.execute(0x60, registers, mock_memory_controller)
+        assert count == 6
+
+        assert mock_memory_controller.read.call_args_list == [
+            unittest.mock.call(0x1fc), unittest.mock.call(0x1fd)]
+        assert registers.sp == 0xfd
+        assert registers.pc == 0x0603
+
+def test_execute_jsr_wraps_stack():
+
+    opcode = OpCode()
+    registers = Registers()
+    registers.sp = 0x00
+    registers.pc = 0x0601
+
+    with patch.object(MemoryController, 'read') as mock_memory_controller:
+
+        mock_memory_controller.read.side_effect = [0x00, 0xc0]
+        opcode.execute(0x20, registers, mock_memory_controller)
+
+        assert mock_memory_controller.write.call_args_list == [
+            unittest.mock.call(0x100, 0x06), unittest.mock.call(0x1ff, 0x02)]
+        assert registers.sp == 0xfe
+
+def test_execute_rti():
+
+    opcode = OpCode()
+    registers = Registers()
+    registers.sp = 0xfa
+    registers.pc = 0x2100
+
+    with patch.object(MemoryController, 'read') as mock_memory_controller:
+
+        mock_memory_controller.read.side_effect = [0x83, 0x02, 0x06]
+        registers.pc += 1 #need to fake the cpu reading the opcode
+        count = opcode.execute(0x40, registers, mock_memory_controller)
+        assert count == 6
+
+        assert mock_memory_controller.read.call_args_list == [
+            unittest.mock.call(0x1fb), unittest.mock.call(0x1fc), unittest.mock.call(0x1fd)]
+        assert registers.sp == 0xfd
+        # unlike RTS the address pulled is the one to return to
+        assert registers.pc == 0x0602
+        assert registers.negative_flag
+        assert registers.carry_flag
+        assert registers.zero_flag
+        assert not registers.interrupt_disable_flag
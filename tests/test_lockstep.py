@@ -0,0 +1,140 @@
+import pytest
+
+numpy = pytest.importorskip("numpy")
+
+from emupy6502.cpu6502 import Cpu6502
+from emupy6502.lockstep import LockstepEngine
+from emupy6502.memory_controller import MemoryController
+
+# ASL, STA $060B, ASL, ASL, CLC, ADC $060B, BRK
+mult10_instructions = bytes([0x0a, 0x8d, 0x0b, 0x06, 0x0a, 0x0a, 0x18, 0x6d, 0x0b, 0x06, 0x0])
+
+# integer square root of $F0/$F1, root in $F6, remainder in $F2/$F3
+sqrt_instructions = bytes([
+    0xa9, 0x00, 0x85, 0xf2, 0x85, 0xf3, 0x85, 0xf6, 0xa2, 0x08, 0x06, 0xf6, 0x06, 0xf0, 0x26, 0xf1,
+    0x26, 0xf2, 0x26, 0xf3, 0x06, 0xf0, 0x26, 0xf1, 0x26, 0xf2, 0x26, 0xf3, 0xa5, 0xf6, 0x85, 0xf4,
+    0xa9, 0x00, 0x85, 0xf5, 0x38, 0x26, 0xf4, 0x26, 0xf5, 0xa5, 0xf3, 0xc5, 0xf5, 0x90, 0x16, 0xd0,
+    0x06, 0xa5, 0xf2, 0xc5, 0xf4, 0x90, 0x0e, 0xa5, 0xf2, 0xe5, 0xf4, 0x85, 0xf2, 0xa5, 0xf3, 0xe5,
+    0xf5, 0x85, 0xf3, 0xe6, 0xf6, 0xca, 0xd0, 0xc2, 0x00])
+
+
+def run_scalar(program, setup):
+
+    memory_controller = MemoryController(65536)
+    memory_controller.load_binary(program, 0x600)
+    cpu = Cpu6502(memory_controller)
+    cpu.registers.pc = 0x600
+    setup(cpu)
+    cycles = cpu.run_until_signalled(lambda: memory_controller.read(cpu.registers.pc) == 0)
+    return cpu, cycles
+
+def normalised(registers):
+
+    # the scalar CPU leaves some flags as ints (negative_flag = value & 0x80)
+    return dict((name, bool(value) if name.endswith('_flag') else value)
+                for name, value in registers.as_dict().items())
+
+def test_mult10_matches_scalar_for_every_input():
+
+    engine = LockstepEngine(256)
+    engine.load(mult10_instructions, 0x600)
+    engine.pc[:] = 0x600
+    engine.accumulator[:] = numpy.arange(256)
+    engine.run()
+
+    assert engine.halted.all()
+    for value in (0, 1, 10, 0x7f, 0xf6, 0xff):
+        def setup(cpu):
+            cpu.registers.accumulator = value
+        cpu, cycles = run_scalar(mult10_instructions, setup)
+        assert normalised(engine.lane_registers(value)) == normalised(cpu.registers)
+        assert engine.cycles[value] == cycles
+        assert engine.memory[value, 0x60b] == cpu.memory_controller.read(0x60b)
+
+def test_sqrt_diverging_lanes_match_scalar():
+
+    numbers = [0, 1, 2, 25, 529, 1000, 0x7fff, 0xffff]
+    engine = LockstepEngine(len(numbers), memory_size = 0x800)
+    engine.load(sqrt_instructions, 0x600)
+    engine.pc[:] = 0x600
+    engine.memory[:, 0xf0] = [number & 0xff for number in numbers]
+    engine.memory[:, 0xf1] = [number >> 8 for number in numbers]
+    engine.run()
+
+    for lane, number in enumerate(numbers):
+        def setup(cpu):
+            cpu.memory_controller.write(0xf0, number & 0xff)
+            cpu.memory_controller.write(0xf1, number >> 8)
+        cpu, cycles = run_scalar(sqrt_instructions, setup)
+
+        assert engine.memory[lane, 0xf6] == int(number ** 0.5)
+        assert bytes(engine.memory[lane, 0xf0:0xf8]) == cpu.memory_controller.buffer[0xf0:0xf8]
+        assert normalised(engine.lane_registers(lane)) == normalised(cpu.registers)
+        assert engine.cycles[lane] == cycles
+
+def test_stop_addresses_halt_lanes():
+
+    engine = LockstepEngine(4, memory_size = 0x800, stop_addresses = [0x604])
+    engine.load(mult10_instructions, 0x600)
+    engine.pc[:] = 0x600
+    engine.accumulator[:] = [1, 2, 3, 4]
+    assert engine.run() == 2
+    assert (engine.pc == 0x604).all()
+    assert list(engine.accumulator) == [2, 4, 6, 8]
+
+def test_subroutine_calls_match_scalar():
+
+    # JSR $0610, JSR $0610, BRK with INX, RTS at $0610
+    program = bytes([0x20, 0x10, 0x06, 0x20, 0x10, 0x06, 0x00] + [0xea] * 9 + [0xe8, 0x60])
+    cpu, cycles = run_scalar(program, lambda cpu: None)
+
+    engine = LockstepEngine(3)
+    engine.load(program, 0x600)
+    engine.pc[:] = 0x600
+    engine.run()
+
+    assert cpu.registers.x_index == 2
+    assert normalised(engine.lane_registers(2)) == normalised(cpu.registers)
+    assert (engine.cycles == cycles).all()
+    assert (engine.memory[:, 0x1fc:0x1fe] == [0x05, 0x06]).all()
+
+def test_rti_matches_scalar():
+
+    # LDX #$F0, TXS, LDA #$20, STA $01F2, LDA #$06, STA $01F3, RTI to the
+    # BRK at $0620, pulling a different status in each lane
+    program = bytes([0xa2, 0xf0, 0x9a, 0xa9, 0x20, 0x8d, 0xf2, 0x01, 0xa9, 0x06, 0x8d, 0xf3, 0x01, 0x40])
+    statuses = (0x00, 0xff, 0xc3, 0x3c)
+
+    engine = LockstepEngine(len(statuses))
+    engine.load(program, 0x600)
+    engine.pc[:] = 0x600
+    engine.memory[:, 0x1f1] = statuses
+    engine.run()
+
+    for lane, status in enumerate(statuses):
+        def setup(cpu):
+            cpu.memory_controller.write(0x1f1, status)
+        cpu, cycles = run_scalar(program, setup)
+
+        assert cpu.registers.pc == 0x620
+        assert cpu.registers.status_register() & 0xcf == status & 0xcf
+        assert normalised(engine.lane_registers(lane)) == normalised(cpu.registers)
+        assert engine.cycles[lane] == cycles
+
+def test_max_steps_limits_run():
+
+    engine = LockstepEngine(2, memory_size = 0x800)
+    engine.load(b"\x4c\x00\x06", 0x600)
+    engine.pc[:] = 0x600
+    assert engine.run(max_steps = 10) == 10
+    assert (engine.instructions == 10).all()
+    assert not engine.halted.any()
+
+def test_unimplemented_opcode_raises():
+
+    engine = LockstepEngine(2, memory_size = 0x800)
+    engine.load(b"\x08", 0x600)
+    engine.pc[:] = 0x600
+
+    with pytest.raises(KeyError):
+        engine.step()
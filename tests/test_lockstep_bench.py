@@ -0,0 +1,22 @@
+import pytest
+
+numpy = pytest.importorskip("numpy")
+
+from emupy6502.bench.lockstep import format_timing, lockstep_engine, run_lockstep, run_scalar, scalar_cpus, \
+    time_sqrt
+
+
+def test_scalar_and_lockstep_roots_agree():
+
+    numbers = [0, 1, 2, 529, 1000, 0xffff]
+    assert run_scalar(scalar_cpus(numbers)) == run_lockstep(lockstep_engine(numbers)) == [0, 1, 1, 23, 31, 255]
+
+def test_time_sqrt():
+
+    ticks = iter(range(100))
+    timing = time_sqrt(inputs = 4, repeats = 1, clock = lambda: next(ticks))
+
+    assert timing.inputs == 4
+    assert timing.scalar_seconds == timing.lockstep_seconds == 1
+    assert timing.speedup == 1.0
+    assert format_timing(timing).startswith("4 inputs:")
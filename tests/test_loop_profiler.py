@@ -0,0 +1,102 @@
+from emupy6502.counters import AccessCountingMemoryController
+from emupy6502.cpu6502 import Cpu6502
+from emupy6502.loop_profiler import LoopProfile, LoopProfiler
+from emupy6502.quotas import Quotas, StopReason
+
+from tests.helpers import load_cpu, nested_segments
+
+# one pass of nested_segments
+pass_cycles = 6 + 3 + 6 + 6 + 2 + 256 * 2 + 255 * 3 + 2 + 6
+
+
+def test_nested_loops():
+
+    profiler = LoopProfiler(load_cpu(nested_segments))
+    assert profiler.run(pass_cycles * 3) == pass_cycles * 3
+
+    # the first DEX and BNE of each of the three entries isn't timed
+    inner = LoopProfile(0x622, 0x623, 256 * 3, (254 * 5 + 4) * 3, (254 * 5 + 4) / 255, 0)
+    # the main loop is still running, its first pass isn't timed
+    main = LoopProfile(0x600, 0x603, 3, pass_cycles * 2, pass_cycles, 0)
+    assert profiler.hot_loops() == [inner, main]
+    assert [loop.head for loop in profiler.running] == [0x600]
+
+def test_branch_page_crossings():
+
+    #  06fc LDX #$03
+    #  06fe DEX
+    #  06ff BNE $06fe    taken across the page
+    #  0701 JMP $0701
+    cpu = load_cpu(((0x6fc, bytes([0xa2, 0x03, 0xca, 0xd0, 0xfd, 0x4c, 0x01, 0x07])),))
+    cpu.registers.pc = 0x6fc
+    profiler = LoopProfiler(cpu)
+    profiler.run(signal = lambda: cpu.registers.pc == 0x701)
+
+    assert profiler.hot_loops() == [LoopProfile(0x6fe, 0x6ff, 3, (2 + 4) + (2 + 2), 5.0, 2)]
+    assert profiler.running == []
+
+def test_body_page_crossings():
+
+    #  0600 LDY #$00
+    #  0602 LDA $00ff,Y  crosses for Y > 0
+    #  0605 INY
+    #  0606 CPY #$03
+    #  0608 BNE $0602
+    cpu = load_cpu(((0x600, bytes([0xa0, 0x00, 0xb9, 0xff, 0x00, 0xc8, 0xc0, 0x03, 0xd0, 0xf8])),))
+    profiler = LoopProfiler(cpu)
+    profiler.run(signal = lambda: cpu.registers.pc == 0x60a)
+
+    loop, = profiler.hot_loops()
+    assert (loop.head, loop.tail, loop.iterations, loop.page_cross_penalties) == (0x602, 0x608, 3, 2)
+
+def test_indirect_jump_back_edge():
+
+    #  0600 INX
+    #  0601 JMP ($0010)  back to $0600
+    cpu = load_cpu(((0x600, bytes([0xe8, 0x6c, 0x10, 0x00])), (0x10, bytes([0x00, 0x06]))))
+    profiler = LoopProfiler(cpu)
+    assert profiler.run(70) == 70
+
+    assert profiler.hot_loops() == [LoopProfile(0x600, 0x601, 10, 9 * 7, 7.0, 0)]
+
+def test_profiling_adds_no_reads():
+
+    def counting_cpu():
+        memory_controller = AccessCountingMemoryController()
+        cpu = Cpu6502(memory_controller)
+        for address, data in nested_segments:
+            memory_controller.load_binary(data, address)
+        cpu.registers.pc = 0x600
+        return cpu
+
+    profiled = counting_cpu()
+    LoopProfiler(profiled).run(pass_cycles)
+    plain = counting_cpu()
+    plain.run_until_signalled(lambda: plain.total_cycles >= pass_cycles)
+
+    assert profiled.memory_controller.reads == plain.memory_controller.reads
+
+def test_report_names_loops():
+
+    names = {0x600: 'main', 0x603: 'main+3', 0x622: 'delay', 0x623: 'delay+1'}
+    profiler = LoopProfiler(load_cpu(nested_segments), name = names.get)
+    profiler.run(pass_cycles * 2)
+
+    report = profiler.report().splitlines()
+    assert len(report) == 3
+    assert report[1].split()[:3] == ['delay', 'delay+1', '512']
+    assert report[2].split()[:3] == ['main', 'main+3', '2']
+
+def test_stops_without_recording_when_the_quotas_stop_the_cpu():
+
+    # INX, JMP $0600: stopped on the JMP, which mustn't count as another
+    # back edge however often it is stepped
+    cpu = load_cpu(((0x600, bytes([0xe8, 0x4c, 0x00, 0x06])),))
+    cpu.quotas = Quotas(instructions = 3)
+    profiler = LoopProfiler(cpu)
+
+    assert profiler.run(1000) == 2 + 3 + 2
+    assert cpu.stop_reason == StopReason('instructions', 3, 3)
+    assert profiler.step() == 0
+    assert profiler.cycles == 7
+    assert [(loop.head, loop.tail, loop.back_edges) for loop in profiler.loops.values()] == [(0x600, 0x601, 1)]
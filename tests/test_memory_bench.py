@@ -0,0 +1,44 @@
+from emupy6502.bench.memory import SubclassedMemoryController, backends, format_table, patterns, \
+    time_accesses, time_backends
+
+
+def test_patterns_leave_room_for_word_reads():
+
+    for name, addresses in patterns(count = 1000):
+        assert len(addresses) == 1000
+        assert all(0 <= address < 0xffff for address in addresses)
+
+    assert dict(patterns(count = 300))['zero page'][-1] < 0x100
+
+def test_patterns_are_reproducible():
+
+    assert patterns(count = 100) == patterns(count = 100)
+
+def test_subclassed_controller_chains_up():
+
+    memory_controller = SubclassedMemoryController(65536)
+    memory_controller.write(0x1234, 0x56)
+    assert memory_controller.read(0x1234) == 0x56
+
+def test_time_accesses():
+
+    memory_controller = SubclassedMemoryController(65536)
+    read_ns, write_ns, word_read_ns = time_accesses(memory_controller, [0x200, 0x201], repeats = 1)
+
+    assert min(read_ns, write_ns, word_read_ns) >= 0
+    assert memory_controller.read(0x201) == 0x55
+
+def test_every_backend_and_pattern_is_timed():
+
+    timings = time_backends(count = 16, repeats = 1)
+    names = set(timing.backend for timing in timings)
+
+    # shared memory may not be available on the host
+    assert names >= set(name for name, _ in backends()) - {'shared'}
+    assert len(timings) == 3 * len(names)
+    assert 'zero page' in format_table(timings)
+
+def test_selected_backends():
+
+    timings = time_backends(['plain'], count = 16, repeats = 1)
+    assert [timing.pattern for timing in timings] == ['sequential', 'zero page', 'random']
@@ -1,5 +1,7 @@
 import pytest
+from emupy6502 import memory_controller
 from emupy6502.memory_controller import MemoryController
+from emupy6502.cpu6502 import Cpu6502
 
 
 def test_read_with_no_buffer_raises():
@@ -22,3 +24,204 @@ def test_read_from_invalid_address_raises():
 
     with pytest.raises(IndexError):
         controller.read(11)
+
+def test_load_binary_places_data():
+
+    controller = MemoryController(65536)
+    assert controller.load_binary(b"\x01\x02\x03", 0x600) == 0x600
+    assert controller.buffer[0x5ff:0x604] == b"\x00\x01\x02\x03\x00"
+    assert len(controller.buffer) == 65536
+
+def test_load_binary_past_end_raises():
+
+    controller = MemoryController(16)
+
+    with pytest.raises(IndexError):
+        controller.load_binary(b"\x01\x02\x03", 14)
+
+    assert len(controller.buffer) == 16
+
+def test_load_binary_sets_reset_vector_and_pc():
+
+    controller = MemoryController(65536)
+    cpu = Cpu6502(controller)
+
+    controller.load_binary(b"\xea", 0x1234, cpu = cpu)
+    assert controller.read(0xfffc) == 0x34
+    assert controller.read(0xfffd) == 0x12
+    assert cpu.registers.pc == 0x1234
+
+def test_load_prg_uses_header_address():
+
+    controller = MemoryController(65536)
+    assert controller.load_prg(b"\x01\x08\xa9\x05") == 0x801
+    assert controller.buffer[0x801:0x803] == b"\xa9\x05"
+
+def test_load_prg_without_header_raises():
+
+    controller = MemoryController(65536)
+
+    with pytest.raises(ValueError):
+        controller.load_prg(b"\x01")
+
+def hex_record(record_type, address, payload):
+
+    record = bytes([len(payload), address >> 8, address & 0xff, record_type]) + bytes(payload)
+    return ":" + (record + bytes([-sum(record) & 0xff])).hex().upper()
+
+def test_load_intel_hex():
+
+    controller = MemoryController(65536)
+    text = "\n".join([
+        hex_record(0, 0x600, [1, 2, 3]),
+        hex_record(0, 0x603, [4, 5]),
+        hex_record(0, 0x700, [0xaa, 0xbb]),
+        hex_record(1, 0, [])])
+
+    assert controller.load_intel_hex(text) == 0x600
+    assert controller.buffer[0x600:0x605] == b"\x01\x02\x03\x04\x05"
+    assert controller.buffer[0x700:0x702] == b"\xaa\xbb"
+
+def test_load_intel_hex_start_address_record():
+
+    controller = MemoryController(65536)
+    cpu = Cpu6502(controller)
+    text = "\n".join([
+        hex_record(0, 0x600, [0x60]),
+        hex_record(5, 0, [0, 0, 0x0c, 0]),
+        hex_record(1, 0, [])])
+
+    assert controller.load_intel_hex(text, cpu = cpu) == 0x0c00
+    assert cpu.registers.pc == 0x0c00
+    assert controller.read(0x600) == 0x60
+
+def test_load_intel_hex_bad_checksum_raises():
+
+    controller = MemoryController(65536)
+
+    with pytest.raises(ValueError):
+        controller.load_intel_hex(hex_record(0, 0x600, [0x60])[:-2] + "00")
+
+def test_load_intel_hex_short_address_record_raises():
+
+    controller = MemoryController(65536)
+
+    for record_type in (0x02, 0x04, 0x05):
+        with pytest.raises(ValueError, match = "line 1"):
+            controller.load_intel_hex(hex_record(record_type, 0, [0x12]))
+
+def make_ines(prg_banks, reset = 0xc000, trainer = False, mapper = 0):
+
+    flags6 = (0x04 if trainer else 0) | ((mapper & 0x0f) << 4)
+    header = bytearray(b"NES\x1a") + bytes([prg_banks, 1, flags6, mapper & 0xf0]) + bytes(8)
+    prg = bytearray(prg_banks * 0x4000)
+    prg[0] = 0xa9
+    prg[-4] = reset & 0xff
+    prg[-3] = reset >> 8
+    return bytes(header) + (bytes(range(256)) * 2 if trainer else b"") + bytes(prg) + bytes(0x2000)
+
+def test_load_ines_mirrors_single_bank():
+
+    controller = MemoryController(65536)
+    cpu = Cpu6502(controller)
+
+    assert controller.load_ines(make_ines(1, 0xc123), cpu = cpu) == 0xc123
+    assert controller.read(0x8000) == 0xa9
+    assert controller.read(0xc000) == 0xa9
+    assert cpu.registers.pc == 0xc123
+
+def test_load_ines_trainer():
+
+    controller = MemoryController(65536)
+    controller.load_ines(make_ines(2, trainer = True))
+    assert controller.buffer[0x7000:0x7200] == bytes(range(256)) * 2
+    assert controller.read(0x8000) == 0xa9
+    assert controller.read(0xc000) == 0
+
+def test_load_ines_rejects_mappers():
+
+    controller = MemoryController(65536)
+
+    with pytest.raises(ValueError):
+        controller.load_ines(make_ines(4))
+
+    with pytest.raises(ValueError):
+        controller.load_ines(b"NOPE" + bytes(20))
+
+    # a small MMC1 or UxROM image still needs its mapper
+    with pytest.raises(ValueError):
+        controller.load_ines(make_ines(2, mapper = 1))
+
+    with pytest.raises(ValueError):
+        controller.load_ines(make_ines(1, mapper = 0x42))
+
+def test_view_is_zero_copy():
+
+    controller = MemoryController(65536)
+    view = controller.view(0x600, 0x700)
+    view[0] = 0x42
+    assert controller.read(0x600) == 0x42
+    assert len(view) == 0x100
+
+def test_numpy_view_is_zero_copy():
+
+    numpy = pytest.importorskip("numpy")
+    controller = MemoryController(65536)
+    view = controller.numpy_view()
+    view[0x10:0x20] = 7
+    assert controller.read(0x1f) == 7
+    assert view.dtype == numpy.uint8
+
+def test_numpy_view_without_numpy_raises(monkeypatch):
+
+    monkeypatch.setattr(memory_controller, 'numpy', None)
+    controller = MemoryController(16)
+
+    with pytest.raises(ImportError):
+        controller.numpy_view()
+
+def test_fill_and_compare():
+
+    controller = MemoryController(65536)
+    controller.fill(0x200, 0x300, 0xea)
+    assert controller.compare(0x200, b"\xea" * 0x100)
+    assert not controller.compare(0x1ff, b"\xea" * 2)
+    assert controller.read(0x300) == 0
+
+def test_copy_handles_overlap():
+
+    controller = MemoryController(16)
+    controller.load_binary(b"\x01\x02\x03\x04")
+    controller.copy(0, 2, 4)
+    assert controller.snapshot()[0:6] == b"\x01\x02\x01\x02\x03\x04"
+
+def test_find_pattern():
+
+    controller = MemoryController(65536)
+    controller.load_binary(b"\x20\x00\x06", 0x1234)
+    assert controller.find(b"\x20\x00\x06") == 0x1234
+    assert controller.find(b"\x20\x00\x06", 0x1235) == -1
+
+def test_diff_against_snapshot_and_controller():
+
+    controller = MemoryController(65536)
+    before = controller.snapshot()
+    controller.write(0x10, 1)
+    controller.write(0xfff0, 2)
+    assert controller.diff(before) == [0x10, 0xfff0]
+    assert MemoryController(65536).diff(controller) == [0x10, 0xfff0]
+
+def test_diff_without_numpy(monkeypatch):
+
+    monkeypatch.setattr(memory_controller, 'numpy', None)
+    controller = MemoryController(65536)
+    before = controller.snapshot()
+    controller.write(0x10, 1)
+    controller.write(0x11, 1)
+    controller.write(0xffff, 2)
+    assert controller.diff(before) == [0x10, 0x11, 0xffff]
+
+def test_diff_different_sizes_raises():
+
+    with pytest.raises(ValueError):
+        MemoryController(16).diff(bytes(8))
@@ -0,0 +1,96 @@
+import os
+import pytest
+
+from emupy6502.cpu6502 import Cpu6502
+from emupy6502.mmap_memory_controller import MmapMemoryController
+
+
+def test_anonymous_read_write():
+
+    with MmapMemoryController() as controller:
+        controller.write(0x1234, 0x56)
+        assert controller.read(0x1234) == 0x56
+        assert len(controller.buffer) == 65536
+
+def test_read_from_invalid_address_raises():
+
+    with MmapMemoryController(10) as controller:
+
+        with pytest.raises(IndexError):
+            controller.read(11)
+
+def test_file_backed_memory_persists(tmp_path):
+
+    filename = str(tmp_path / "memory.bin")
+
+    with MmapMemoryController(filename = filename) as controller:
+        controller.write(0x600, 0xa9)
+
+    assert os.path.getsize(filename) == 65536
+    with open(filename, 'rb') as memory_file:
+        assert memory_file.read()[0x600] == 0xa9
+
+def test_failed_mapping_closes_the_file(tmp_path, monkeypatch):
+
+    opened = []
+    real_open = open
+
+    def tracking_open(*args, **kwargs):
+        opened.append(real_open(*args, **kwargs))
+        return opened[-1]
+
+    monkeypatch.setattr('builtins.open', tracking_open)
+
+    # an empty file can't be mapped
+    with pytest.raises(ValueError):
+        MmapMemoryController(0, filename = str(tmp_path / "memory.bin"))
+
+    assert len(opened) == 1
+    assert opened[0].closed
+
+def test_existing_file_is_used_without_loading(tmp_path):
+
+    filename = str(tmp_path / "memory.bin")
+    image = bytearray(65536)
+    image[0x600:0x603] = b"\xa9\x05\x00"
+    with open(filename, 'wb') as memory_file:
+        memory_file.write(image)
+
+    with MmapMemoryController(filename = filename) as controller:
+        assert controller.read(0x601) == 0x05
+
+def test_checkpoint_writes_whole_address_space(tmp_path):
+
+    filename = str(tmp_path / "checkpoint.bin")
+
+    with MmapMemoryController() as controller:
+        controller.load_binary(b"\x01\x02", 0xfffe)
+        controller.checkpoint(filename)
+
+    with open(filename, 'rb') as checkpoint_file:
+        data = checkpoint_file.read()
+
+    assert len(data) == 65536
+    assert data[0xfffe:] == b"\x01\x02"
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason = "needs fork")
+def test_anonymous_memory_is_shared_with_forked_child():
+
+    with MmapMemoryController() as controller:
+        pid = os.fork()
+        if pid == 0:
+            controller.write(0x10, 0x42)
+            os._exit(0)
+
+        os.waitpid(pid, 0)
+        assert controller.read(0x10) == 0x42
+
+def test_cpu_runs_from_mmap_memory():
+
+    with MmapMemoryController() as controller:
+        # LDA #$05, ADC #$03, then BRK lands on the 0xfffe vector read
+        controller.load_binary(b"\xa9\x05\x69\x03\x00", 0x600)
+        cpu = Cpu6502(controller)
+        cpu.registers.pc = 0x600
+        cpu.run_until_signalled(lambda: cpu.registers.pc == 0)
+        assert cpu.registers.accumulator == 8
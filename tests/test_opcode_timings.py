@@ -0,0 +1,41 @@
+import pytest
+
+from emupy6502.bench.opcode_timings import by_mode, format_table, implemented, time_opcodes
+
+
+def test_unimplemented_opcodes_are_marked():
+
+    assert implemented(0xa9)
+    assert not implemented(0x08)
+
+    timings = time_opcodes([0xa9, 0x08], iterations = 10, repeats = 1, lockstep = False)
+    assert timings[0].mnemonic == 'lda'
+    assert timings[0].scalar_ns is not None
+    assert timings[1].mnemonic == 'php'
+    assert timings[1].scalar_ns is None
+
+def test_timings_carry_mode_and_cycles():
+
+    timings = time_opcodes([0xad, 0x8d, 0x4c], iterations = 10, repeats = 1, lockstep = False)
+    assert [(timing.mode, timing.cycles) for timing in timings] == [('abso', 4), ('absoW', 4), ('absoW', 3)]
+    assert all(timing.lockstep_ns is None for timing in timings)
+
+def test_every_opcode_can_be_timed():
+
+    timings = time_opcodes(iterations = 2, repeats = 1, lockstep = False)
+    assert len(timings) == 256
+    assert sum(len(group) for group in by_mode(timings).values()) == 256
+
+    table = format_table(timings)
+    assert "0xea nop" in table
+    assert "absoW" in table
+
+def test_lockstep_engine_timings():
+
+    pytest.importorskip("numpy")
+
+    timings = time_opcodes([0x00, 0xa9, 0x08], iterations = 64, lanes = 8, repeats = 1)
+    brk, lda, php = timings
+    assert brk.lockstep_ns is None
+    assert lda.lockstep_ns is not None
+    assert php.lockstep_ns is None
@@ -0,0 +1,145 @@
+import pickle
+import pytest
+
+from emupy6502.cpu6502 import Cpu6502
+from emupy6502.paged_memory_controller import PagedMemoryController, SharedRom
+
+
+def make_rom():
+
+    image = bytearray(0x2000)
+    image[0] = 0xa9
+    image[-4] = 0x00
+    image[-3] = 0xe0
+    return SharedRom(bytes(image), 0xe000)
+
+def test_ram_read_write():
+
+    controller = PagedMemoryController()
+    controller.write(0x1234, 0x56)
+    assert controller.read(0x1234) == 0x56
+    assert controller.read(0x1235) == 0
+    assert controller.peek(0x1234) == 0x56
+
+def test_rom_is_shared_between_controllers():
+
+    rom = make_rom()
+    first = PagedMemoryController([rom])
+    second = PagedMemoryController([rom])
+
+    assert first.read(0xe000) == 0xa9
+    assert first.read_pages[0xe0] is second.read_pages[0xe0]
+    assert first.read_pages[0x00] is not second.read_pages[0x00]
+
+def test_write_to_rom_is_ignored():
+
+    controller = PagedMemoryController([make_rom()])
+    controller.write(0xe000, 0)
+    assert controller.read(0xe000) == 0xa9
+
+def test_rom_must_be_page_aligned():
+
+    with pytest.raises(ValueError):
+        SharedRom(bytes(256), 0x1001)
+
+    with pytest.raises(ValueError):
+        SharedRom(bytes(100), 0x1000)
+
+def test_overlapping_roms_raise():
+
+    with pytest.raises(ValueError):
+        PagedMemoryController([SharedRom(bytes(512), 0x1000), SharedRom(bytes(256), 0x1100)])
+
+def test_load_binary_crosses_pages():
+
+    controller = PagedMemoryController()
+    controller.load_binary(bytes(range(10)), 0x1fc)
+    assert controller.snapshot()[0x1fc:0x206] == bytes(range(10))
+    assert controller.find(bytes(range(10))) == 0x1fc
+
+def test_load_into_rom_raises():
+
+    controller = PagedMemoryController([make_rom()])
+
+    with pytest.raises(ValueError):
+        controller.load_binary(b"\x01\x02", 0xdfff)
+
+    assert controller.read(0xdfff) == 0
+
+def test_snapshot_and_diff():
+
+    controller = PagedMemoryController([make_rom()])
+    before = controller.snapshot()
+    assert len(before) == 65536
+    controller.write(0x10, 1)
+    assert controller.diff(before) == [0x10]
+
+def test_pickled_rom_round_trips():
+
+    rom = pickle.loads(pickle.dumps(make_rom()))
+    assert rom.address == 0xe000
+    assert PagedMemoryController([rom]).read(0xe000) == 0xa9
+
+def test_shared_memory_rom_attaches_by_name():
+
+    image = bytes([0xea]) * 0x1000
+    rom = SharedRom.create_shared(image, 0xf000)
+    try:
+        attached = pickle.loads(pickle.dumps(rom))
+        assert attached.shared_memory.name == rom.shared_memory.name
+        assert PagedMemoryController([attached]).read(0xf123) == 0xea
+        attached.close()
+    finally:
+        rom.close()
+        rom.unlink()
+
+def test_cpu_runs_with_rom_vectors():
+
+    image = bytearray(0x1000)
+    # LDA #$07, STA $10, BRK
+    image[0:5] = b"\xa9\x07\x85\x10\x00"
+    image[0xffe:0x1000] = b"\x00\x00"
+    controller = PagedMemoryController([SharedRom(bytes(image), 0xf000)])
+
+    cpu = Cpu6502(controller)
+    cpu.registers.pc = 0xf000
+    cpu.run_until_signalled(lambda: cpu.registers.pc == 0)
+    assert controller.read(0x10) == 7
+
+def test_pickled_controller_round_trips():
+
+    controller = PagedMemoryController([make_rom()])
+    controller.write(0x0000, 0x12)
+    controller.write(0x1234, 0x56)
+    controller.write(0xdfff, 0x78)
+
+    copy = pickle.loads(pickle.dumps(controller))
+    assert copy.snapshot() == controller.snapshot()
+    assert [rom.address for rom in copy.roms] == [0xe000]
+
+    # RAM is the copy's own, ROM is still ROM
+    copy.write(0x1234, 0x9a)
+    copy.write(0xe000, 0x00)
+    assert controller.read(0x1234) == 0x56
+    assert copy.read(0x1234) == 0x9a
+    assert copy.read(0xe000) == 0xa9
+
+def test_pickled_cpu_runs_on_paged_controller():
+
+    # LDA #$42, STA $0200, INX, JMP $0602 in RAM
+    controller = PagedMemoryController([make_rom()])
+    controller.load_binary(bytes([0xa9, 0x42, 0x8d, 0x00, 0x02, 0xe8, 0x4c, 0x02, 0x06]), 0x600)
+    cpu = Cpu6502(controller)
+    cpu.registers.pc = 0x600
+    cpu.run(20)
+
+    copy = pickle.loads(pickle.dumps(cpu))
+    assert isinstance(copy.memory_controller, PagedMemoryController)
+    assert copy.registers == cpu.registers
+    assert copy.memory_controller.read(0x200) == 0x42
+
+    cpu.run(100)
+    copy.run(100)
+    assert copy.registers == cpu.registers
+    assert copy.total_cycles == cpu.total_cycles
+    assert copy.memory_controller.snapshot() == cpu.memory_controller.snapshot()
@@ -0,0 +1,260 @@
+import asyncio
+import pickle
+
+from emupy6502.quotas import Quotas, QuotaExceeded, StopReason
+
+from tests.helpers import busy_loop_instructions, make_cpu
+
+# STA $0200, JMP $0600 forever, a write every other instruction
+writer_instructions = bytes([0x8d, 0x00, 0x02, 0x4c, 0x00, 0x06])
+
+# STA $0200, INX, INX, STA $0201, JMP $0600
+spaced_writer_instructions = bytes([0x8d, 0x00, 0x02, 0xe8, 0xe8, 0x8d, 0x01, 0x02, 0x4c, 0x00, 0x06])
+
+
+def never():
+
+    return False
+
+def test_instruction_quota_stops_runaway_guest():
+
+    cpu = make_cpu(busy_loop_instructions, Quotas(instructions = 100))
+
+    assert cpu.run_until_signalled(never) == 300
+    assert cpu.stop_reason == StopReason('instructions', 100, 100)
+
+def test_cycle_quota_stops_runaway_guest():
+
+    cpu = make_cpu(busy_loop_instructions, Quotas(cycles = 1000))
+
+    assert cpu.run_until_signalled(never) == 1002
+    assert cpu.stop_reason == StopReason('cycles', 1000, 1002)
+
+def test_write_quota_refuses_the_write_over_quota():
+
+    quotas = Quotas(writes = 5)
+    cpu = make_cpu(writer_instructions, quotas)
+    cpu.registers.accumulator = 0x42
+
+    cpu.run_until_signalled(never)
+    assert cpu.stop_reason == StopReason('writes', 5, 5)
+    assert quotas.writes_used == 5
+    assert quotas.instructions_used == 10
+    assert cpu.memory_controller.read(0x200) == 0x42
+
+def test_signal_before_quota_leaves_no_stop_reason():
+
+    quotas = Quotas(instructions = 1000)
+    cpu = make_cpu(busy_loop_instructions, quotas)
+    calls = []
+
+    def signal():
+        calls.append(None)
+        return len(calls) > 10
+
+    assert cpu.run_until_signalled(signal) == 30
+    assert cpu.stop_reason is None
+    assert quotas.instructions_used == 10
+    assert quotas.remaining_instructions() == 990
+
+def test_run_stops_at_quota_without_overshoot():
+
+    cpu = make_cpu(busy_loop_instructions, Quotas(cycles = 100))
+
+    result = cpu.run(1000)
+    assert result.cycles == 102
+    assert result.overshoot == 0
+    assert cpu.overshoot == 0
+    assert cpu.stop_reason.kind == 'cycles'
+
+def test_usage_accumulates_across_runs():
+
+    quotas = Quotas(instructions = 50)
+    cpu = make_cpu(busy_loop_instructions, quotas)
+
+    assert cpu.run(90).instructions == 30
+    assert cpu.stop_reason is None
+    assert cpu.run(90).instructions == 20
+    assert cpu.stop_reason == StopReason('instructions', 50, 50)
+
+    # once used up nothing more runs
+    assert cpu.run(90).instructions == 0
+    assert cpu.stop_reason == StopReason('instructions', 50, 50)
+
+def test_run_write_quota():
+
+    cpu = make_cpu(writer_instructions, Quotas(writes = 1))
+
+    result = cpu.run(1000)
+    assert result.instructions == 2
+    assert cpu.stop_reason == StopReason('writes', 1, 1)
+
+def test_no_quotas_runs_as_before():
+
+    cpu = make_cpu(busy_loop_instructions)
+
+    result = cpu.run(100)
+    assert result.cycles == 102
+    assert result.overshoot == 2
+    assert cpu.stop_reason is None
+
+def test_quota_exceeded_message():
+
+    exception = QuotaExceeded(StopReason('writes', 3, 3))
+    assert str(exception) == "writes quota of 3 exceeded"
+    assert exception.reason.kind == 'writes'
+
+def test_quotas_survive_pickling():
+
+    cpu = make_cpu(busy_loop_instructions, Quotas(instructions = 10))
+    cpu.run(9)
+
+    restored = pickle.loads(pickle.dumps(cpu))
+    assert restored.quotas.instructions_used == 3
+    restored.run_until_signalled(never)
+    assert restored.stop_reason == StopReason('instructions', 10, 10)
+
+def test_refused_write_resumes_at_the_instruction():
+
+    quotas = Quotas(writes = 1)
+    cpu = make_cpu(writer_instructions, quotas)
+    cpu.registers.accumulator = 0x42
+
+    result = cpu.run(1000)
+    # the second STA is refused and counts for nothing
+    assert (result.cycles, result.instructions) == (4 + 3, 2)
+    assert cpu.registers.pc == 0x600
+    assert quotas.instructions_used == 2
+    assert cpu.counters.instructions == 2
+
+    cpu.memory_controller.write(0x200, 0)
+    quotas.writes = 2
+    assert cpu.step() == 4
+    assert cpu.memory_controller.read(0x200) == 0x42
+    assert cpu.registers.pc == 0x603
+
+def test_refused_push_leaves_the_stack_as_it_was():
+
+    # JSR $0600 pushes two bytes, the quota only allows one of them
+    quotas = Quotas(writes = 1)
+    cpu = make_cpu(bytes([0x20, 0x00, 0x06]), quotas)
+    sp = cpu.registers.sp
+
+    cpu.run_until_signalled(never)
+    # the first push was made, then undone with the rest of the JSR
+    assert cpu.stop_reason == StopReason('writes', 1, 1)
+    assert (cpu.registers.pc, cpu.registers.sp) == (0x600, sp)
+    assert quotas.writes_used == 0
+
+    quotas.writes = 2
+    assert cpu.step() == 6
+    assert cpu.registers.sp == (sp - 2) & 0xff
+    assert quotas.writes_used == 2
+
+def test_refused_read_modify_write_keeps_its_flags():
+
+    # SEC, ROL $10, ROL $10, JMP $0605 with $80 at $10: the second ROL
+    # sets the carry before its write is refused
+    program = bytes([0x38, 0x26, 0x10, 0x26, 0x10, 0x4c, 0x05, 0x06])
+    quotas = Quotas(writes = 1)
+    cpu = make_cpu(program, quotas)
+    cpu.memory_controller.write(0x10, 0x80)
+
+    cpu.run_until_signalled(lambda: cpu.registers.pc == 0x605)
+    assert cpu.stop_reason == StopReason('writes', 1, 1)
+    assert cpu.registers.pc == 0x603
+    assert cpu.registers.carry_flag
+    assert cpu.memory_controller.read(0x10) == 0x01
+
+    quotas.writes = 2
+    cpu.run_until_signalled(lambda: cpu.registers.pc == 0x605)
+    assert cpu.stop_reason is None
+    assert cpu.memory_controller.read(0x10) == 0x03
+    assert not cpu.registers.carry_flag
+
+def test_step_enforces_quotas():
+
+    cpu = make_cpu(writer_instructions, Quotas(instructions = 3))
+
+    assert [cpu.step() for _ in range(4)] == [4, 3, 4, 0]
+    assert cpu.stop_reason == StopReason('instructions', 3, 3)
+    assert cpu.registers.pc == 0x603
+
+def test_run_for_enforces_quotas():
+
+    cpu = make_cpu(busy_loop_instructions, Quotas(cycles = 100))
+
+    result = cpu.run_for(10.0, check_interval = 7)
+    assert (result.cycles, result.instructions) == (102, 34)
+    assert cpu.stop_reason == StopReason('cycles', 100, 102)
+
+def test_run_for_write_quota():
+
+    cpu = make_cpu(writer_instructions, Quotas(writes = 2))
+
+    result = cpu.run_for(10.0)
+    assert result.instructions == 4
+    assert cpu.stop_reason == StopReason('writes', 2, 2)
+    assert cpu.registers.pc == 0x600
+
+def test_run_async_enforces_quotas():
+
+    cpu = make_cpu(busy_loop_instructions, Quotas(instructions = 25))
+
+    assert asyncio.run(cpu.run_async(slice_cycles = 10)) == 75
+    assert cpu.stop_reason == StopReason('instructions', 25, 25)
+
+    # used up, so a second run stops straight away
+    assert asyncio.run(cpu.run_async(slice_cycles = 10)) == 0
+
+def test_run_async_write_quota():
+
+    quotas = Quotas(writes = 3)
+    cpu = make_cpu(writer_instructions, quotas)
+
+    asyncio.run(cpu.run_async(slice_cycles = 5))
+    assert cpu.stop_reason == StopReason('writes', 3, 3)
+    assert quotas.instructions_used == 6
+    assert cpu.registers.pc == 0x600
+
+def check_write_quota_rule(run):
+
+    # with one write allowed, the INXs after the first STA still run and
+    # only the second STA is refused, by whichever entry point runs it
+    quotas = Quotas(writes = 1)
+    cpu = make_cpu(spaced_writer_instructions, quotas)
+
+    run(cpu)
+    assert cpu.stop_reason == StopReason('writes', 1, 1)
+    assert (cpu.registers.pc, cpu.registers.x_index) == (0x605, 2)
+    assert quotas.instructions_used == 3
+
+    # and the same again, nothing more runs
+    run(cpu)
+    assert cpu.stop_reason == StopReason('writes', 1, 1)
+    assert (cpu.registers.pc, cpu.registers.x_index) == (0x605, 2)
+    assert quotas.instructions_used == 3
+
+def test_write_quota_rule_for_step():
+
+    def run(cpu):
+        for _ in range(10):
+            cpu.step()
+
+    check_write_quota_rule(run)
+
+def test_write_quota_rule_for_run():
+
+    check_write_quota_rule(lambda cpu: cpu.run(1000))
+
+def test_write_quota_rule_for_run_for():
+
+    check_write_quota_rule(lambda cpu: cpu.run_for(10.0, check_interval = 3))
+
+def test_write_quota_rule_for_run_until_signalled():
+
+    check_write_quota_rule(lambda cpu: cpu.run_until_signalled(never))
+
+def test_write_quota_rule_for_run_async():
+
+    check_write_quota_rule(lambda cpu: asyncio.run(cpu.run_async(slice_cycles = 2)))
@@ -1,3 +1,4 @@
+import pytest
 from unittest.mock import patch
 from emupy6502.memory_controller import MemoryController
 from emupy6502.registers import Registers
@@ -52,4 +53,42 @@ def test_set_NZV_non_zero_negative_overflow():
     registers.set_NZV(1, 0x80)
     assert registers.negative_flag
     assert registers.zero_flag == False
-    assert registers.overflow_flag
\ No newline at end of file
+    assert registers.overflow_flag
+
+def test_registers_have_no_instance_dict():
+
+    registers = Registers()
+    assert not hasattr(registers, '__dict__')
+
+    with pytest.raises(AttributeError):
+        registers.not_a_register = 1
+
+def test_registers_equality_compares_every_register():
+
+    registers = Registers()
+    assert registers == Registers()
+
+    registers.negative_flag = True
+    assert registers != Registers()
+
+def test_status_register_layout():
+
+    registers = Registers()
+    registers.interrupt_disable_flag = False
+    assert registers.status_register() == 0x20
+
+    registers.negative_flag = True
+    registers.overflow_flag = True
+    registers.decimal_mode_flag = True
+    registers.interrupt_disable_flag = True
+    registers.zero_flag = True
+    registers.carry_flag = True
+    assert registers.status_register() == 0xef
+
+def test_set_status_register_round_trips():
+
+    for bits in range(256):
+        registers = Registers()
+        registers.set_status_register(bits)
+        # bit 5 always reads set, B is not a flag in the register
+        assert registers.status_register() == (bits | 0x20) & ~0x10
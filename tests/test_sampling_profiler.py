@@ -0,0 +1,123 @@
+from emupy6502.bench.workloads import workloads_by_name
+from emupy6502.quotas import Quotas
+from emupy6502.sampling_profiler import SamplingProfiler, walk_stack
+
+from tests.helpers import load_cpu, nested_segments
+
+
+def test_walk_stack_inside_nested_calls():
+
+    cpu = load_cpu(nested_segments)
+    while cpu.registers.pc != 0x622:
+        cpu.step()
+
+    assert walk_stack(cpu) == [0x620, 0x610]
+    assert walk_stack(cpu, max_depth = 1) == [0x620]
+
+def test_walk_stack_skips_pushed_data():
+
+    cpu = load_cpu(nested_segments)
+    while cpu.registers.pc != 0x622:
+        cpu.step()
+
+    # as if the subroutine had pushed a byte
+    cpu.memory_controller.write(0x100 + cpu.registers.sp, 0x42)
+    cpu.registers.sp -= 1
+    assert walk_stack(cpu) == [0x620, 0x610]
+
+def test_walk_stack_empty():
+
+    assert walk_stack(load_cpu(nested_segments)) == []
+
+def test_profiling_a_device_leaves_it_alone():
+
+    def polling_cpu():
+        cpu = workloads_by_name['polling'].build()
+        # stale stack data that reads as a return address past a JSR at
+        # the device's status register, which polling would advance
+        cpu.memory_controller.load_binary(bytes([0x02, 0xd0]), 0x1fe)
+        cpu.registers.sp = 0xfd
+        return cpu
+
+    profiled = polling_cpu()
+    profiler = SamplingProfiler(profiled, interval = 7)
+    profiler.run(20000)
+
+    plain = polling_cpu()
+    plain.run(20000)
+
+    assert profiler.count > 2000
+    assert profiled.memory_controller.polls == plain.memory_controller.polls
+    assert profiled.memory_controller.data == plain.memory_controller.data
+    assert profiled.memory_controller.snapshot() == plain.memory_controller.snapshot()
+    assert profiled.registers.pc == plain.registers.pc
+
+def test_samples_land_in_the_hot_loop():
+
+    cpu = load_cpu(nested_segments)
+    profiler = SamplingProfiler(cpu, interval = 97, capacity = 1000)
+
+    assert profiler.run(50000) >= 50000
+    assert abs(profiler.count - 50000 / 97) < 2
+    assert profiler.dropped == 0
+
+    hot_spots = profiler.hot_spots(2)
+    assert set(hot_spot.pc for hot_spot in hot_spots) == {0x622, 0x623}
+    assert sum(hot_spot.share for hot_spot in hot_spots) > 0.9
+
+    subroutines = dict((hot_spot.pc, hot_spot.share) for hot_spot in profiler.hot_subroutines())
+    assert subroutines[0x610] > 0.9
+    assert subroutines[0x620] > 0.9
+    assert '$0622' in profiler.report()
+
+def test_stack_of_a_sample():
+
+    cpu = load_cpu(nested_segments)
+    profiler = SamplingProfiler(cpu, interval = 100, capacity = 10)
+    profiler.run(1000)
+
+    assert profiler.stack(9) == [0x620, 0x610]
+
+def test_samples_past_capacity_are_dropped():
+
+    profiler = SamplingProfiler(load_cpu(nested_segments), interval = 10, capacity = 5)
+    profiler.run(100)
+
+    assert profiler.count == 5
+    assert profiler.dropped >= 4
+    assert len(profiler.pcs) == 5
+
+def test_run_stops_with_the_quota():
+
+    cpu = load_cpu(nested_segments)
+    cpu.quotas = Quotas(cycles = 1000)
+    profiler = SamplingProfiler(cpu, interval = 300)
+
+    assert profiler.run(10000) < 1010
+    assert cpu.stop_reason.kind == 'cycles'
+
+def test_report_names_addresses():
+
+    names = {0x610: 'outer', 0x620: 'inner', 0x622: 'loop', 0x623: 'loop+1'}
+    profiler = SamplingProfiler(load_cpu(nested_segments), interval = 97, name = lambda address: names.get(address, '?'))
+    profiler.run(5000)
+
+    report = profiler.report()
+    assert '  loop ' in report
+    assert '  outer ' in report
+    assert '$06' not in report
+
+def test_report_column_fits_the_longest_name():
+
+    names = {0x610: 'outer', 0x620: 'a_rather_long_subroutine_name', 0x622: 'loop', 0x623: 'loop+1'}
+    profiler = SamplingProfiler(load_cpu(nested_segments), interval = 97, name = lambda address: names.get(address, '?'))
+    profiler.run(5000)
+
+    rows = [line for line in profiler.report().splitlines() if line.startswith('  ')]
+    # the counts start in the same column on every row
+    assert len(set(len(row) for row in rows)) == 1
+    assert any(row.startswith('  a_rather_long_subroutine_name ') for row in rows)
+
+def test_report_with_no_samples():
+
+    assert SamplingProfiler(load_cpu(nested_segments)).report() == "0 samples every 1000 cycles, 0 dropped"
@@ -0,0 +1,27 @@
+from emupy6502.batch import run_job
+from emupy6502.bench.scaling import format_rows, main, scaling_job
+
+
+def test_scaling_job_runs_to_brk():
+
+    result = run_job(scaling_job())
+
+    assert result.error is None
+    assert result.registers['pc'] == 0x606
+    assert (result.registers['x_index'], result.registers['y_index']) == (0, 0)
+
+def test_format_rows():
+
+    assert format_rows([(1, 2.0, 1.0), (2, 2.5, 1.6)]).splitlines() == [
+        "  workers:  1 time:   2.000s speedup:  1.00",
+        "  workers:  2 time:   2.500s speedup:  1.60"]
+
+def test_main(capsys):
+
+    assert main(['1', '--jobs-per-worker', '1', '--runner', 'threads']) == 0
+
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].startswith("GIL enabled:")
+    assert lines[1] == "threads"
+    assert lines[2].startswith("  workers:  1")
+    assert len(lines) == 3
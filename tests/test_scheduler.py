@@ -0,0 +1,102 @@
+from emupy6502.quotas import Quotas, StopReason
+from emupy6502.scheduler import Scheduler, is_idle_loop
+
+from tests.helpers import counting_loop_instructions, make_cpu
+
+# INX, CPX #$10, BNE $0600, JMP $0605 (idle)
+count_then_idle_instructions = bytes([0xe8, 0xe0, 0x10, 0xd0, 0xfb, 0x4c, 0x05, 0x06])
+
+
+def test_is_idle_loop():
+
+    cpu = make_cpu(bytes([0x4c, 0x00, 0x06, 0xd0, 0xfe]))
+    assert is_idle_loop(cpu)
+
+    # BNE * only spins while Z is clear
+    cpu.registers.pc = 0x603
+    assert is_idle_loop(cpu)
+    cpu.registers.zero_flag = True
+    assert not is_idle_loop(cpu)
+
+    cpu.registers.pc = 0x601
+    assert not is_idle_loop(cpu)
+
+def test_round_robin_shares_cycles_equally():
+
+    scheduler = Scheduler(quantum = 100)
+    machines = [scheduler.add(make_cpu(counting_loop_instructions)) for _ in range(3)]
+
+    assert scheduler.run(30) == 30
+    assert [machine.slices for machine in machines] == [10, 10, 10]
+
+def test_priorities_share_cycles_proportionally():
+
+    scheduler = Scheduler(quantum = 100)
+    low = scheduler.add(make_cpu(counting_loop_instructions), priority = 1, name = 'low')
+    high = scheduler.add(make_cpu(counting_loop_instructions), priority = 3, name = 'high')
+
+    scheduler.run(400)
+    assert abs(high.cycles / low.cycles - 3) < 0.1
+
+    accounting = dict((name, (share, entitled)) for name, _, _, share, entitled in scheduler.accounting())
+    assert abs(accounting['high'][0] - accounting['high'][1]) < 0.01
+
+def test_blocked_machines_do_not_run():
+
+    scheduler = Scheduler(quantum = 100)
+    first = scheduler.add(make_cpu(counting_loop_instructions))
+    second = scheduler.add(make_cpu(counting_loop_instructions))
+
+    scheduler.block(second)
+    scheduler.run(10)
+    assert second.cycles == 0
+    assert first.slices == 10
+
+    scheduler.wake(second)
+    scheduler.run(10)
+    # woken at the current pass, so it gets its share rather than catching up
+    assert 4 <= second.slices <= 6
+
+def test_idle_machines_leave_the_run_queue():
+
+    scheduler = Scheduler(quantum = 50)
+    idler = scheduler.add(make_cpu(count_then_idle_instructions))
+    worker = scheduler.add(make_cpu(counting_loop_instructions))
+
+    scheduler.run(20)
+    assert idler.idle
+    assert idler.cpu.registers.x_index == 0x10
+    assert worker.slices > idler.slices
+
+    # an interrupt or I/O would wake it
+    idler.cpu.registers.pc = 0x600
+    scheduler.wake(idler)
+    assert idler.runnable
+
+def test_done_machines_retire_and_run_stops():
+
+    scheduler = Scheduler(quantum = 10)
+    cpu = make_cpu(counting_loop_instructions)
+    machine = scheduler.add(cpu, done = lambda: cpu.registers.x_index >= 20)
+
+    assert scheduler.run() == machine.slices
+    assert machine.finished
+    assert scheduler.run_slice() is None
+
+def test_machines_stopped_by_quotas_are_retired():
+
+    scheduler = Scheduler(quantum = 100)
+    limited_cpu = make_cpu(counting_loop_instructions)
+    limited_cpu.quotas = Quotas(instructions = 20)
+    limited = scheduler.add(limited_cpu)
+    other = scheduler.add(make_cpu(counting_loop_instructions))
+
+    scheduler.run(20)
+    assert limited.finished
+    assert limited_cpu.stop_reason == StopReason('instructions', 20, 20)
+    assert limited.slices == 1
+    assert other.slices == 19
+
+    # and once nothing else is runnable the scheduler stops
+    scheduler.remove(other)
+    assert scheduler.run() == 0
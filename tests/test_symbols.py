@@ -0,0 +1,113 @@
+import io
+
+from emupy6502.call_graph_profiler import CallGraphProfiler
+from emupy6502.cpu6502 import Cpu6502
+from emupy6502.memory_controller import MemoryController
+from emupy6502.symbols import SourceLine, Symbol, SymbolTable, load_ca65_dbg, load_vice_labels, parse_dbg_line
+
+vice_labels = """\
+al C:0600 .main
+al C:0610 .outer
+al 0620 .inner
+al C:0622 .@loop
+this line is not a label
+"""
+
+# trimmed from ld65 --dbgfile output
+ca65_dbg = """\
+version\tmajor=2,minor=0
+info\tcsym=0,file=2,lib=0,line=3,mod=1,scope=1,seg=1,span=3,sym=3,type=0
+file\tid=0,name="nested.s",size=120,mtime=0x5F000000,mod=0
+file\tid=1,name="macros, mostly.inc",size=40,mtime=0x5F000000,mod=0
+line\tid=0,file=0,line=4,span=0
+line\tid=1,file=0,line=9,span=1
+line\tid=2,file=1,line=2,type=2,span=1+2
+mod\tid=0,name="nested.o",file=0
+seg\tid=0,name="CODE",start=0x000600,size=0x0026,addrsize=absolute,type=ro,oname="nested.bin",ooffs=0
+span\tid=0,seg=0,start=0,size=3
+span\tid=1,seg=0,start=16,size=3
+span\tid=2,seg=0,start=32,size=2
+scope\tid=0,name="",mod=0,size=38
+sym\tid=0,name="main",addrsize=absolute,scope=0,def=0,ref=1,val=0x600,seg=0,type=lab
+sym\tid=1,name="outer",addrsize=absolute,scope=0,def=1,val=0x610,seg=0,type=lab
+sym\tid=2,name="COUNT",addrsize=zeropage,scope=0,def=2,val=0x0,type=equ
+"""
+
+
+def test_lookup_resolves_offsets():
+
+    table = SymbolTable(max_offset = 0x10)
+    table.add_symbol(0x610, 'outer')
+    table.add_symbol(0x600, 'main')
+    table.add_symbol(0x600, 'start')
+
+    assert table.symbol(0x5ff) is None
+    assert table.symbol(0x600) == (Symbol(0x600, 'main'), 0)
+    assert table.symbol(0x613) == (Symbol(0x610, 'outer'), 3)
+    assert table.name(0x600) == 'main'
+    assert table.name(0x613) == 'outer+3'
+    assert table.name(0x621) == '$0621'
+    assert table.name(0x5ff) == '$05ff'
+
+def test_lookup_sees_symbols_added_later():
+
+    table = SymbolTable()
+    table.add_symbol(0x600, 'main')
+    assert table.name(0x620) == 'main+32'
+    table.add_symbol(0x620, 'inner')
+    assert table.name(0x620) == 'inner'
+
+def test_load_vice_labels():
+
+    table = load_vice_labels(io.StringIO(vice_labels))
+
+    assert table.symbols == {0x600: 'main', 0x610: 'outer', 0x620: 'inner', 0x622: '@loop'}
+    assert table.name(0x625) == '@loop+3'
+
+def test_load_vice_labels_from_a_file(tmp_path):
+
+    path = tmp_path / 'nested.lbl'
+    path.write_text(vice_labels)
+    assert len(load_vice_labels(str(path))) == 4
+
+def test_parse_dbg_line():
+
+    assert parse_dbg_line('file\tid=1,name="macros, mostly.inc",size=40') == (
+        'file', {'id': '1', 'name': 'macros, mostly.inc', 'size': '40'})
+
+def test_load_ca65_dbg():
+
+    table = load_ca65_dbg(io.StringIO(ca65_dbg))
+
+    # the equate is a constant, not an address
+    assert table.symbols == {0x600: 'main', 0x610: 'outer'}
+    assert table.source_line(0x601) == SourceLine(0x600, 'nested.s', 4)
+    assert table.source_line(0x603) is None
+    # the source line wins over the macro expansion of the same span
+    assert table.source_line(0x612) == SourceLine(0x610, 'nested.s', 9)
+    assert table.source_line(0x621) == SourceLine(0x620, 'macros, mostly.inc', 2)
+    assert table.describe(0x611) == 'outer+1 (nested.s:9)'
+    assert table.describe(0x605) == 'main+5'
+
+def test_load_into_one_table():
+
+    table = load_ca65_dbg(io.StringIO(ca65_dbg))
+    load_vice_labels(io.StringIO(vice_labels), table)
+
+    assert table.name(0x613) == 'outer+3'
+    assert table.name(0x623) == '@loop+1'
+
+def test_names_call_graph_profiles():
+
+    #  0600 JSR $0610
+    #  0603 JMP $0600
+    #  0610 RTS
+    memory_controller = MemoryController(65536)
+    memory_controller.load_binary(bytes([0x20, 0x10, 0x06, 0x4c, 0x00, 0x06]), 0x600)
+    memory_controller.load_binary(bytes([0x60]), 0x610)
+    cpu = Cpu6502(memory_controller)
+    cpu.registers.pc = 0x600
+    profiler = CallGraphProfiler(cpu, name = load_vice_labels(io.StringIO(vice_labels)).name)
+    profiler.run(15)
+
+    assert profiler.folded_lines() == ["main 9", "main;outer 6"]
@@ -0,0 +1,96 @@
+import pytest
+
+from emupy6502.quotas import Quotas, StopReason
+from emupy6502.threaded_runner import ThreadedRunner
+
+from tests.helpers import counting_loop_instructions, make_cpu
+
+
+def test_runs_until_stopped():
+
+    runner = ThreadedRunner(make_cpu(counting_loop_instructions), quantum = 100).start()
+    runner.snapshot().result(timeout = 5)
+    cycles = runner.stop().result(timeout = 5)
+    runner.join(5)
+
+    assert cycles > 0
+    assert runner.error is None
+
+def test_step_while_paused():
+
+    with ThreadedRunner(make_cpu(counting_loop_instructions), paused = True) as runner:
+        # INX is 2 cycles, JMP 3
+        assert runner.step(3).result(timeout = 5) == 7
+        registers, memory = runner.snapshot().result(timeout = 5)
+
+    assert registers.x_index == 2
+    assert registers.pc == 0x601
+    assert memory[0x600:0x604] == counting_loop_instructions
+
+def test_pause_freezes_state():
+
+    with ThreadedRunner(make_cpu(counting_loop_instructions), quantum = 50) as runner:
+        paused_at = runner.pause().result(timeout = 5)
+        first, _ = runner.snapshot().result(timeout = 5)
+        second, _ = runner.snapshot().result(timeout = 5)
+        assert first == second
+        assert runner.cycles == paused_at
+
+        runner.resume().result(timeout = 5)
+        runner.snapshot().result(timeout = 5)
+
+def test_poke_changes_running_program():
+
+    with ThreadedRunner(make_cpu(counting_loop_instructions), paused = True) as runner:
+        # turn INX into INY
+        runner.poke(0x600, 0xc8).result(timeout = 5)
+        runner.poke(0x700, b"\x01\x02").result(timeout = 5)
+        runner.step(1).result(timeout = 5)
+        registers, memory = runner.snapshot().result(timeout = 5)
+
+    assert registers.y_index == 1
+    assert registers.x_index == 0
+    assert memory[0x700:0x702] == b"\x01\x02"
+
+def test_guest_error_stops_runner():
+
+    # PHP is not implemented
+    runner = ThreadedRunner(make_cpu(b"\x08"), quantum = 10).start()
+    runner.join(5)
+
+    assert isinstance(runner.error, KeyError)
+    with pytest.raises(KeyError):
+        runner.snapshot().result(timeout = 5)
+
+def test_bad_poke_fails_only_that_command():
+
+    with ThreadedRunner(make_cpu(counting_loop_instructions), paused = True) as runner:
+        with pytest.raises(IndexError):
+            runner.poke(0xffff, b"\x01\x02").result(timeout = 5)
+
+        assert runner.step(1).result(timeout = 5) == 2
+
+def test_step_into_guest_error():
+
+    runner = ThreadedRunner(make_cpu(b"\xe8\x08"), paused = True).start()
+
+    with pytest.raises(KeyError):
+        runner.step(2).result(timeout = 5)
+
+    runner.join(5)
+    assert runner.cycles == 2
+    assert isinstance(runner.error, KeyError)
+
+def test_stops_when_the_quotas_stop_the_cpu():
+
+    cpu = make_cpu(counting_loop_instructions)
+    cpu.quotas = Quotas(instructions = 1000)
+    runner = ThreadedRunner(cpu, quantum = 100).start()
+    runner.join(5)
+
+    assert not runner._thread.is_alive()
+    assert runner.error is None
+    assert cpu.stop_reason == StopReason('instructions', 1000, 1000)
+    assert runner.cycles == 2500
+    with pytest.raises(RuntimeError):
+        runner.snapshot().result(timeout = 5)